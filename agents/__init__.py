@@ -2,5 +2,7 @@ from .bond007 import Bond007
 from .stonker import Stonker
 from .call_me_maybe import CallMeMaybe
 from .insight_generator import InsightGenerator
+from .cross_asset import CrossAssetAnalyzer
+from .data_store import DataStore, get_store
 
-__all__ = ['Bond007', 'Stonker', 'CallMeMaybe', 'InsightGenerator']
+__all__ = ['Bond007', 'Stonker', 'CallMeMaybe', 'InsightGenerator', 'CrossAssetAnalyzer', 'DataStore', 'get_store']
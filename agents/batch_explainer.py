@@ -0,0 +1,139 @@
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import anthropic
+
+
+class TokenBucket:
+    def __init__(self, tokens_per_minute, capacity=None):
+        self.rate = tokens_per_minute / 60
+        self.capacity = capacity or tokens_per_minute
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens):
+        tokens = min(tokens, self.capacity)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class BatchExplainer:
+    def __init__(self, generator, concurrency=8, tokens_per_minute=40_000, pack_size=5,
+                 max_retries=4, backoff=1.0):
+        self.generator = generator
+        self.concurrency = concurrency
+        self.bucket = TokenBucket(tokens_per_minute)
+        self.pack_size = pack_size
+        self.max_retries = max_retries
+        self.backoff = backoff
+
+    def explain(self, results):
+        prompts, keys = [], []
+        for result in results:
+            # a result the prompt cannot be built from keeps no key and gets the fallback
+            try:
+                prompt = self.generator.build_prompt(result)
+                key = self.generator.cache_key(prompt)
+            except Exception:
+                prompt = key = None
+            prompts.append(prompt)
+            keys.append(key)
+        texts = [self.generator.cache.get(key) if key is not None else None for key in keys]
+
+        # one upstream item per distinct prompt that is not cached yet
+        pending = {}
+        for i, key in enumerate(keys):
+            if texts[i] is None and key is not None:
+                pending.setdefault(key, []).append(i)
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            futures = [pool.submit(self._run_pack, [(key, prompts[rows[0]]) for key, rows in pack])
+                       for pack in self._packs(pending, results)]
+            for future in futures:
+                for key, text in future.result().items():
+                    for i in pending[key]:
+                        texts[i] = text
+
+        return [text if text is not None else self.generator.fallback(result)
+                for text, result in zip(texts, results)]
+
+    def _packs(self, pending, results):
+        # only instruments of the same kind share a prompt, the single prompts are already self-contained
+        by_kind = {}
+        for key, rows in pending.items():
+            by_kind.setdefault(results[rows[0]]['instrument_type'], []).append((key, rows))
+        for items in by_kind.values():
+            for start in range(0, len(items), self.pack_size):
+                yield items[start:start + self.pack_size]
+
+    def _run_pack(self, items):
+        if len(items) > 1:
+            try:
+                texts = self._request_pack([prompt for _, prompt in items])
+            except Exception:
+                texts = None
+            if texts is not None:
+                return self._store(dict(zip([key for key, _ in items], texts)))
+
+        explained = {}
+        for key, prompt in items:
+            try:
+                explained[key] = self._request(prompt, self.generator.max_tokens)
+            except Exception:
+                continue
+        return self._store(explained)
+
+    def _store(self, explained):
+        for key, text in explained.items():
+            self.generator.cache.set(key, text)
+        return explained
+
+    def _request_pack(self, prompts):
+        numbered = '\n\n'.join(f"{i}.\n{prompt}" for i, prompt in enumerate(prompts, 1))
+        prompt = f"""Write one explanation for each numbered item below, following the instructions inside that item.
+Reply with only a JSON array of {len(prompts)} strings, in the same order as the items.
+
+{numbered}"""
+        text = self._request(prompt, self.generator.max_tokens * len(prompts))
+        try:
+            texts = json.loads(text[text.index('['):text.rindex(']') + 1])
+        except ValueError:
+            return None
+        if len(texts) != len(prompts) or not all(isinstance(t, str) and t.strip() for t in texts):
+            return None
+        return texts
+
+    def _request(self, prompt, max_tokens):
+        self.bucket.acquire(len(prompt) // 4 + max_tokens)
+        for attempt in range(self.max_retries + 1):
+            try:
+                message = self.generator.client.messages.create(
+                    model=self.generator.model,
+                    max_tokens=max_tokens,
+                    messages=[{"role": "user", "content": prompt}]
+                )
+                return message.content[0].text
+            except (anthropic.RateLimitError, anthropic.APIConnectionError, anthropic.InternalServerError) as e:
+                if attempt == self.max_retries:
+                    raise
+                time.sleep(self._retry_delay(e, attempt))
+
+    def _retry_delay(self, error, attempt):
+        response = getattr(error, 'response', None)
+        retry_after = response.headers.get('retry-after') if response is not None else None
+        try:
+            return float(retry_after)
+        except (TypeError, ValueError):
+            return self.backoff * 2 ** attempt * (1 + random.random())
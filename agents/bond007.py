@@ -1,25 +1,139 @@
+import numpy as np
 import pandas as pd
 from statistics import median, stdev
 from typing import Dict, Tuple
-import json
+from .bond_analytics import price_book
+from .cache import memoize_result, shared_result_cache
+from .data_store import get_store
+from .hot_reload import DataLock, keyed_update, reads_data, writes_data
+from .instrumentation import NULL_TIMER, start_timer
+from .nearest_peers import NearestPeerIndex, bond_features, neighbor_stats
+from .peer_index import MaturityWindowIndex
+from .results import RESULTS_TAG, BondResult
+from .schema import find_rows, row_dict
+from .yield_curve import TREASURY_SECTOR, TreasuryCurve
+
+# the axis the peer window runs along, in years either way
+PEER_BASES = {'maturity': 'maturity_years', 'duration': 'modified_duration'}
 
 class Bond007:
-    def __init__(self):
-        self.bonds_df = pd.read_csv('data/bonds.csv')
-        with open('data/industry_benchmarks.json') as f:
-            self.benchmarks = json.load(f)
+    def __init__(self, maturity_window=2, store=None, result_cache=None, load_frame=True,
+                 use_solved_ytm=False, peer_basis='maturity', peer_mode='window', peer_k=10):
+        if peer_basis not in PEER_BASES:
+            raise ValueError(f"Unknown peer basis '{peer_basis}', use one of: {', '.join(PEER_BASES)}")
+        if peer_mode not in ('window', 'knn'):
+            raise ValueError(f"Unknown peer mode '{peer_mode}', use 'window' or 'knn'")
+        self.store = store or get_store()
+        self.data_lock = DataLock()
+        self.result_cache = shared_result_cache(self.store) if result_cache is None else result_cache
+        self.maturity_window = maturity_window
+        self.use_solved_ytm = use_solved_ytm
+        self.peer_basis = peer_basis
+        self.peer_column = PEER_BASES[peer_basis]
+        self.peer_mode = peer_mode
+        # k nearest bonds by rating, maturity (or duration) and issuer leverage, across sectors
+        self.knn_index = NearestPeerIndex(
+            lambda df: bond_features(df, self.peer_column), 'issuer', k=peer_k
+        ) if peer_mode == 'knn' else None
+        self.peer_index = None
+        self._all_results = None
+        self._treasury_curve = None
+        self._analytics = None
+        self._working_df = None
+        self._bonds_df = None
+        if load_frame:
+            self.bonds_df = self.store.frame('bonds')
+        self.benchmarks = self.store.benchmarks
+    
+    @property
+    def bonds_df(self):
+        return self._bonds_df
+    
+    @bonds_df.setter
+    @writes_data
+    def bonds_df(self, df):
+        self._bonds_df = df
+        self._all_results = None
+        self._treasury_curve = None
+        self._analytics = None
+        self._working_df = None
+        if self.knn_index is not None:
+            self.knn_index.sync(self.working_df)
+        if self.peer_index is None:
+            self.peer_index = MaturityWindowIndex(self.working_df, window=self.maturity_window,
+                                                  position_column=self.peer_column)
+        else:
+            self.peer_index.sync(self.working_df)
+    
+    @property
+    def working_df(self):
+        # what the verdicts are computed from: bonds_df, or a copy carrying the solved yields and durations
+        if self._working_df is None:
+            uses_analytics = self.use_solved_ytm or self.peer_basis == 'duration'
+            self._working_df = self.working_frame(self.bonds_df, self.analytics() if uses_analytics else None)
+        return self._working_df
+    
+    def working_frame(self, df, analytics=None):
+        if not (self.use_solved_ytm or self.peer_basis == 'duration'):
+            return df
+        if analytics is None:
+            analytics = price_book(df)
+        columns = {}
+        if self.use_solved_ytm:
+            columns['yield_pct'] = np.where(analytics['ytm_converged'], analytics['ytm_pct'], df['yield_pct'])
+        if self.peer_basis == 'duration':
+            columns['modified_duration'] = analytics['modified_duration'].to_numpy()
+        return df.assign(**columns)
+    
+    @reads_data
+    def analytics(self):
+        # yield to maturity, durations, convexity and DV01 for the whole book, once per frame
+        if self._analytics is None:
+            self._analytics = price_book(self.bonds_df)
+        return self._analytics
+    
+    @writes_data
+    def refresh(self, df, diff=None, benchmarks=None):
+        previous_df, previous = self.bonds_df, self._all_results
+        if benchmarks is not None:
+            self.benchmarks = benchmarks
+            diff = None
+        self.bonds_df = df
+        # a Treasury change moves the curve under every bond, so only other sectors are spliced
+        # and nearest peers can cross sectors, so with those any change recomputes the whole book
+        if (previous is not None and diff is not None and TREASURY_SECTOR not in diff['groups']
+                and self.peer_mode == 'window'):
+            stale = df['sector'].isin(diff['groups']).to_numpy()
+            self._all_results = keyed_update(previous, previous_df, df, ['issuer'], stale, self._vector_analyze)
+    
+    def peer_positions(self, bond):
+        if self.peer_mode == 'knn':
+            return self.knn_index.peer_positions(bond['issuer'])
+        return self.peer_index.peer_positions(bond['sector'], bond['issuer'], bond[self.peer_column])
     
+    @reads_data
     def get_peers(self, bond):
-        peers = self.bonds_df[
-            (self.bonds_df['sector'] == bond['sector']) &
-            (self.bonds_df['issuer'] != bond['issuer']) &
-            (abs(self.bonds_df['maturity_years'] - bond['maturity_years']) <= 2)
-        ]
-        return peers
+        return self.bonds_df.iloc[self.peer_positions(bond)]
+    
+    @property
+    def treasury_curve(self):
+        # built from the Government rows once per frame, reset whenever the bonds or benchmarks change
+        if self._treasury_curve is None:
+            self._treasury_curve = TreasuryCurve.from_bonds(self.working_df, self.benchmarks)
+        return self._treasury_curve
+    
+    @treasury_curve.setter
+    def treasury_curve(self, curve):
+        # for callers that collect the Government rows themselves, like the streaming screener
+        self._treasury_curve = curve
     
     def calculate_credit_spread(self, bond):
-        treasury_yield = self.benchmarks.get('Government', {}).get('bond_yield_avg', 4.35)
-        return bond['yield_pct'] - treasury_yield
+        return bond['yield_pct'] - float(self.treasury_curve.yields_at(bond['maturity_years']))
+    
+    @reads_data
+    def credit_spreads(self):
+        df = self.working_df
+        return pd.Series(self.treasury_curve.spreads(df['yield_pct'], df['maturity_years']), index=df.index)
     
     def analyze_yield_spread(self, bond, peers):
         if len(peers) < 2:
@@ -40,6 +154,18 @@ class Bond007:
             'peer_count': len(peers)
         }
     
+    def nearest_yield_spread(self, bond, position):
+        sweep = self.nearest_sweep([position]).iloc[0]
+        if sweep['peer_count'] < 2:
+            return {'error': 'Insufficient peer bonds'}
+        return {
+            'bond_yield': bond['yield_pct'],
+            'peer_median_yield': float(sweep['peer_median_yield']),
+            'deviation': float(sweep['deviation']),
+            'z_score': float(sweep['z_score']),
+            'peer_count': int(sweep['peer_count'])
+        }
+    
     def generate_verdict(self, bond, yield_analysis, credit_spread):
         if 'error' in yield_analysis:
             return 'INSUFFICIENT_DATA', 0, yield_analysis
@@ -78,24 +204,125 @@ class Bond007:
         stats = {**yield_analysis, 'credit_spread': credit_spread}
         return final_verdict, confidence, stats
     
+    @reads_data
     def analyze(self, issuer):
-        bond_row = self.bonds_df[self.bonds_df['issuer'] == issuer]
-        if bond_row.empty:
-            raise ValueError(f"Bond '{issuer}' not found")
+        timer = start_timer('Bond007')
+        result = memoize_result(self.result_cache, self.result_key(issuer), lambda: self._analyze(issuer, timer))
+        return timer.attach(result)
+    
+    def result_key(self, issuer):
+        if self.bonds_df is not self.store.frame('bonds') or self.benchmarks is not self.store.benchmarks:
+            return None
+        return (f"Bond007|{issuer}|window={self.peer_index.window}|ytm={self.use_solved_ytm}|basis={self.peer_basis}|"
+                f"peers={self.peer_mode}{self.knn_index.k if self.knn_index else ''}|"
+                f"{self.store.version('bonds')}|{self.store.version('benchmarks')}|{RESULTS_TAG}")
+    
+    def _analyze(self, issuer, timer=NULL_TIMER):
+        with timer.stage('row_lookup'):
+            matches = find_rows(self.bonds_df['issuer'], issuer)
+            if len(matches) == 0:
+                raise ValueError(f"Bond '{issuer}' not found")
+            
+            position = matches[0]
+            bond = row_dict(self.working_df, position)
+        with timer.stage('get_peers'):
+            peer_positions = self.peer_positions(bond)
+            # the spread only reads peer yields, so skip building the full peer frame
+            peers = pd.DataFrame({'yield_pct': self.working_df['yield_pct'].to_numpy(float)[peer_positions]})
+        with timer.stage('credit_spread'):
+            credit_spread = self.calculate_credit_spread(bond)
+        with timer.stage('yield_spread'):
+            if self.peer_mode == 'knn':
+                yield_analysis = self.nearest_yield_spread(bond, position)
+            else:
+                yield_analysis = self.analyze_yield_spread(bond, peers)
+        with timer.stage('verdict'):
+            verdict, confidence, stats = self.generate_verdict(bond, yield_analysis, credit_spread)
+        
+        # the row the verdict was reached on, solved yield and duration included when they are in use
+        return BondResult(
+            self.working_df, position, peer_positions,
+            agent='Bond007',
+            verdict=verdict,
+            confidence=confidence,
+            stats=stats,
+            credit_spread=credit_spread
+        )
+
+    
+    @reads_data
+    def yield_spread_sweep(self, sectors=None):
+        sweep = self.peer_index.sweep(sectors).reindex(np.arange(len(self.bonds_df)))
+        sweep.index = self.bonds_df.index
+        return sweep
+    
+    def nearest_sweep(self, positions):
+        # the same columns as the window sweep, over each bond's k nearest neighbours
+        yields = self.working_df['yield_pct'].to_numpy(float)
+        medians, stds, peer_count = neighbor_stats(yields, self.knn_index.neighbors(positions))
+        deviation = yields[positions] - medians
+        with np.errstate(divide='ignore', invalid='ignore'):
+            z_score = np.where(stds > 0, deviation / stds, 0.0)
+        z_score[peer_count < 2] = np.nan
+        return pd.DataFrame({
+            'peer_count': peer_count,
+            'peer_median_yield': medians,
+            'peer_std': stds,
+            'deviation': deviation,
+            'z_score': z_score
+        }, index=self.bonds_df.index[positions])
+    
+    @reads_data
+    def analyze_all(self):
+        if self._all_results is None:
+            self._all_results = self._vector_analyze(np.arange(len(self.bonds_df)))
+        return self._all_results.copy()
+    
+    def _vector_analyze(self, positions):
+        df = self.working_df.iloc[positions]
+        if self.peer_mode == 'knn':
+            sweep = self.nearest_sweep(positions)
+        else:
+            sweep = self.yield_spread_sweep(df['sector'].dropna().unique()).iloc[positions]
+        return self._vector_verdicts(df, sweep)
+    
+    def _vector_verdicts(self, df, sweep):
+        bond_yield = df['yield_pct'].to_numpy(float)
+        treasury_yield = self.treasury_curve.yields_at(df['maturity_years'].to_numpy(float))
+        credit_spread = bond_yield - treasury_yield
+        sector_avg_spread = df['sector'].map(
+            lambda sector: self.benchmarks.get(sector, {}).get('credit_spread_avg', 2.0)
+        ).to_numpy(float)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            spread_ratio = np.where(sector_avg_spread > 0, credit_spread / sector_avg_spread, 1.0)
         
-        bond = bond_row.iloc[0].to_dict()
-        peers = self.get_peers(bond)
-        credit_spread = self.calculate_credit_spread(bond)
-        yield_analysis = self.analyze_yield_spread(bond, peers)
-        verdict, confidence, stats = self.generate_verdict(bond, yield_analysis, credit_spread)
+        z_score = sweep['z_score'].to_numpy(float)
+        z_verdict = np.select([z_score > 1.5, z_score < -1.5], ['UNDERVALUED', 'OVERVALUED'], 'NEUTRAL')
+        z_weight = np.where((z_score > 1.5) | (z_score < -1.5), 40, 20)
+        spread_verdict = np.select([spread_ratio > 1.5, spread_ratio < 0.7], ['UNDERVALUED', 'OVERVALUED'], 'NEUTRAL')
+        spread_weight = np.where((spread_ratio > 1.5) | (spread_ratio < 0.7), 30, 15)
         
-        return {
-            'agent': 'Bond007',
-            'instrument_type': 'bond',
-            'bond': bond,
-            'peers': peers,
-            'verdict': verdict,
-            'confidence': confidence,
-            'stats': stats,
-            'credit_spread': credit_spread
-        }
+        # same tally as generate_verdict: agreeing signals add up, otherwise the heavier one wins
+        agree = z_verdict == spread_verdict
+        verdict = np.where(agree | (z_weight >= spread_weight), z_verdict, spread_verdict).astype(object)
+        confidence = np.minimum(95, np.where(agree, z_weight + spread_weight, np.maximum(z_weight, spread_weight)))
+        
+        junk = bond_yield > 10
+        verdict[junk] = 'JUNK_HIGH_YIELD'
+        confidence[junk] = 50
+        
+        insufficient = sweep['peer_count'].fillna(0).to_numpy(int) < 2
+        verdict[insufficient] = 'INSUFFICIENT_DATA'
+        confidence[insufficient] = 0
+        
+        out = pd.DataFrame({'issuer': df['issuer'].to_numpy(object), 'sector': df['sector'].to_numpy(object)}, index=df.index)
+        out['bond_yield'] = bond_yield
+        out['peer_median_yield'] = sweep['peer_median_yield'].to_numpy(float)
+        out['deviation'] = sweep['deviation'].to_numpy(float)
+        out['z_score'] = z_score
+        out['peer_count'] = sweep['peer_count'].fillna(0).to_numpy(int)
+        out['treasury_yield'] = treasury_yield
+        out['credit_spread'] = credit_spread
+        out['verdict'] = verdict
+        out['confidence'] = confidence
+        return out
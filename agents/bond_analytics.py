@@ -0,0 +1,165 @@
+import numpy as np
+import pandas as pd
+
+FREQUENCY = 2
+MIN_YIELD = -0.5
+MAX_YIELD = 5.0
+
+
+def _inputs(*values):
+    # broadcast and flatten to 1-d, so scalars work too; results go back to the returned shape
+    arrays = np.broadcast_arrays(*(np.asarray(value, float) for value in values))
+    return arrays[0].shape, [array.ravel() for array in arrays]
+
+
+def _shaped(values, shape):
+    # [()] turns a 0-d result back into a plain numpy scalar
+    return values.reshape(shape)[()]
+
+
+def _schedule(maturity, frequency):
+    # n coupons left, the next one w periods away (0 < w <= 1); the rest of the period has accrued
+    periods = np.asarray(maturity, float) * frequency
+    with np.errstate(invalid='ignore'):
+        n = np.maximum(np.ceil(periods - 1e-9), 1.0)
+    return n, periods - (n - 1)
+
+
+def _power_sums(v, n):
+    # sums of v^k, k v^k and k^2 v^k over k < n, in closed form away from v == 1
+    d = 1 - v
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        vn = v ** n
+        s0 = (1 - vn) / d
+        s1 = (v - n * vn + (n - 1) * vn * v) / d ** 2
+        s2 = (v * (1 + v) - n * n * vn + (2 * n * n - 2 * n - 1) * vn * v - (n - 1) ** 2 * vn * v * v) / d ** 3
+
+    # near zero yield the closed forms cancel, so those few bonds are summed term by term
+    near = np.flatnonzero(np.abs(d) < 1e-3)
+    if len(near):
+        s0[near] = s1[near] = s2[near] = 0.0
+        v_near, n_near = v[near], n[near]
+        term = np.ones(len(near))
+        for k in range(int(n_near.max())):
+            live = k < n_near
+            s0[near] += np.where(live, term, 0.0)
+            s1[near] += np.where(live, k * term, 0.0)
+            s2[near] += np.where(live, k * k * term, 0.0)
+            term = term * v_near
+    return s0, s1, s2
+
+
+def _dirty(coupon, n, w, v, s0):
+    return v ** w * (coupon * s0 + 100 * v ** (n - 1))
+
+
+def bond_price(yld, coupon, maturity, frequency=FREQUENCY, clean=True):
+    # price per 100 face; yields and coupons as decimals, maturity in years
+    shape, (yld, coupon, maturity) = _inputs(yld, coupon, maturity)
+    n, w = _schedule(maturity, frequency)
+    period_coupon = 100 * coupon / frequency
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        v = 1 / (1 + yld / frequency)
+        s0, _, _ = _power_sums(v, n)
+        price = _dirty(period_coupon, n, w, v, s0)
+    price = np.where(maturity > 0, price, np.nan)
+    return _shaped(price - period_coupon * (1 - w) if clean else price, shape)
+
+
+def bond_risk(yld, coupon, maturity, frequency=FREQUENCY):
+    shape, (yld, coupon, maturity) = _inputs(yld, coupon, maturity)
+    n, w = _schedule(maturity, frequency)
+    period_coupon = 100 * coupon / frequency
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        v = 1 / (1 + yld / frequency)
+        s0, s1, s2 = _power_sums(v, n)
+        last = w + n - 1
+        vw, vlast = v ** w, v ** (n - 1)
+        dirty = vw * (period_coupon * s0 + 100 * vlast)
+        # time-weighted and (t, t+1)-weighted cash flows, in periods
+        weighted = vw * (period_coupon * (w * s0 + s1) + 100 * last * vlast)
+        curved = vw * (period_coupon * (w * (w + 1) * s0 + (2 * w + 1) * s1 + s2) + 100 * last * (last + 1) * vlast)
+
+        macaulay = weighted / (dirty * frequency)
+        modified = macaulay * v
+        convexity = curved * v * v / (dirty * frequency ** 2)
+    invalid = ~(maturity > 0)
+    return {
+        'dirty_price': _shaped(np.where(invalid, np.nan, dirty), shape),
+        'macaulay_duration': _shaped(np.where(invalid, np.nan, macaulay), shape),
+        'modified_duration': _shaped(np.where(invalid, np.nan, modified), shape),
+        'convexity': _shaped(np.where(invalid, np.nan, convexity), shape),
+        # price change per 100 face for a one basis point drop in yield
+        'dv01': _shaped(np.where(invalid, np.nan, modified * dirty * 1e-4), shape)
+    }
+
+
+def yield_to_maturity(price, coupon, maturity, frequency=FREQUENCY, guess=None, tol=1e-10, max_iter=50):
+    if guess is None:
+        shape, (price, coupon, maturity) = _inputs(price, coupon, maturity)
+    else:
+        shape, (price, coupon, maturity, guess) = _inputs(price, coupon, maturity, guess)
+    n, w = _schedule(maturity, frequency)
+    period_coupon = 100 * coupon / frequency
+    accrued = period_coupon * (1 - w)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if guess is None:
+            # the usual yield approximation: coupon plus straight-line pull to par over the average price
+            guess = (100 * coupon + (100 - price) / maturity) / ((100 + price) / 2)
+        y = np.clip(np.where(np.isfinite(guess), guess, 0.05), MIN_YIELD, MAX_YIELD)
+        solvable = (maturity > 0) & (price > 0) & np.isfinite(coupon) & (coupon >= 0)
+
+    y = np.where(solvable, y, np.nan)
+    lo = np.full(y.shape, MIN_YIELD)
+    hi = np.full(y.shape, MAX_YIELD)
+    converged = np.zeros(y.shape, dtype=bool)
+    active = np.flatnonzero(solvable)
+
+    # Newton steps on the clean price, falling back to bisection whenever a step leaves the bracket
+    for _ in range(max_iter):
+        if len(active) == 0:
+            break
+        ya, na, wa, ca = y[active], n[active], w[active], period_coupon[active]
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            v = 1 / (1 + ya / frequency)
+            s0, s1, _ = _power_sums(v, na)
+            vw, vlast = v ** wa, v ** (na - 1)
+            diff = vw * (ca * s0 + 100 * vlast) - accrued[active] - price[active]
+            slope = -v * vw * (ca * (wa * s0 + s1) + 100 * (wa + na - 1) * vlast) / frequency
+            step = ya - diff / slope
+        done = np.abs(diff) < tol * np.maximum(price[active], 1.0)
+        converged[active[done]] = True
+
+        # price falls as yield rises
+        lo[active] = np.where(diff > 0, ya, lo[active])
+        hi[active] = np.where(diff < 0, ya, hi[active])
+        bisect = ~np.isfinite(step) | (step <= lo[active]) | (step >= hi[active])
+        step = np.where(bisect, 0.5 * (lo[active] + hi[active]), step)
+
+        y[active] = np.where(done, ya, step)
+        active = active[~done]
+
+    y[~converged] = np.nan
+    return _shaped(y, shape), _shaped(converged, shape)
+
+
+def price_book(bonds_df, frequency=FREQUENCY):
+    price = bonds_df['price'].to_numpy(float)
+    coupon = bonds_df['coupon_pct'].to_numpy(float) / 100
+    maturity = bonds_df['maturity_years'].to_numpy(float)
+    quoted = bonds_df['yield_pct'].to_numpy(float) / 100
+
+    ytm, converged = yield_to_maturity(price, coupon, maturity, frequency, guess=quoted)
+    # risk at the solved yield, or at the quoted one where the solve fails
+    risk = bond_risk(np.where(converged, ytm, quoted), coupon, maturity, frequency)
+
+    return pd.DataFrame({
+        'ytm_pct': ytm * 100,
+        'ytm_converged': converged,
+        'ytm_gap': (ytm - quoted) * 100,
+        'macaulay_duration': risk['macaulay_duration'],
+        'modified_duration': risk['modified_duration'],
+        'convexity': risk['convexity'],
+        'dv01': risk['dv01']
+    }, index=bonds_df.index)
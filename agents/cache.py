@@ -0,0 +1,173 @@
+import copy
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+MISSING = object()
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_cache(path, **options):
+    key = os.path.abspath(path)
+    with _caches_lock:
+        if key not in _caches:
+            try:
+                _caches[key] = TieredCache(path, **options)
+            except (OSError, sqlite3.Error):
+                # no writable cache directory, keep results for this process only
+                _caches[key] = TieredCache(None, **options)
+        return _caches[key]
+
+
+def shared_result_cache(store):
+    return get_cache(os.path.join(store.cache_dir, 'results.sqlite'), ttl=None)
+
+
+def shared_explanation_cache(store):
+    return get_cache(os.path.join(store.cache_dir, 'explanations.sqlite'))
+
+
+def memoize_result(cache, key, compute):
+    if not cache or key is None:
+        return compute()
+    # callers annotate the result dicts they get back, never hand out the cached object itself
+    return copy.deepcopy(cache.get_or_compute(key, compute))
+
+
+class TieredCache:
+    def __init__(self, path=None, max_items=512, max_disk_items=10_000, ttl=24 * 3600):
+        self.path = path
+        self.max_items = max_items
+        self.max_disk_items = max_disk_items
+        self.ttl = ttl
+        self._memory = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._db = None
+        if path:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS entries '
+                '(key TEXT PRIMARY KEY, value BLOB, created REAL, accessed REAL)'
+            )
+            self._db.execute('CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)')
+
+    def get(self, key, default=None):
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                created, value = entry
+                if not self._expired(created, now):
+                    self._memory.move_to_end(key)
+                    self.memory_hits += 1
+                    return value
+                del self._memory[key]
+
+            if self._db is None:
+                self.misses += 1
+                return default
+            row = self._db.execute('SELECT value, created FROM entries WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return default
+            if self._expired(row[1], now):
+                self._db.execute('DELETE FROM entries WHERE key = ?', (key,))
+                self.misses += 1
+                return default
+            self._db.execute('UPDATE entries SET accessed = ? WHERE key = ?', (now, key))
+            value = pickle.loads(row[0])
+            self._remember(key, row[1], value)
+            self.disk_hits += 1
+            return value
+
+    def set(self, key, value):
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, value)
+            if self._db is None:
+                return
+            self._db.execute(
+                'INSERT OR REPLACE INTO entries (key, value, created, accessed) VALUES (?, ?, ?, ?)',
+                (key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), now, now)
+            )
+            self._writes += 1
+            if self._writes % 100 == 1:
+                self._evict_disk(now)
+
+    def get_or_compute(self, key, compute):
+        value = self.get(key, MISSING)
+        if value is not MISSING:
+            return value
+
+        with self._lock:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self._inflight[key] = Future()
+        if not owner:
+            # another caller is already fetching this key, share its result
+            return future.result()
+
+        try:
+            value = compute()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            self.set(key, value)
+            future.set_result(value)
+            return value
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            lookups = hits + self.misses
+            return {
+                'hits': hits,
+                'memory_hits': self.memory_hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_rate': hits / lookups if lookups else 0.0,
+                'memory_items': len(self._memory)
+            }
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute('DELETE FROM entries')
+
+    def _expired(self, created, now):
+        return self.ttl is not None and now - created > self.ttl
+
+    def _remember(self, key, created, value):
+        self._memory[key] = (created, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_items:
+            self._memory.popitem(last=False)
+
+    def _evict_disk(self, now):
+        if self.ttl is not None:
+            self._db.execute('DELETE FROM entries WHERE created < ?', (now - self.ttl,))
+        self._db.execute(
+            'DELETE FROM entries WHERE key IN (SELECT key FROM entries ORDER BY accessed DESC LIMIT -1 OFFSET ?)',
+            (self.max_disk_items,)
+        )
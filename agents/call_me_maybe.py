@@ -1,42 +1,158 @@
+import numpy as np
 import pandas as pd
 from statistics import median, stdev
+from .cache import memoize_result, shared_result_cache
+from .data_store import get_store
+from .contract_index import ContractIndex, format_identifier, parse_identifier
+from .hot_reload import KEY_COLUMNS, DataLock, keyed_update, reads_data, writes_data
+from .instrumentation import NULL_TIMER, start_timer
+from .pricing import price_chain
+from .results import RESULTS_TAG, DerivativeResult
+from .schema import row_dict
+from .vol_surface import VolSurface
 
 class CallMeMaybe:
-    def __init__(self):
-        self.derivatives_df = pd.read_csv('data/derivatives.csv')
+    def __init__(self, use_model_iv=False, risk_free_rate=0.0435, use_surface=False, store=None, result_cache=None,
+                 load_frame=True):
+        self.store = store or get_store()
+        self.data_lock = DataLock()
+        self.result_cache = shared_result_cache(self.store) if result_cache is None else result_cache
+        self.use_model_iv = use_model_iv
+        self.risk_free_rate = risk_free_rate
+        self.use_surface = use_surface
+        self.contract_index = None
+        self.vol_surface = None
+        self._derivatives_df = None
+        if load_frame:
+            self.derivatives_df = self.store.frame('derivatives')
     
-    def get_peers(self, derivative):
-        peers = self.derivatives_df[
-            (self.derivatives_df['underlying'] == derivative['underlying']) &
-            (self.derivatives_df['type'] == derivative['type']) &
-            (abs(self.derivatives_df['strike'] - derivative['strike']) <= derivative['strike'] * 0.1)
-        ]
-        peers = peers[
-            (peers['strike'] != derivative['strike']) |
-            (peers['expiry_days'] != derivative['expiry_days'])
-        ]
-        return peers
+    @property
+    def derivatives_df(self):
+        return self._derivatives_df
     
-    def analyze(self, identifier):
-        parts = identifier.split('_')
-        if len(parts) != 3:
-            raise ValueError("Format: UNDERLYING_type_strike")
-        
-        underlying, opt_type, strike = parts[0], parts[1], float(parts[2])
-        
-        derivative_row = self.derivatives_df[
-            (self.derivatives_df['underlying'] == underlying) &
-            (self.derivatives_df['type'] == opt_type) &
-            (self.derivatives_df['strike'] == strike)
-        ]
+    @derivatives_df.setter
+    @writes_data
+    def derivatives_df(self, df):
+        self._derivatives_df = df
+        self._pricing = None
+        if self.contract_index is None:
+            self.contract_index = ContractIndex(df)
+            self.vol_surface = VolSurface(df)
+        else:
+            self.contract_index.sync(df)
+            self.vol_surface.sync(df)
+    
+    @writes_data
+    def refresh(self, df, diff=None, benchmarks=None):
+        previous_df, previous = self.derivatives_df, self._pricing
+        self.derivatives_df = df
+        if previous is not None and diff is not None:
+            keys = pd.MultiIndex.from_frame(df[KEY_COLUMNS['derivatives']])
+            stale = keys.isin(diff['added'].append(diff['changed']))
+            self._pricing = keyed_update(
+                previous, previous_df, df, KEY_COLUMNS['derivatives'], stale,
+                lambda rows: price_chain(df.iloc[rows], rate=self.risk_free_rate)
+            )
+    
+    @reads_data
+    def identifiers(self):
+        df = self.derivatives_df
+        return [format_identifier(*contract) for contract in
+                zip(df['underlying'], df['type'], df['strike'], df['expiry_days'])]
+    
+    @reads_data
+    def price_all(self):
+        if self._pricing is None:
+            self._pricing = price_chain(self.derivatives_df, rate=self.risk_free_rate)
+        return self._pricing
+    
+    @reads_data
+    def surface_signals(self):
+        return self.vol_surface.signals(self.derivatives_df)
+    
+    @reads_data
+    def analyze_all(self):
+        pricing = self.price_all() if self.use_model_iv else None
+        return self._vector_analyze(self.derivatives_df, self.vol_surface, pricing)
+    
+    def _vector_analyze(self, rows, surface, pricing=None):
+        iv = rows['implied_vol'].to_numpy(float)
+        if pricing is not None:
+            iv = np.where(pricing['iv_converged'].to_numpy(bool), pricing['solved_iv'].to_numpy(float), iv)
+        hist_vol = rows['historical_vol'].to_numpy(float)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            iv_premium = ((iv - hist_vol) / hist_vol) * 100
         
-        if derivative_row.empty:
-            raise ValueError("Derivative not found")
+        # same thresholds as _analyze, applied in the same order
+        verdict = np.select([iv_premium > 50, iv_premium < -10], ['OVERVALUED', 'UNDERVALUED'], 'FAIRLY_VALUED').astype(object)
+        confidence = np.select([iv_premium > 50, iv_premium < -10], [80, 75], 65)
+        signals = surface.signals(rows) if self.use_surface else pd.DataFrame(index=rows.index)
+        if self.use_surface:
+            fair = verdict == 'FAIRLY_VALUED'
+            signal = signals['surface_signal'].to_numpy(object)
+            verdict[fair & (signal == 'RICH')] = 'OVERVALUED'
+            verdict[fair & (signal == 'CHEAP')] = 'UNDERVALUED'
+            confidence[fair & (signal != 'IN_LINE')] = 60
+        massive = iv_premium > 100
+        verdict[massive] = 'MASSIVELY_OVERPRICED'
+        confidence[massive] = 95
         
-        derivative = derivative_row.iloc[0].to_dict()
-        peers = self.get_peers(derivative)
+        out = pd.DataFrame({
+            'identifier': [format_identifier(*contract) for contract in
+                           zip(rows['underlying'], rows['type'], rows['strike'], rows['expiry_days'])],
+            'underlying': rows['underlying'].to_numpy(object),
+            'type': rows['type'].to_numpy(object)
+        }, index=rows.index)
+        out['implied_vol'] = iv
+        out['historical_vol'] = hist_vol
+        out['iv_premium'] = iv_premium
+        for column in signals.columns:
+            out[column] = signals[column].to_numpy()
+        out['verdict'] = verdict
+        out['confidence'] = confidence
+        return out
+    
+    def peer_positions(self, derivative):
+        return self.contract_index.peer_positions(
+            derivative['underlying'], derivative['type'], derivative['strike'], derivative['expiry_days']
+        )
+    
+    @reads_data
+    def get_peers(self, derivative):
+        return self.derivatives_df.iloc[self.peer_positions(derivative)]
+    
+    @reads_data
+    def analyze(self, identifier):
+        timer = start_timer('CallMeMaybe')
+        result = memoize_result(self.result_cache, self.result_key(identifier), lambda: self._analyze(identifier, timer))
+        return timer.attach(result)
+    
+    def result_key(self, identifier):
+        if self.derivatives_df is not self.store.frame('derivatives'):
+            return None
+        return (f"CallMeMaybe|{identifier}|model_iv={self.use_model_iv}|rate={self.risk_free_rate!r}|"
+                f"surface={self.use_surface}/{self.vol_surface.rich_threshold!r}|{self.store.version('derivatives')}|"
+                f"{RESULTS_TAG}")
+    
+    def _analyze(self, identifier, timer=NULL_TIMER):
+        with timer.stage('row_lookup'):
+            underlying, opt_type, strike, expiry_days = parse_identifier(identifier)
+            
+            position = self.contract_index.find(underlying, opt_type, strike, expiry_days)
+            if position is None:
+                raise ValueError("Derivative not found")
+            
+            derivative = row_dict(self.derivatives_df, position)
+        with timer.stage('get_peers'):
+            peer_positions = self.peer_positions(derivative)
         
         iv = derivative['implied_vol']
+        model = None
+        if self.use_model_iv:
+            with timer.stage('model_iv'):
+                model = price_chain(self.derivatives_df.iloc[[position]], rate=self.risk_free_rate).iloc[0].to_dict()
+            if model['iv_converged']:
+                iv = model['solved_iv']
         hist_vol = derivative['historical_vol']
         iv_premium = ((iv - hist_vol) / hist_vol) * 100
         
@@ -50,15 +166,27 @@ class CallMeMaybe:
             verdict = 'FAIRLY_VALUED'
             confidence = 65
         
+        surface = None
+        if self.use_surface:
+            with timer.stage('vol_surface'):
+                surface = self.vol_surface.compare(derivative)
+        if surface is not None and verdict == 'FAIRLY_VALUED':
+            if surface['signal'] == 'RICH':
+                verdict = 'OVERVALUED'
+                confidence = 60
+            elif surface['signal'] == 'CHEAP':
+                verdict = 'UNDERVALUED'
+                confidence = 60
+        
         if iv_premium > 100:
             verdict = 'MASSIVELY_OVERPRICED'
             confidence = 95
         
-        return {
-            'agent': 'CallMeMaybe',
-            'instrument_type': 'derivative',
-            'derivative': derivative,
-            'peers': peers,
-            'verdict': verdict,
-            'confidence': confidence
-        }
\ No newline at end of file
+        return DerivativeResult(
+            self.derivatives_df, position, peer_positions,
+            agent='CallMeMaybe',
+            verdict=verdict,
+            confidence=confidence,
+            model=model,
+            surface=surface
+        )
\ No newline at end of file
@@ -0,0 +1,97 @@
+import numpy as np
+
+from .peer_index import _GroupedIndex
+
+
+def format_identifier(underlying, opt_type, strike, expiry_days):
+    # the shortest text that reads back as the same strike; whole strikes keep their legacy form
+    strike = repr(float(strike))
+    if strike.endswith('.0'):
+        strike = strike[:-2]
+    return f"{underlying}_{opt_type}_{strike}_{int(expiry_days)}"
+
+
+def parse_identifier(identifier):
+    parts = identifier.rsplit('_', 3)
+    if len(parts) == 4:
+        try:
+            return parts[0], parts[1], float(parts[2]), float(parts[3])
+        except ValueError:
+            pass
+    parts = identifier.rsplit('_', 2)
+    if len(parts) == 3:
+        try:
+            return parts[0], parts[1], float(parts[2]), None
+        except ValueError:
+            pass
+    raise ValueError("Format: UNDERLYING_type_strike_expiry")
+
+
+class ContractIndex(_GroupedIndex):
+    def __init__(self, df, strike_window=0.1):
+        self.strike_window = strike_window
+        super().__init__(df, 'underlying', 'type', ('strike', 'expiry_days'))
+
+    def _build_group(self, df, positions):
+        return _UnderlyingGroup(df, positions)
+
+    def find(self, underlying, opt_type, strike, expiry_days=None):
+        chain = self._groups.get(underlying)
+        if chain is None:
+            return None
+        if expiry_days is not None:
+            return chain.contracts.get((opt_type, float(strike), float(expiry_days)))
+
+        strikes = chain.strikes.get(opt_type)
+        if strikes is None:
+            return None
+        sorted_strikes, positions, expiries = strikes
+        lo = np.searchsorted(sorted_strikes, strike, 'left')
+        hi = np.searchsorted(sorted_strikes, strike, 'right')
+        if lo == hi:
+            return None
+        available = sorted(set(expiries[lo:hi].tolist()))
+        if len(available) > 1:
+            listed = ', '.join(f"{e:g}" for e in available)
+            raise ValueError(f"Ambiguous contract: expiries {listed} share this strike, use UNDERLYING_type_strike_expiry")
+        return int(positions[lo:hi].min())
+
+    def peer_positions(self, underlying, opt_type, strike, expiry_days):
+        chain = self._groups.get(underlying)
+        if chain is None or opt_type not in chain.strikes:
+            return np.empty(0, dtype=int)
+        sorted_strikes, positions, expiries = chain.strikes[opt_type]
+
+        width = abs(strike) * self.strike_window
+        lo = np.searchsorted(sorted_strikes, strike - width - 1e-9, 'left')
+        hi = np.searchsorted(sorted_strikes, strike + width + 1e-9, 'right')
+        window = slice(lo, hi)
+        # the slice only narrows the range, the original predicates decide membership
+        keep = np.abs(sorted_strikes[window] - strike) <= strike * self.strike_window
+        keep &= (sorted_strikes[window] != strike) | (expiries[window] != expiry_days)
+        return np.sort(positions[window][keep])
+
+
+class _UnderlyingGroup:
+    def __init__(self, df, positions):
+        positions = np.asarray(positions)
+        types = df['type'].to_numpy(object)[positions]
+        strikes = df['strike'].to_numpy(float)[positions]
+        expiries = df['expiry_days'].to_numpy(float)[positions]
+
+        self.contracts = {}
+        for key, position in zip(zip(types.tolist(), strikes.tolist(), expiries.tolist()), positions.tolist()):
+            self.contracts.setdefault(key, position)
+
+        self.strikes = {}
+        for opt_type in dict.fromkeys(types.tolist()):
+            rows = np.flatnonzero(types == opt_type)
+            order = rows[np.argsort(strikes[rows], kind='stable')]
+            self.strikes[opt_type] = (strikes[order], positions[order], expiries[order])
+
+    def relocate(self, remap):
+        keys = list(self.contracts)
+        moved = remap(np.array([self.contracts[key] for key in keys], dtype=int)).tolist()
+        self.contracts = dict(zip(keys, moved))
+        self.strikes = {opt_type: (strikes, remap(positions), expiries)
+                        for opt_type, (strikes, positions, expiries) in self.strikes.items()}
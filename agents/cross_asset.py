@@ -0,0 +1,147 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from .contract_index import format_identifier
+from .instrumentation import start_timer
+
+ASSETS = ('equity', 'bond', 'derivative')
+# +1 the instrument looks rich, -1 cheap; other verdicts say nothing about direction
+DIRECTIONS = {
+    'OVERVALUED': 1, 'EXTREMELY_OVERVALUED': 1, 'MASSIVELY_OVERPRICED': 1,
+    'UNDERVALUED': -1,
+    'FAIRLY_VALUED': 0, 'NEUTRAL': 0
+}
+CALL_THRESHOLD = 1 / 3
+
+
+def _matching(values, test):
+    # evaluate the string test once per category instead of once per row
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        hits = np.flatnonzero(test(values.cat.categories.astype(str).to_numpy(object)))
+        return np.flatnonzero(np.isin(values.cat.codes.to_numpy(), hits))
+    return np.flatnonzero(test(values.astype(str).to_numpy(object)))
+
+
+def _issued_by(issuers, names):
+    # bond issuers carry their maturity year: 'Apple Inc 2030' is issued by 'apple' and 'apple inc'
+    base = pd.Series(issuers).str.replace(r'\s+\d{4}$', '', regex=True).str.strip().str.lower()
+    return (base.isin(names) | base.str.startswith(tuple(name + ' ' for name in names))).to_numpy(bool)
+
+
+def _call(score):
+    return 1 if score >= CALL_THRESHOLD else -1 if score <= -CALL_THRESHOLD else 0
+
+
+def combine_verdicts(results):
+    # confidence-weighted vote per asset class, then each asset class counts once
+    scores = {}
+    for asset in ASSETS:
+        votes = [(DIRECTIONS[r['verdict']], r['confidence']) for r in results.get(asset, [])
+                 if r['verdict'] in DIRECTIONS and r['confidence'] > 0]
+        weight = sum(confidence for _, confidence in votes)
+        if weight:
+            scores[asset] = sum(direction * confidence for direction, confidence in votes) / weight
+    if not scores:
+        return {'verdict': 'INSUFFICIENT_DATA', 'confidence': 0, 'score': None, 'asset_scores': scores}
+
+    score = sum(scores.values()) / len(scores)
+    calls = [_call(s) for s in scores.values()]
+    direction = _call(score)
+    if direction == 0 and 1 in calls and -1 in calls:
+        verdict, direction = 'MIXED', None
+    else:
+        verdict = {1: 'OVERVALUED', -1: 'UNDERVALUED', 0: 'FAIRLY_VALUED'}[direction]
+
+    # the agreeing results' confidence, scaled down by the share of asset classes that disagree
+    if direction is None:
+        confidence = 0
+    else:
+        agreeing = [r['confidence'] for asset in scores for r in results[asset]
+                    if DIRECTIONS.get(r['verdict']) == direction and r['confidence'] > 0]
+        share = calls.count(direction) / len(calls)
+        confidence = int(round(share * sum(agreeing) / len(agreeing))) if agreeing else 0
+    return {'verdict': verdict, 'confidence': confidence, 'score': score, 'asset_scores': scores}
+
+
+class CrossAssetAnalyzer:
+    def __init__(self, agents, insight_gen=None, workers=8):
+        self.agents = agents
+        self.insight_gen = insight_gen
+        self.workers = workers
+
+    def resolve(self, query):
+        # a ticker or company name; bonds match the company name, options the ticker
+        query = query.strip()
+        equities = self.agents['stonker'].equities_df
+        upper, lower = query.upper(), query.lower()
+        positions = _matching(equities['ticker'], lambda v: np.char.upper(v.astype(str)) == upper)
+        if len(positions) == 0:
+            positions = _matching(equities['company'], lambda v: np.char.lower(v.astype(str)) == lower)
+
+        tickers = list(dict.fromkeys(equities['ticker'].to_numpy(object)[positions].tolist())) or [upper]
+        names = {lower, *(name.lower() for name in tickers)}
+        names.update(str(company).lower() for company in equities['company'].to_numpy(object)[positions])
+
+        issuers = self.agents['bond007'].bonds_df['issuer']
+        bonds = issuers.to_numpy(object)[_matching(issuers, lambda v: _issued_by(v, names))]
+        derivatives = self.agents['call_me_maybe'].derivatives_df
+        rows = derivatives.iloc[_matching(derivatives['underlying'], lambda v: np.isin(v, tickers))]
+        return {
+            'equity': tickers if len(positions) else [],
+            'bond': list(dict.fromkeys(bonds.tolist())),
+            'derivative': list(dict.fromkeys(
+                format_identifier(*contract)
+                for contract in zip(rows['underlying'], rows['type'], rows['strike'], rows['expiry_days'])
+            ))
+        }
+
+    def analyze(self, query, explain=True):
+        timer = start_timer('CrossAsset')
+        with timer.stage('resolve'):
+            identifiers = self.resolve(query)
+        if not any(identifiers.values()):
+            raise ValueError(f"No equities, bonds or options found for '{query}'")
+
+        agent_keys = {'equity': 'stonker', 'bond': 'bond007', 'derivative': 'call_me_maybe'}
+        explain = explain and self.insight_gen is not None
+        explanations = []
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            def run(asset):
+                # one agent per task, so the three run side by side; each result is explained as soon as it lands
+                started = time.perf_counter()
+                results, errors = [], {}
+                for identifier in identifiers[asset]:
+                    try:
+                        result = self.agents[agent_keys[asset]].analyze(identifier)
+                    except ValueError as e:
+                        errors[identifier] = str(e)
+                        continue
+                    results.append(result)
+                    if explain:
+                        explanations.append((result, pool.submit(self.insight_gen.generate_explanation, result)))
+                return results, errors, time.perf_counter() - started
+
+            futures = {asset: pool.submit(run, asset) for asset in ASSETS if identifiers[asset]}
+            outcomes = {asset: future.result() for asset, future in futures.items()}
+            # every analysis has finished, so the list of explanation futures is complete
+            for result, future in explanations:
+                result['explanation'] = future.result()
+
+        results = {asset: outcomes[asset][0] if asset in outcomes else [] for asset in ASSETS}
+        combined = {
+            'agent': 'CrossAsset',
+            'query': query,
+            **combine_verdicts(results),
+            'identifiers': identifiers,
+            **results,
+            'errors': {asset: outcome[1] for asset, outcome in outcomes.items() if outcome[1]}
+        }
+        timer.attach(combined)
+        # wall time per agent; the total is close to the slowest of them, not their sum
+        combined.setdefault('timings', {}).update({
+            asset: {'ms': 1000 * outcome[2], 'calls': len(identifiers[asset])} for asset, outcome in outcomes.items()
+        })
+        return combined
@@ -0,0 +1,223 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+
+import numpy as np
+import pandas as pd
+
+from .schema import SCHEMA_VERSION, apply_schema, memory_report
+
+DATASETS = {
+    'equities': 'equities.csv',
+    'bonds': 'bonds.csv',
+    'derivatives': 'derivatives.csv'
+}
+BENCHMARKS = 'industry_benchmarks.json'
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(data_dir='data', cache_dir=None):
+    key = (os.path.abspath(data_dir), cache_dir)
+    with _stores_lock:
+        if key not in _stores:
+            _stores[key] = DataStore(data_dir, cache_dir)
+        return _stores[key]
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class DataStore:
+    def __init__(self, data_dir='data', cache_dir=None):
+        self.data_dir = data_dir
+        self.cache_dir = cache_dir or os.path.join(data_dir, '.cache')
+        self._frames = {}
+        self._versions = {}
+        self._stats = {}
+        self._benchmarks = None
+        self._lock = threading.RLock()
+
+    def source_path(self, name):
+        return os.path.join(self.data_dir, DATASETS[name])
+
+    def frame(self, name):
+        with self._lock:
+            if name not in self._frames:
+                self._frames[name], self._versions[name] = self._load(name)
+            return self._frames[name]
+
+    @property
+    def benchmarks(self):
+        with self._lock:
+            if self._benchmarks is None:
+                self._benchmarks, self._versions['benchmarks'] = self._load_benchmarks()
+            return self._benchmarks
+
+    def _load_benchmarks(self):
+        path = self.benchmarks_path()
+        stat = os.stat(path)
+        with open(path) as f:
+            benchmarks = json.load(f)
+        self._stats['benchmarks'] = (stat.st_size, stat.st_mtime_ns)
+        return benchmarks, file_digest(path)
+
+    def memory_report(self):
+        return memory_report({name: self.frame(name) for name in DATASETS})
+
+    def benchmarks_path(self):
+        return os.path.join(self.data_dir, BENCHMARKS)
+
+    def changed_sources(self):
+        changed = []
+        with self._lock:
+            for name in [*self._frames, *(['benchmarks'] if self._benchmarks is not None else [])]:
+                path = self.benchmarks_path() if name == 'benchmarks' else self.source_path(name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                if self._stats.get(name) != (stat.st_size, stat.st_mtime_ns):
+                    changed.append(name)
+        return changed
+
+    def reload(self, name):
+        with self._lock:
+            old = self.frame(name)
+            new, version = self._load(name)
+            if version == self._versions[name]:
+                return None
+            self._frames[name], self._versions[name] = new, version
+            return old, new
+
+    def reload_benchmarks(self):
+        with self._lock:
+            benchmarks, version = self._load_benchmarks()
+            if version == self._versions.get('benchmarks'):
+                return None
+            self._benchmarks, self._versions['benchmarks'] = benchmarks, version
+            return benchmarks
+
+    def version(self, name=None):
+        if name is None:
+            for dataset in DATASETS:
+                self.frame(dataset)
+            self.benchmarks
+            combined = '|'.join(f"{key}={self._versions[key]}" for key in sorted(self._versions))
+            return hashlib.sha256(combined.encode()).hexdigest()
+        if name == 'benchmarks':
+            self.benchmarks
+        else:
+            self.frame(name)
+        return self._versions[name]
+
+    def _load(self, name):
+        source = self.source_path(name)
+        stat = os.stat(source)
+        self._stats[name] = (stat.st_size, stat.st_mtime_ns)
+        pointer = self._read_pointer(name)
+        if (pointer and pointer['size'] == stat.st_size and pointer['mtime_ns'] == stat.st_mtime_ns
+                and pointer.get('schema') == SCHEMA_VERSION):
+            frame = self._open_columns(os.path.join(self.cache_dir, pointer['directory']))
+            if frame is not None:
+                return frame, pointer['sha256']
+
+        sha256 = file_digest(source)
+        df = apply_schema(name, pd.read_csv(source), source)
+        try:
+            directory = self._write_columns(name, df, sha256)
+            self._write_pointer(name, {
+                'size': stat.st_size,
+                'mtime_ns': stat.st_mtime_ns,
+                'sha256': sha256,
+                'schema': SCHEMA_VERSION,
+                'directory': directory
+            })
+            frame = self._open_columns(os.path.join(self.cache_dir, directory))
+        except OSError:
+            # a read-only data directory still works, just without the binary cache
+            frame = None
+        return (frame if frame is not None else df), sha256
+
+    def _pointer_path(self, name):
+        return os.path.join(self.cache_dir, f"{name}.json")
+
+    def _read_pointer(self, name):
+        try:
+            with open(self._pointer_path(name)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_pointer(self, name, pointer):
+        fd, tmp = tempfile.mkstemp(dir=self.cache_dir, suffix='.json')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(pointer, f)
+        os.replace(tmp, self._pointer_path(name))
+        for entry in os.listdir(self.cache_dir):
+            if entry.startswith(f"{name}-") and entry != pointer['directory']:
+                shutil.rmtree(os.path.join(self.cache_dir, entry), ignore_errors=True)
+
+    def _write_columns(self, name, df, sha256):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        directory = f"{name}-{sha256[:16]}-v{SCHEMA_VERSION}"
+        target = os.path.join(self.cache_dir, directory)
+        if os.path.isdir(target):
+            return directory
+
+        tmp = tempfile.mkdtemp(dir=self.cache_dir, prefix='.tmp-')
+        columns = []
+        for i, column in enumerate(df.columns):
+            values = df[column]
+            if isinstance(values.dtype, pd.CategoricalDtype):
+                np.save(os.path.join(tmp, f"{i}.codes.npy"), values.cat.codes.to_numpy().astype(np.int32))
+                np.save(os.path.join(tmp, f"{i}.categories.npy"), np.asarray(values.cat.categories, dtype=str))
+                columns.append({'name': column, 'kind': 'category'})
+            elif values.dtype == object:
+                codes, categories = pd.factorize(values)
+                np.save(os.path.join(tmp, f"{i}.codes.npy"), codes.astype(np.int32))
+                np.save(os.path.join(tmp, f"{i}.categories.npy"), np.asarray(categories, dtype=str))
+                columns.append({'name': column, 'kind': 'string'})
+            else:
+                np.save(os.path.join(tmp, f"{i}.npy"), values.to_numpy())
+                columns.append({'name': column, 'kind': 'numeric'})
+        with open(os.path.join(tmp, 'columns.json'), 'w') as f:
+            json.dump({'rows': len(df), 'columns': columns}, f)
+
+        try:
+            os.rename(tmp, target)
+        except OSError:
+            # another process finished the same cache first
+            shutil.rmtree(tmp, ignore_errors=True)
+        return directory
+
+    def _open_columns(self, directory):
+        try:
+            with open(os.path.join(directory, 'columns.json')) as f:
+                layout = json.load(f)
+            data = {}
+            for i, column in enumerate(layout['columns']):
+                if column['kind'] == 'category':
+                    codes = np.load(os.path.join(directory, f"{i}.codes.npy"), mmap_mode='r')
+                    categories = np.load(os.path.join(directory, f"{i}.categories.npy")).astype(object)
+                    data[column['name']] = pd.Categorical.from_codes(codes, categories=categories)
+                elif column['kind'] == 'string':
+                    codes = np.load(os.path.join(directory, f"{i}.codes.npy"), mmap_mode='r')
+                    categories = np.load(os.path.join(directory, f"{i}.categories.npy"))
+                    values = categories.astype(object)[codes]
+                    values[codes < 0] = np.nan
+                    data[column['name']] = values
+                else:
+                    data[column['name']] = np.load(os.path.join(directory, f"{i}.npy"), mmap_mode='r')
+        except (OSError, ValueError, KeyError):
+            return None
+        return pd.DataFrame(data, copy=False)
@@ -0,0 +1,177 @@
+import functools
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+KEY_COLUMNS = {
+    'equities': ['ticker'],
+    'bonds': ['issuer'],
+    'derivatives': ['underlying', 'type', 'strike', 'expiry_days']
+}
+GROUP_COLUMNS = {
+    'equities': 'sector',
+    'bonds': 'sector',
+    'derivatives': 'underlying'
+}
+AGENTS = {
+    'equities': 'stonker',
+    'bonds': 'bond007',
+    'derivatives': 'call_me_maybe'
+}
+
+
+class DataLock:
+    # analyses share an agent freely; a reload waits for them, swaps frames and indexes alone,
+    # and new analyses wait for the swap, so none sees a new frame against an old index
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._readers = 0
+        self._writer = None
+        self._waiting_writers = 0
+        self._local = threading.local()
+
+    @contextmanager
+    def reading(self):
+        depth = getattr(self._local, 'depth', 0)
+        # nested reads, and reads inside this thread's own reload, are already covered
+        if depth or self._writer == threading.get_ident():
+            self._local.depth = depth + 1
+            try:
+                yield
+            finally:
+                self._local.depth = depth
+            return
+
+        with self._condition:
+            while self._writer is not None or self._waiting_writers:
+                self._condition.wait()
+            self._readers += 1
+        self._local.depth = 1
+        try:
+            yield
+        finally:
+            self._local.depth = 0
+            with self._condition:
+                self._readers -= 1
+                if not self._readers:
+                    self._condition.notify_all()
+
+    @contextmanager
+    def writing(self):
+        me = threading.get_ident()
+        if self._writer == me:
+            yield
+            return
+        if getattr(self._local, 'depth', 0):
+            raise RuntimeError("Cannot reload an agent's data while reading it")
+
+        with self._condition:
+            self._waiting_writers += 1
+            try:
+                while self._writer is not None or self._readers:
+                    self._condition.wait()
+            finally:
+                self._waiting_writers -= 1
+            self._writer = me
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._writer = None
+                self._condition.notify_all()
+
+
+def reads_data(method):
+    @functools.wraps(method)
+    def locked(self, *args, **kwargs):
+        with self.data_lock.reading():
+            return method(self, *args, **kwargs)
+    return locked
+
+
+def writes_data(method):
+    @functools.wraps(method)
+    def locked(self, *args, **kwargs):
+        with self.data_lock.writing():
+            return method(self, *args, **kwargs)
+    return locked
+
+
+def _keys(df, key_columns):
+    return pd.MultiIndex.from_frame(df[key_columns])
+
+
+def diff_frames(old, new, key_columns, group_column):
+    old_keys, new_keys = _keys(old, key_columns), _keys(new, key_columns)
+    if not old_keys.is_unique or not new_keys.is_unique or list(old.columns) != list(new.columns):
+        groups = set(old[group_column].dropna()) | set(new[group_column].dropna())
+        return {'added': new_keys, 'removed': old_keys, 'changed': new_keys[:0], 'groups': groups, 'full': True}
+
+    old_hash = pd.Series(pd.util.hash_pandas_object(old, index=False).to_numpy(), index=old_keys)
+    new_hash = pd.Series(pd.util.hash_pandas_object(new, index=False).to_numpy(), index=new_keys)
+    added = new_keys.difference(old_keys)
+    removed = old_keys.difference(new_keys)
+    common = new_keys.intersection(old_keys)
+    changed = common[old_hash.loc[common].to_numpy() != new_hash.loc[common].to_numpy()]
+
+    touched_old = old_keys.isin(removed.append(changed))
+    touched_new = new_keys.isin(added.append(changed))
+    groups = set(old[group_column][touched_old].dropna()) | set(new[group_column][touched_new].dropna())
+    return {'added': added, 'removed': removed, 'changed': changed, 'groups': groups, 'full': False}
+
+
+def keyed_update(previous, previous_df, df, key_columns, stale, compute):
+    # reuse cached per-row results for rows whose key survived and that are not stale
+    previous_keys, keys = _keys(previous_df, key_columns), _keys(df, key_columns)
+    if not previous_keys.is_unique or not keys.is_unique:
+        return compute(np.arange(len(df)))
+
+    location = previous_keys.get_indexer(keys)
+    stale = np.asarray(stale, dtype=bool) | (location < 0)
+    kept = previous.iloc[location[~stale]]
+    kept.index = df.index[~stale]
+    fresh = compute(np.flatnonzero(stale))
+    if len(fresh) == 0:
+        return kept.reindex(df.index)
+    if len(kept) == 0:
+        return fresh.reindex(df.index)
+    return pd.concat([kept, fresh]).reindex(df.index)
+
+
+class HotReloader:
+    def __init__(self, store, agents):
+        self.store = store
+        self.agents = agents
+        self._lock = threading.Lock()
+
+    def check(self):
+        with self._lock:
+            changed = self.store.changed_sources()
+            if not changed:
+                return {}
+
+            summary = {}
+            benchmarks = self.store.reload_benchmarks() if 'benchmarks' in changed else None
+            if benchmarks is not None:
+                summary['benchmarks'] = {'reloaded': True}
+
+            for name, agent_key in AGENTS.items():
+                agent = self.agents.get(agent_key)
+                refreshed = self.store.reload(name) if name in changed else None
+                if refreshed is not None:
+                    old, new = refreshed
+                    diff = diff_frames(old, new, KEY_COLUMNS[name], GROUP_COLUMNS[name])
+                    summary[name] = {
+                        'added': len(diff['added']),
+                        'removed': len(diff['removed']),
+                        'changed': len(diff['changed']),
+                        'groups': sorted(map(str, diff['groups']))
+                    }
+                    if agent is not None:
+                        agent.refresh(new, diff, benchmarks)
+                elif benchmarks is not None and agent is not None and hasattr(agent, 'benchmarks'):
+                    agent.refresh(self.store.frame(name), None, benchmarks)
+
+            return summary
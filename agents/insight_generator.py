@@ -1,11 +1,19 @@
 import anthropic
+import hashlib
 import os
+from .cache import shared_explanation_cache
+from .batch_explainer import BatchExplainer
+from .data_store import get_store
+from .instrumentation import start_timer
 
 class InsightGenerator:
-    def __init__(self):
-        self.client = anthropic.Anthropic(api_key=os.environ.get("ANTHROPIC_API_KEY"))
+    def __init__(self, client=None, cache=None, model="claude-sonnet-4-20250514", max_tokens=200, store=None):
+        self.client = client or anthropic.Anthropic(api_key=os.environ.get("ANTHROPIC_API_KEY"))
+        self.cache = cache if cache is not None else shared_explanation_cache(store or get_store())
+        self.model = model
+        self.max_tokens = max_tokens
     
-    def generate_explanation(self, result):
+    def build_prompt(self, result):
         agent_names = {
             'bond': 'Bond007',
             'equity': 'Stonker',
@@ -36,20 +44,84 @@ Sector: {equity['sector']}"""
 Implied Vol: {deriv['implied_vol']:.2f}
 Historical Vol: {deriv['historical_vol']:.2f}"""
         
-        prompt = f"""You are {agent}, a witty financial analyst. Provide a 2-3 sentence gamified explanation.
+        return f"""You are {agent}, a witty financial analyst. Provide a 2-3 sentence gamified explanation.
 
 {context}
 
 Verdict: {verdict} ({confidence}% confidence)
 
 Style: Fun, emojis, accurate. Under 60 words."""
+    
+    def cache_key(self, prompt):
+        return hashlib.sha256(f"{self.model}|{self.max_tokens}|{prompt}".encode()).hexdigest()
+    
+    def fallback(self, result):
+        return f"{result['verdict'].replace('_', ' ').title()} with {result['confidence']}% confidence."
+    
+    def generate_explanation(self, result):
+        timer = start_timer('InsightGenerator')
+        
+        def request():
+            with timer.stage('llm_call'):
+                message = self.client.messages.create(
+                    model=self.model,
+                    max_tokens=self.max_tokens,
+                    messages=[{"role": "user", "content": prompt}]
+                )
+            return message.content[0].text
+        
+        # a result the prompt cannot be built from gets the fallback, like a failed call
+        try:
+            with timer.stage('prompt'):
+                prompt = self.build_prompt(result)
+            return self.cache.get_or_compute(self.cache_key(prompt), request)
+        except Exception as e:
+            return self.fallback(result)
+        finally:
+            timer.attach(result, prefix='explanation_')
+    
+    def generate_explanations(self, results, **options):
+        return BatchExplainer(self, **options).explain(list(results))
+    
+    def stream_explanation(self, result):
+        timer = start_timer('InsightGenerator')
+        try:
+            yield from self._stream_explanation(result, timer)
+        finally:
+            timer.attach(result, prefix='explanation_')
+    
+    def _stream_explanation(self, result, timer):
+        try:
+            with timer.stage('prompt'):
+                prompt = self.build_prompt(result)
+            key = self.cache_key(prompt)
+            cached = self.cache.get(key)
+        except Exception as e:
+            yield self.fallback(result)
+            return
+        
+        if cached is not None:
+            yield cached
+            return
         
+        # yields the text received so far, so a failed stream can be replaced by the fallback
+        text = ''
         try:
-            message = self.client.messages.create(
-                model="claude-sonnet-4-20250514",
-                max_tokens=200,
+            with timer.stage('llm_stream'), self.client.messages.stream(
+                model=self.model,
+                max_tokens=self.max_tokens,
                 messages=[{"role": "user", "content": prompt}]
-            )
-            return message.content[0].text
+            ) as stream:
+                for chunk in stream.text_stream:
+                    text += chunk
+                    yield text
+                if stream.current_message_snapshot.stop_reason is None:
+                    raise RuntimeError("stream ended before message_stop")
         except Exception as e:
-            return f"{verdict.replace('_', ' ').title()} with {confidence}% confidence."
+            yield self.fallback(result)
+            return
+        
+        if text:
+            self.cache.set(key, text)
+        else:
+            yield self.fallback(result)
@@ -0,0 +1,142 @@
+import os
+import threading
+import time
+from bisect import bisect_left
+
+# upper bounds in seconds, Prometheus style; the last bucket is +Inf
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_enabled = os.environ.get('OVER_UNDER_TIMINGS', '1').lower() not in ('0', 'false', 'off')
+
+
+def enabled():
+    return _enabled
+
+
+def set_enabled(flag):
+    global _enabled
+    _enabled = bool(flag)
+
+
+class Histograms:
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, agent, stage, seconds):
+        with self._lock:
+            series = self._series.get((agent, stage))
+            if series is None:
+                series = self._series[(agent, stage)] = {'buckets': [0] * (len(self.buckets) + 1), 'sum': 0.0, 'count': 0}
+            series['buckets'][bisect_left(self.buckets, seconds)] += 1
+            series['sum'] += seconds
+            series['count'] += 1
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+    def snapshot(self):
+        with self._lock:
+            return {key: {'buckets': list(s['buckets']), 'sum': s['sum'], 'count': s['count']}
+                    for key, s in self._series.items()}
+
+    def to_json(self):
+        series = []
+        for (agent, stage), s in sorted(self.snapshot().items()):
+            series.append({
+                'agent': agent,
+                'stage': stage,
+                'count': s['count'],
+                'sum_seconds': s['sum'],
+                'mean_ms': 1000 * s['sum'] / s['count'] if s['count'] else 0.0,
+                'buckets': dict(zip([*map(str, self.buckets), '+Inf'], s['buckets']))
+            })
+        return {'unit': 'seconds', 'series': series}
+
+    def to_prometheus(self, name='over_under_stage_seconds'):
+        lines = [f"# HELP {name} Wall time of each analysis stage.", f"# TYPE {name} histogram"]
+        for (agent, stage), s in sorted(self.snapshot().items()):
+            labels = f'agent="{agent}",stage="{stage}"'
+            cumulative = 0
+            for bound, count in zip([*map(repr, self.buckets), '+Inf'], s['buckets']):
+                cumulative += count
+                lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f"{name}_sum{{{labels}}} {s['sum']!r}")
+            lines.append(f"{name}_count{{{labels}}} {s['count']}")
+        return '\n'.join(lines) + '\n'
+
+
+histograms = Histograms()
+
+
+class _Stage:
+    __slots__ = ('timer', 'name', 'started')
+
+    def __init__(self, timer, name):
+        self.timer = timer
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.started
+        seconds, calls = self.timer.stages.get(self.name, (0.0, 0))
+        self.timer.stages[self.name] = (seconds + elapsed, calls + 1)
+        return False
+
+
+class StageTimer:
+    def __init__(self, agent):
+        self.agent = agent
+        self.stages = {}
+        self.started = time.perf_counter()
+
+    def stage(self, name):
+        return _Stage(self, name)
+
+    def finish(self):
+        self.stages['total'] = (time.perf_counter() - self.started, 1)
+        for stage, (seconds, _) in self.stages.items():
+            histograms.observe(self.agent, stage, seconds)
+        return {stage: {'ms': 1000 * seconds, 'calls': calls} for stage, (seconds, calls) in self.stages.items()}
+
+    def attach(self, result, prefix=''):
+        timings = self.finish()
+        target = result.setdefault('timings', {})
+        target.update({prefix + stage: timing for stage, timing in timings.items()})
+        return result
+
+
+class _NullStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class _NullTimer:
+    __slots__ = ()
+    _stage = _NullStage()
+
+    def stage(self, name):
+        return self._stage
+
+    def finish(self):
+        return {}
+
+    def attach(self, result, prefix=''):
+        return result
+
+
+NULL_TIMER = _NullTimer()
+
+
+def start_timer(agent):
+    return StageTimer(agent) if _enabled else NULL_TIMER
@@ -0,0 +1,105 @@
+import zlib
+
+import numpy as np
+import pandas as pd
+
+PERCENTILES = (5, 25, 50, 75, 95)
+ASSUMPTIONS = {
+    'discount_rate': 0.10,
+    'discount_sd': 0.015,
+    'growth_sd': 0.03,
+    'fcf_sd': 0.20,
+    'dividend_sd': 0.10
+}
+
+
+def _shocks(tickers, paths, seed):
+    # one stream per ticker, so a ticker gets the same paths alone or inside a batch
+    shocks = np.empty((4, len(tickers), paths))
+    for i, ticker in enumerate(tickers):
+        rng = np.random.default_rng([seed, zlib.crc32(str(ticker).encode())])
+        shocks[:, i] = rng.standard_normal((4, paths))
+    return shocks
+
+
+def _percentiles(values, percentiles):
+    # percentiles over the finite paths of each row, linear interpolation like np.percentile
+    ordered = np.sort(values, axis=1)
+    valid = np.isfinite(values).sum(axis=1)
+    result = np.full((len(values), len(percentiles)), np.nan)
+    has_paths = valid > 0
+    for j, q in enumerate(percentiles):
+        position = q / 100 * (valid[has_paths] - 1)
+        low = np.floor(position).astype(int)
+        high = np.minimum(low + 1, valid[has_paths] - 1)
+        rows = ordered[has_paths]
+        low_value = np.take_along_axis(rows, low[:, None], axis=1)[:, 0]
+        high_value = np.take_along_axis(rows, high[:, None], axis=1)[:, 0]
+        result[has_paths, j] = low_value + (high_value - low_value) * (position - low)
+    return result
+
+
+def simulate_fair_values(rows, paths=100_000, seed=0, percentiles=PERCENTILES, block_size=1_000_000, **assumptions):
+    settings = {**ASSUMPTIONS, **assumptions}
+    price = rows['price'].to_numpy(float)
+    shares = rows['shares_out_m'].to_numpy(float) * 1_000_000
+    eps = rows['net_income_b'].to_numpy(float) * 1_000_000_000 / shares
+    book_value_per_share = (rows['total_assets_b'].to_numpy(float) - rows['total_liabilities_b'].to_numpy(float)) * 1_000_000_000 / shares
+    fcf_per_share = rows['fcf_b'].to_numpy(float) * 1_000_000_000 / shares
+    dividend_per_share = price * rows['dividend_yield'].to_numpy(float) / 100
+    growth_rate = np.minimum(rows['eps_growth_5yr'].to_numpy(float) / 100, 0.25)
+    tickers = rows['ticker'].to_numpy()
+
+    # the Graham number has no uncertain input, it enters every path as in calculate_intrinsic_values
+    has_graham = (eps > 0) & (book_value_per_share > 0)
+    with np.errstate(invalid='ignore'):
+        graham = np.where(has_graham, np.sqrt(22.5 * eps * book_value_per_share), np.nan)
+    use_graham = has_graham & (graham != 0)
+
+    n = len(rows)
+    quantiles = np.full((n, len(percentiles)), np.nan)
+    mean = np.full(n, np.nan)
+    prob_undervalued = np.zeros(n)
+    valid_paths = np.zeros(n, dtype=int)
+
+    step = max(1, block_size // paths)
+    for start in range(0, n, step):
+        block = slice(start, min(start + step, n))
+        shock = _shocks(tickers[block], paths, seed)
+        discount = np.maximum(settings['discount_rate'] + settings['discount_sd'] * shock[0], 0.01)
+        growth = np.minimum(growth_rate[block, None] + settings['growth_sd'] * shock[1], 0.25)
+        # mean-preserving lognormal shocks on the cash flows
+        fcf = fcf_per_share[block, None] * np.exp(settings['fcf_sd'] * shock[2] - settings['fcf_sd'] ** 2 / 2)
+        dividend = dividend_per_share[block, None] * np.exp(settings['dividend_sd'] * shock[3] - settings['dividend_sd'] ** 2 / 2)
+        div_growth = np.minimum(growth, 0.06)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            use_dcf = (fcf > 0) & (growth < discount)
+            dcf = np.where(use_dcf, fcf * (1 + growth) / (discount - growth), 0.0)
+            use_gordon = (dividend > 0) & (div_growth < discount)
+            gordon = np.where(use_gordon, dividend * (1 + div_growth) / (discount - div_growth), 0.0)
+
+            total_weight = 0.3 * use_graham[block, None] + 0.5 * use_dcf + 0.2 * use_gordon
+            weighted = np.where(use_graham[block, None], 0.3 * graham[block, None], 0.0) + 0.5 * dcf + 0.2 * gordon
+            fair_value = np.where(total_weight > 0, weighted / total_weight, np.nan)
+
+        finite = np.isfinite(fair_value)
+        count = finite.sum(axis=1)
+        valid_paths[block] = count
+        with np.errstate(invalid='ignore'):
+            mean[block] = np.where(finite, fair_value, 0.0).sum(axis=1) / count
+            # out of the paths that produced a fair value, like the mean and percentiles
+            prob_undervalued[block] = (finite & (fair_value > price[block, None])).sum(axis=1) / count
+        quantiles[block] = _percentiles(fair_value, percentiles)
+
+    columns = {'ticker': tickers}
+    for j, q in enumerate(percentiles):
+        columns[f"fair_value_p{q:g}"] = quantiles[:, j]
+    columns.update({
+        'fair_value_mean': mean,
+        'current_price': price,
+        'prob_undervalued': prob_undervalued,
+        'valid_paths': valid_paths,
+        'paths': paths
+    })
+    return pd.DataFrame(columns, index=rows.index)
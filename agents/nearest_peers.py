@@ -0,0 +1,115 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+
+from .schema import find_rows
+
+RATING_SCALE = ['AAA', 'AA+', 'AA', 'AA-', 'A+', 'A', 'A-', 'BBB+', 'BBB', 'BBB-', 'BB+', 'BB', 'BB-',
+                'B+', 'B', 'B-', 'CCC+', 'CCC', 'CCC-', 'CC', 'C', 'D']
+
+
+def equity_features(df):
+    # market cap spans orders of magnitude, so it is compared on a log scale
+    with np.errstate(divide='ignore', invalid='ignore'):
+        market_cap = np.log(df['market_cap_b'].to_numpy(float))
+    return np.column_stack([
+        market_cap,
+        df['beta'].to_numpy(float),
+        df['revenue_growth_5yr'].to_numpy(float),
+        df['debt_to_equity'].to_numpy(float)
+    ])
+
+
+def bond_features(df, maturity_column='maturity_years'):
+    notch = pd.Categorical(df['rating'].astype(object), categories=RATING_SCALE).codes.astype(float)
+    notch[notch < 0] = np.nan
+    with np.errstate(divide='ignore', invalid='ignore'):
+        leverage = np.log1p(df['total_debt_m'].to_numpy(float) / df['market_cap_m'].to_numpy(float))
+    return np.column_stack([notch, df[maturity_column].to_numpy(float), leverage])
+
+
+def standardize(features):
+    # z-scores per feature; a missing value sits at the mean, so it neither attracts nor repels peers
+    features = np.where(np.isfinite(features), features, np.nan)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        mean = np.nanmean(features, axis=0)
+        std = np.nanstd(features, axis=0)
+    mean = np.where(np.isfinite(mean), mean, 0.0)
+    std = np.where(np.isfinite(std) & (std > 0), std, 1.0)
+    return np.nan_to_num((features - mean) / std, nan=0.0)
+
+
+def neighbor_stats(values, neighbors):
+    # median, sample stdev and peer count of each row's neighbours; -1 pads rows with fewer than k
+    found = neighbors >= 0
+    picked = np.where(found, values[np.maximum(neighbors, 0)], np.nan)
+    usable = (~np.isnan(picked)).sum(axis=1)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        medians = np.nanmedian(picked, axis=1)
+        stds = np.nanstd(picked, axis=1, ddof=1)
+    medians[usable < 2] = np.nan
+    stds[usable < 2] = np.nan
+    return medians, stds, found.sum(axis=1)
+
+
+class NearestPeerIndex:
+    def __init__(self, featurize, key_column, k=10, leafsize=16):
+        self.featurize = featurize
+        self.key_column = key_column
+        self.k = k
+        self.leafsize = leafsize
+        self.df = None
+        self._tree = None
+
+    def sync(self, df):
+        # the tree is rebuilt on the next query, not on every reload
+        if df is not self.df:
+            self.df = df
+            self._tree = None
+
+    def _build(self):
+        self._points = standardize(self.featurize(self.df))
+        self._tree = cKDTree(self._points, leafsize=self.leafsize)
+        # each row's slot in the tree's leaf order; queries sorted by it walk the same leaves back to back
+        self._leaf_rank = np.empty(len(self._points), dtype=np.int64)
+        self._leaf_rank[self._tree.indices] = np.arange(len(self._points))
+        self._key_codes, _ = pd.factorize(self.df[self.key_column].to_numpy(object))
+        # a key listed several times must skip all of its rows, so ask the tree for that many extra
+        self._extra = int(np.bincount(self._key_codes).max()) if len(self._key_codes) else 1
+
+    def neighbors(self, positions, k=None):
+        if self._tree is None:
+            self._build()
+        k = self.k if k is None else k
+        positions = np.asarray(positions, dtype=int)
+        n = len(self._points)
+        if len(positions) == 0 or n == 0:
+            return np.full((len(positions), k), -1, dtype=int)
+
+        wanted = min(k + self._extra, n)
+        order = np.argsort(self._leaf_rank[positions], kind='stable')
+        _, nearest = self._tree.query(self._points[positions[order]], k=wanted)
+        found = np.empty((len(positions), wanted), dtype=int)
+        found[order] = np.asarray(nearest).reshape(len(positions), wanted)
+        keep = self._key_codes[found] != self._key_codes[positions][:, None]
+        # first k usable neighbours in distance order, -1 where there are fewer
+        order = np.argsort(~keep, axis=1, kind='stable')[:, :k]
+        result = np.take_along_axis(found, order, axis=1)
+        result[~np.take_along_axis(keep, order, axis=1)] = -1
+        if result.shape[1] < k:
+            result = np.pad(result, ((0, 0), (0, k - result.shape[1])), constant_values=-1)
+        return result
+
+    def all_neighbors(self, k=None):
+        return self.neighbors(np.arange(len(self.df)), k)
+
+    def peer_positions(self, key, k=None):
+        matches = find_rows(self.df[self.key_column], key)
+        if len(matches) == 0:
+            return np.empty(0, dtype=int)
+        neighbors = self.neighbors(matches[:1], k)[0]
+        return neighbors[neighbors >= 0]
@@ -0,0 +1,399 @@
+import math
+from bisect import bisect_left, insort
+from statistics import median, stdev
+
+import numpy as np
+import pandas as pd
+
+
+class _GroupedIndex:
+    def __init__(self, df, group_column, key_column, value_columns):
+        self.group_column = group_column
+        self.key_column = key_column
+        self.value_columns = tuple(value_columns)
+        self._groups = {}
+        self._positions = {}
+        self._signatures = {}
+        self.sync(df)
+
+    def sync(self, df):
+        group_values = df[self.group_column].to_numpy()
+        positions = pd.Series(np.arange(len(df))).groupby(group_values).indices
+        signatures = self._group_signatures(df, group_values)
+        changed = {g for g, sig in signatures.items() if self._signatures.get(g) != sig}
+        removed = set(self._signatures) - set(signatures)
+
+        for group, rows in positions.items():
+            if group in changed:
+                self._groups[group] = self._build_group(df, rows)
+            elif not np.array_equal(self._positions[group], rows):
+                # same rows in the same order, only shifted within the frame
+                old = self._positions[group]
+                self._groups[group].relocate(lambda p, old=old, rows=rows: rows[np.searchsorted(old, p)])
+        for group in removed:
+            del self._groups[group]
+
+        self._positions = positions
+        self._signatures = signatures
+        return changed | removed
+
+    def _group_signatures(self, df, group_values):
+        columns = list(dict.fromkeys([self.group_column, self.key_column, *self.value_columns]))
+        row_hashes = pd.util.hash_pandas_object(df[columns], index=False).to_numpy()
+        # mix in the rank inside the group so reordering a sector changes its signature
+        rank = pd.Series(group_values).groupby(group_values, dropna=False).cumcount().to_numpy(np.uint64)
+        mixed = pd.util.hash_array(row_hashes ^ (rank * np.uint64(0x9E3779B97F4A7C15)))
+        return pd.Series(mixed).groupby(group_values).sum().to_dict()
+
+    def _build_group(self, df, positions):
+        raise NotImplementedError
+
+    def groups(self):
+        return list(self._groups)
+
+
+class SectorPeerIndex(_GroupedIndex):
+    def __init__(self, df, group_column='sector', key_column='ticker',
+                 value_columns=('pe_ratio', 'pb_ratio', 'ev_ebitda')):
+        super().__init__(df, group_column, key_column, value_columns)
+
+    def _build_group(self, df, positions):
+        return _SectorGroup(df, positions, self.key_column, self.value_columns)
+
+    def peer_positions(self, group, key):
+        sector = self._groups.get(group)
+        if sector is None:
+            return np.empty(0, dtype=int)
+        return sector.positions[sector.key_codes != sector.code_of.get(key, -1)]
+
+    def peer_count(self, group, key):
+        sector = self._groups.get(group)
+        if sector is None:
+            return 0
+        return len(sector.positions) - sector.key_counts.get(key, 0)
+
+    def stats(self, group, key, column):
+        sector = self._groups.get(group)
+        if sector is None:
+            return None
+        return sector.stats(key, column)
+
+    def bulk_stats(self, groups, keys, column):
+        groups = np.asarray(groups, dtype=object)
+        keys = np.asarray(keys, dtype=object)
+        medians = np.full(len(groups), np.nan)
+        stds = np.full(len(groups), np.nan)
+        peer_counts = np.zeros(len(groups), dtype=int)
+
+        for group, queries in pd.Series(np.arange(len(groups))).groupby(groups).indices.items():
+            sector = self._groups.get(group)
+            if sector is None:
+                continue
+            peer_counts[queries] = len(sector.positions) - np.array(
+                [sector.key_counts.get(k, 0) for k in keys[queries]], dtype=int
+            )
+            medians[queries], stds[queries] = sector.bulk_stats(keys[queries], column)
+
+        return medians, stds, peer_counts
+
+
+def leave_out_stats(values, first, counts, drops_of):
+    # one group's median and stdev per query with that query's own values left out, for callers
+    # that hold the group's values but no frame; the arguments are those of _SortedValues.bulk_stats_without
+    return _SortedValues(np.asarray(values, dtype=float)).bulk_stats_without(first, counts, drops_of)
+
+
+def _key_codes(keys):
+    # per-group integer codes, so the peer filters compare ints instead of strings
+    codes, uniques = pd.factorize(keys, use_na_sentinel=False)
+    return codes, {key: code for code, key in enumerate(uniques)}
+
+
+class _SectorGroup:
+    def __init__(self, df, positions, key_column, value_columns):
+        self.positions = np.asarray(positions)
+        self.keys = df[key_column].to_numpy(object)[self.positions]
+        self.key_codes, self.code_of = _key_codes(self.keys)
+        self.key_counts = pd.Series(self.keys).value_counts().to_dict()
+        self.columns = {column: _SortedValues(df[column].to_numpy(float)[self.positions], self.keys)
+                        for column in value_columns}
+
+    def relocate(self, remap):
+        self.positions = remap(self.positions)
+
+    def stats(self, key, column):
+        return self.columns[column].stats(key)
+
+    def bulk_stats(self, keys, column):
+        return self.columns[column].bulk_stats(keys)
+
+
+class _SortedValues:
+    def __init__(self, values, keys=None):
+        finite = ~np.isnan(values)
+        self.ordered = np.sort(values[finite])
+        self.n = len(self.ordered)
+        # without keys the caller passes the values to leave out with each query
+        self.drops = {} if keys is None else pd.Series(values[finite]).groupby(keys[finite]).agg(list).to_dict()
+        self._exact = None
+
+    def stats(self, key):
+        return self.stats_without(self.drops.get(key, []))
+
+    def stats_without(self, drop):
+        m = self.n - len(drop)
+        if m < 2:
+            return None
+
+        positions = _distinct_positions(self.ordered, drop)
+        peer_median = _median_without(self.ordered, positions, m)
+
+        if not np.isfinite(self.ordered[[0, -1]]).all():
+            rest = np.delete(self.ordered, positions)
+            # statistics.stdev cannot take infinities, and the spread around one is undefined anyway
+            return peer_median, stdev(rest.tolist()) if np.isfinite(rest).all() else float('nan')
+
+        # exact sums reproduce statistics.stdev to the last bit
+        sx, sxx = self._exact_sums()
+        for value in drop:
+            x, xx = _scaled(value)
+            sx -= x
+            sxx -= xx
+        return peer_median, _exact_stdev(sx, sxx, m)
+
+    def bulk_stats(self, keys):
+        if self.n == 0:
+            return np.full(len(keys), np.nan), np.full(len(keys), np.nan)
+        query_drops = [self.drops.get(key, []) for key in keys]
+        counts = np.array([len(drop) for drop in query_drops], dtype=int)
+        first = np.array([drop[0] if drop else np.nan for drop in query_drops], dtype=float)
+        return self.bulk_stats_without(first, counts, query_drops.__getitem__)
+
+    def bulk_stats_without(self, first, counts, drops_of):
+        # each query leaves out counts[q] values; first[q] is the only one when counts[q] == 1,
+        # drops_of(q) lists them all when there are several
+        medians = np.full(len(counts), np.nan)
+        stds = np.full(len(counts), np.nan)
+        if self.n == 0:
+            return medians, stds
+
+        single = np.flatnonzero(counts <= 1)
+        has_drop = counts[single] == 1
+        drop = np.where(has_drop, first[single], np.nan)
+        m = self.n - counts[single]
+        position = np.searchsorted(self.ordered, drop)
+
+        def at(rank):
+            index = rank + (has_drop & (position <= rank))
+            return self.ordered[np.clip(index, 0, self.n - 1)]
+
+        upper = at(m // 2)
+        lower = at(np.maximum(m // 2 - 1, 0))
+        peer_median = np.where(m % 2 == 1, upper, (lower + upper) / 2)
+
+        enough = m >= 2
+        medians[single[enough]] = peer_median[enough]
+        rows = single[enough]
+        if np.isfinite(self.ordered[[0, -1]]).all():
+            # the exact sums of stats_without, once per distinct left-out value; no drop codes as -1
+            sx, sxx = self._exact_sums()
+            codes, uniques = pd.factorize(drop[enough])
+            leave_one = []
+            for value in uniques.tolist():
+                x, xx = _scaled(value)
+                leave_one.append(_exact_stdev(sx - x, sxx - xx, self.n - 1))
+            full = _exact_stdev(sx, sxx, self.n) if (codes < 0).any() else np.nan
+            stds[rows] = np.where(codes >= 0, np.array(leave_one + [np.nan])[codes], full)
+        else:
+            for q, value in zip(rows.tolist(), drop[enough].tolist()):
+                stds[q] = self.stats_without([] if value != value else [value])[1]
+
+        for q in np.flatnonzero(counts > 1):
+            result = self.stats_without(drops_of(q))
+            if result is not None:
+                medians[q], stds[q] = result
+
+        return medians, stds
+
+    def _exact_sums(self):
+        if self._exact is None:
+            sx = sxx = 0
+            for value in self.ordered.tolist():
+                x, xx = _scaled(value)
+                sx += x
+                sxx += xx
+            self._exact = (sx, sxx)
+        return self._exact
+
+
+class MaturityWindowIndex(_GroupedIndex):
+    def __init__(self, df, window=2.0, group_column='sector', key_column='issuer',
+                 position_column='maturity_years', value_column='yield_pct'):
+        self.window = window
+        self.position_column = position_column
+        self.value_column = value_column
+        super().__init__(df, group_column, key_column, (position_column, value_column))
+
+    def _build_group(self, df, positions):
+        return _MaturityGroup(df, positions, self.key_column, self.position_column, self.value_column)
+
+    def set_window(self, window):
+        self.window = window
+
+    def peer_positions(self, group, key, maturity):
+        sector = self._groups.get(group)
+        if sector is None:
+            return np.empty(0, dtype=int)
+        return sector.window_positions(key, maturity, self.window)
+
+    def sweep(self, groups=None):
+        groups = self._groups if groups is None else [g for g in groups if g in self._groups]
+        frames = [self._groups[group].sweep(self.window) for group in groups]
+        frames = [frame for frame in frames if len(frame)]
+        if not frames:
+            return pd.DataFrame(columns=['peer_count', 'peer_median_yield', 'peer_std', 'deviation', 'z_score'])
+        return pd.concat(frames).sort_index()
+
+
+def window_sweep(keys, positions, values, window):
+    # the maturity-window peers of every row of one group given as plain arrays, indexed by row
+    group = pd.DataFrame({'key': keys, 'position': positions, 'value': values})
+    return _MaturityGroup(group, np.arange(len(group)), 'key', 'position', 'value').sweep(window)
+
+
+class _MaturityGroup:
+    def __init__(self, df, positions, key_column, position_column, value_column):
+        maturities = df[position_column].to_numpy(float)[positions]
+        order = np.argsort(maturities, kind='stable')
+        self.positions = np.asarray(positions)[order]
+        self.maturities = maturities[order]
+        self.values = df[value_column].to_numpy(float)[self.positions]
+        self.key_codes, self.code_of = _key_codes(df[key_column].to_numpy(object)[self.positions])
+
+    def relocate(self, remap):
+        self.positions = remap(self.positions)
+
+    def window_positions(self, key, maturity, window):
+        lo = np.searchsorted(self.maturities, maturity - window - 1e-9, 'left')
+        hi = np.searchsorted(self.maturities, maturity + window + 1e-9, 'right')
+        # the bisection only narrows the range, the original predicate decides membership
+        rows = np.arange(lo, hi)
+        rows = rows[(np.abs(self.maturities[rows] - maturity) <= window) & (self.key_codes[rows] != self.code_of.get(key, -1))]
+        return np.sort(self.positions[rows])
+
+    def sweep(self, window):
+        n = len(self.positions)
+        peer_count = np.zeros(n, dtype=int)
+        peer_median = np.full(n, np.nan)
+        peer_std = np.full(n, np.nan)
+
+        values = self.values.tolist()
+        maturities = self.maturities.tolist()
+        keys = self.key_codes.tolist()
+        exact = bool(np.isfinite(self.values).all())
+        scaled = [_scaled(value) for value in values] if exact else None
+        lo = hi = 0
+        window_values = []
+        window_keys = {}
+        sx = sxx = 0
+
+        for i in range(n):
+            maturity = maturities[i]
+            if maturity != maturity:
+                continue
+            while hi < n and abs(maturities[hi] - maturity) <= window:
+                insort(window_values, values[hi])
+                window_keys.setdefault(keys[hi], []).append(hi)
+                if exact:
+                    x, xx = scaled[hi]
+                    sx += x
+                    sxx += xx
+                hi += 1
+            while not abs(maturities[lo] - maturity) <= window:
+                window_values.pop(bisect_left(window_values, values[lo]))
+                window_keys[keys[lo]].remove(lo)
+                if exact:
+                    x, xx = scaled[lo]
+                    sx -= x
+                    sxx -= xx
+                lo += 1
+
+            same_key = window_keys.get(keys[i], [])
+            m = len(window_values) - len(same_key)
+            peer_count[i] = m
+            if m < 2:
+                continue
+            if not exact:
+                rest = [values[j] for j in range(lo, hi) if keys[j] != keys[i]]
+                peer_median[i], peer_std[i] = median(rest), stdev(rest)
+                continue
+
+            positions = _distinct_positions(window_values, [values[j] for j in same_key])
+            peer_median[i] = _median_without(window_values, positions, m)
+            rest_sx, rest_sxx = sx, sxx
+            for j in same_key:
+                x, xx = scaled[j]
+                rest_sx -= x
+                rest_sxx -= xx
+            peer_std[i] = _exact_stdev(rest_sx, rest_sxx, m)
+
+        deviation = self.values - peer_median
+        with np.errstate(divide='ignore', invalid='ignore'):
+            z_score = np.where(peer_std > 0, deviation / peer_std, 0.0)
+        z_score[peer_count < 2] = np.nan
+        return pd.DataFrame({
+            'peer_count': peer_count,
+            'peer_median_yield': peer_median,
+            'peer_std': peer_std,
+            'deviation': deviation,
+            'z_score': z_score
+        }, index=self.positions)
+
+
+def _distinct_positions(ordered, drop):
+    positions = []
+    for value in sorted(drop):
+        position = bisect_left(ordered, value)
+        while position in positions:
+            position += 1
+        positions.append(position)
+    return positions
+
+
+def _median_without(ordered, positions, m):
+    def at(rank):
+        index = rank
+        for position in positions:
+            if position <= index:
+                index += 1
+        return ordered[index]
+
+    if m % 2:
+        return float(at(m // 2))
+    return float((at(m // 2 - 1) + at(m // 2)) / 2)
+
+
+# Leave-one-out stats come from whole-group sums minus the left-out values. In floats that subtraction
+# cancels badly when the left-out value dominates (one 3e9 P/E in a sector of 10-20s), so the sums are
+# exact: every finite double is an integer multiple of 2**-1074, and in those units the sums of values and
+# squares are plain ints. The stdev is then rounded once, as statistics.stdev rounds it (CPython's
+# _float_sqrt_of_frac), so the bulk paths stay bit-identical to stdev() on the remaining values;
+# benchmarks/parity.py and tests/test_peer_index.py check that.
+def _scaled(value):
+    n, d = value.as_integer_ratio()
+    x = n << (1075 - d.bit_length())
+    return x, x * x
+
+
+def _exact_stdev(sx, sxx, m):
+    # sqrt of the sample variance n / d, as an integer root with spare bits whose last bit is set
+    # when it is inexact, so the one division to float rounds correctly
+    n, d = m * sxx - sx * sx, m * (m - 1) << 2148
+    q = (n.bit_length() - d.bit_length() - 109) // 2
+    if q >= 0:
+        d <<= 2 * q
+    else:
+        n <<= -2 * q
+    root = math.isqrt(n // d)
+    root |= root * root * d != n
+    return (root << q) / 1 if q >= 0 else root / (1 << -q)
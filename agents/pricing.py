@@ -0,0 +1,123 @@
+import numpy as np
+import pandas as pd
+from scipy.special import ndtr
+
+MIN_VOL = 1e-4
+MAX_VOL = 10.0
+# relative price change below which a vol move cannot be told from rounding
+RESOLUTION = 64 * np.finfo(float).eps
+
+
+def _d1_d2(spot, strike, t, vol, rate, dividend):
+    sqrt_t = np.sqrt(t)
+    d1 = (np.log(spot / strike) + (rate - dividend + 0.5 * vol * vol) * t) / (vol * sqrt_t)
+    return d1, d1 - vol * sqrt_t
+
+
+def black_scholes_price(spot, strike, t, vol, is_call, rate=0.0, dividend=0.0):
+    spot, strike, t, vol, is_call = np.broadcast_arrays(
+        np.asarray(spot, float), np.asarray(strike, float), np.asarray(t, float),
+        np.asarray(vol, float), np.asarray(is_call, bool)
+    )
+    d1, d2 = _d1_d2(spot, strike, t, vol, rate, dividend)
+    spot_pv = spot * np.exp(-dividend * t)
+    strike_pv = strike * np.exp(-rate * t)
+    call = spot_pv * ndtr(d1) - strike_pv * ndtr(d2)
+    put = strike_pv * ndtr(-d2) - spot_pv * ndtr(-d1)
+    return np.where(is_call, call, put)
+
+
+def black_scholes_greeks(spot, strike, t, vol, is_call, rate=0.0, dividend=0.0):
+    spot, strike, t, vol, is_call = np.broadcast_arrays(
+        np.asarray(spot, float), np.asarray(strike, float), np.asarray(t, float),
+        np.asarray(vol, float), np.asarray(is_call, bool)
+    )
+    d1, _ = _d1_d2(spot, strike, t, vol, rate, dividend)
+    carry = np.exp(-dividend * t)
+    density = np.exp(-0.5 * d1 * d1) / np.sqrt(2 * np.pi)
+    return {
+        'delta': np.where(is_call, carry * ndtr(d1), carry * (ndtr(d1) - 1)),
+        'gamma': carry * density / (spot * vol * np.sqrt(t)),
+        # per one volatility point, the convention used in derivatives.csv
+        'vega': spot * carry * density * np.sqrt(t) / 100
+    }
+
+
+def implied_vol(price, spot, strike, t, is_call, rate=0.0, dividend=0.0, guess=None,
+                tol=1e-8, vol_tol=1e-6, max_iter=50):
+    price, spot, strike, t, is_call = np.broadcast_arrays(
+        np.asarray(price, float), np.asarray(spot, float), np.asarray(strike, float),
+        np.asarray(t, float), np.asarray(is_call, bool)
+    )
+    spot_pv = spot * np.exp(-dividend * t)
+    strike_pv = strike * np.exp(-rate * t)
+    lower_bound = np.where(is_call, np.maximum(spot_pv - strike_pv, 0), np.maximum(strike_pv - spot_pv, 0))
+    upper_bound = np.where(is_call, spot_pv, strike_pv)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        solvable = (t > 0) & (spot > 0) & (strike > 0) & (price > lower_bound) & (price < upper_bound)
+        if guess is None:
+            # Brenner-Subrahmanyam approximation for the starting point
+            guess = np.sqrt(2 * np.pi / t) * price / spot
+        vol = np.clip(np.where(np.isfinite(guess), guess, 0.3), MIN_VOL, MAX_VOL)
+
+    vol = np.where(solvable, vol, np.nan)
+    lo = np.full(vol.shape, MIN_VOL)
+    hi = np.full(vol.shape, MAX_VOL)
+    converged = np.zeros(vol.shape, dtype=bool)
+    active = np.flatnonzero(solvable)
+
+    # Newton steps, falling back to bisection whenever a step leaves the bracket
+    for _ in range(max_iter):
+        if len(active) == 0:
+            break
+        sigma = vol[active]
+        args = (spot[active], strike[active], t[active])
+        diff = black_scholes_price(*args, sigma, is_call[active], rate, dividend) - price[active]
+        vega = black_scholes_greeks(*args, sigma, is_call[active], rate, dividend)['vega'] * 100
+        # far from the money a tiny price error can hide a large vol error, so the vol has to settle too,
+        # and a vol_tol move has to show in the price at all; flatter rows stay unconverged
+        scale = np.maximum(price[active], 1.0)
+        done = ((np.abs(diff) < tol * scale) & (np.abs(diff) <= vol_tol * vega)
+                & (vol_tol * vega > RESOLUTION * scale))
+        converged[active[done]] = True
+
+        lo[active] = np.where(diff < 0, sigma, lo[active])
+        hi[active] = np.where(diff > 0, sigma, hi[active])
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            step = sigma - diff / vega
+        bisect = ~np.isfinite(step) | (step <= lo[active]) | (step >= hi[active])
+        step = np.where(bisect, 0.5 * (lo[active] + hi[active]), step)
+
+        vol[active] = np.where(done, sigma, step)
+        active = active[~done]
+
+    vol[~converged] = np.nan
+    return vol, converged
+
+
+def price_chain(derivatives_df, rate=0.0, dividend=0.0):
+    spot = derivatives_df['underlying_price'].to_numpy(float)
+    strike = derivatives_df['strike'].to_numpy(float)
+    t = derivatives_df['expiry_days'].to_numpy(float) / 365
+    is_call = (derivatives_df['type'] == 'call').to_numpy()
+    market_price = derivatives_df['current_price'].to_numpy(float)
+    stored_vol = derivatives_df['implied_vol'].to_numpy(float)
+
+    model_price = black_scholes_price(spot, strike, t, stored_vol, is_call, rate, dividend)
+    solved_vol, converged = implied_vol(market_price, spot, strike, t, is_call, rate, dividend, guess=stored_vol)
+    greeks = black_scholes_greeks(spot, strike, t, solved_vol, is_call, rate, dividend)
+
+    return pd.DataFrame({
+        'model_price': model_price,
+        'price_error': market_price - model_price,
+        'solved_iv': solved_vol,
+        'iv_converged': converged,
+        'model_delta': greeks['delta'],
+        'model_gamma': greeks['gamma'],
+        'model_vega': greeks['vega'],
+        # model minus stored, so a Greek the file got wrong shows up next to the price check
+        'delta_error': greeks['delta'] - derivatives_df['delta'].to_numpy(float),
+        'gamma_error': greeks['gamma'] - derivatives_df['gamma'].to_numpy(float),
+        'vega_error': greeks['vega'] - derivatives_df['vega'].to_numpy(float)
+    }, index=derivatives_df.index)
@@ -0,0 +1,152 @@
+import copy
+from collections.abc import MutableMapping
+
+import numpy as np
+
+from .schema import SCHEMA_VERSION, row_dict
+
+# keys that are derived from the shared frame rather than stored on the record
+DERIVED = ('instrument_type', 'peers')
+# every stored result's key ends with this; bump RESULTS_VERSION whenever analyze() returns something
+# different for the same data, so the results file never serves what older code computed
+RESULTS_VERSION = 3
+RESULTS_TAG = f"results=v{RESULTS_VERSION}/schema=v{SCHEMA_VERSION}"
+
+
+class AnalysisResult(MutableMapping):
+    # the instrument row and its peers stay in the agent's frame, the record only keeps their positions
+    __slots__ = ('frame', 'position', 'peer_positions', 'agent', 'verdict', 'confidence',
+                 'timings', 'explanation', '_extra')
+    instrument_type = None
+    row_key = None
+    KEYS = ()
+
+    def __init__(self, frame, position, peer_positions, **fields):
+        self.frame = frame
+        self.position = int(position)
+        self.peer_positions = np.asarray(peer_positions, dtype=np.int64)
+        self._extra = None
+        for key, value in fields.items():
+            self[key] = value
+
+    @property
+    def row(self):
+        return row_dict(self.frame, self.position)
+
+    @property
+    def peers(self):
+        return self.frame.iloc[self.peer_positions]
+
+    @property
+    def peer_count(self):
+        return len(self.peer_positions)
+
+    def _slot_names(self):
+        return [name for cls in type(self).__mro__ for name in getattr(cls, '__slots__', ())]
+
+    def __getitem__(self, key):
+        if key == 'instrument_type':
+            return self.instrument_type
+        if key == self.row_key:
+            return self.row
+        if key == 'peers':
+            return self.peers
+        if key in self.KEYS:
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        if self._extra is not None and key in self._extra:
+            return self._extra[key]
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if key in DERIVED or key == self.row_key:
+            raise TypeError(f"'{key}' is read from the shared frame and cannot be replaced")
+        if key in self.KEYS:
+            setattr(self, key, value)
+        else:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[key] = value
+
+    def __delitem__(self, key):
+        if key in self.KEYS and key not in DERIVED and key != self.row_key:
+            try:
+                delattr(self, key)
+                return
+            except AttributeError:
+                raise KeyError(key) from None
+        if self._extra is None or key not in self._extra:
+            raise KeyError(key)
+        del self._extra[key]
+
+    def __contains__(self, key):
+        # answered without materializing the row or the peers
+        if key in DERIVED or key == self.row_key:
+            return True
+        if key in self.KEYS:
+            return hasattr(self, key)
+        return self._extra is not None and key in self._extra
+
+    def __iter__(self):
+        for key in self.KEYS:
+            if key in self:
+                yield key
+        if self._extra:
+            yield from list(self._extra)
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.row_key}={self.position}, verdict={getattr(self, 'verdict', None)!r})"
+
+    def to_dict(self):
+        return {key: self[key] for key in self}
+
+    def __deepcopy__(self, memo):
+        # the frame is shared and read-only, only the analysis fields are copied
+        clone = object.__new__(type(self))
+        for name in self._slot_names():
+            if hasattr(self, name):
+                value = getattr(self, name)
+                setattr(clone, name, value if name in ('frame', 'peer_positions') else copy.deepcopy(value, memo))
+        return clone
+
+    def __getstate__(self):
+        # pickles carry only the rows the record points at, not the whole frame
+        rows = np.concatenate([[self.position], self.peer_positions])
+        state = {name: getattr(self, name) for name in self._slot_names() if hasattr(self, name)}
+        state['frame'] = self.frame.iloc[rows]
+        state['position'] = 0
+        state['peer_positions'] = np.arange(1, len(rows))
+        return state
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+
+
+class EquityResult(AnalysisResult):
+    __slots__ = ('tobins_q', 'intrinsic_values', 'market_metrics', 'peer_multiples', 'reasoning', 'monte_carlo')
+    instrument_type = 'equity'
+    row_key = 'equity'
+    KEYS = ('agent', 'instrument_type', 'equity', 'peers', 'tobins_q', 'intrinsic_values', 'market_metrics',
+            'peer_multiples', 'verdict', 'confidence', 'reasoning', 'monte_carlo', 'timings', 'explanation')
+
+
+class BondResult(AnalysisResult):
+    __slots__ = ('stats', 'credit_spread')
+    instrument_type = 'bond'
+    row_key = 'bond'
+    KEYS = ('agent', 'instrument_type', 'bond', 'peers', 'verdict', 'confidence', 'stats', 'credit_spread',
+            'timings', 'explanation')
+
+
+class DerivativeResult(AnalysisResult):
+    __slots__ = ('model', 'surface')
+    instrument_type = 'derivative'
+    row_key = 'derivative'
+    KEYS = ('agent', 'instrument_type', 'derivative', 'peers', 'verdict', 'confidence', 'model', 'surface',
+            'timings', 'explanation')
@@ -0,0 +1,105 @@
+import numpy as np
+import pandas as pd
+
+AXES = ('pe_ratio', 'pb_ratio', 'ev_ebitda', 'eps_growth_5yr', 'discount_rate')
+AXIS_LABELS = {
+    'pe_ratio': 'P/E Ratio',
+    'pb_ratio': 'P/B Ratio',
+    'ev_ebitda': 'EV/EBITDA',
+    'eps_growth_5yr': 'EPS Growth (%)',
+    'discount_rate': 'Discount Rate'
+}
+VERDICTS = ['INSUFFICIENT_DATA', 'UNDERVALUED', 'FAIRLY_VALUED', 'OVERVALUED', 'EXTREMELY_OVERVALUED']
+# how far the default grid reaches either side of the current inputs
+MULTIPLE_RANGE = (0.5, 1.5)
+GROWTH_RANGE = (-10.0, 10.0)
+DISCOUNT_RANGE = (0.06, 0.14)
+
+
+def axis(center, low, high, steps, relative=False):
+    # the current value always sits on the grid, so the untouched scenario is the analyze() verdict
+    if not np.isfinite(center):
+        return np.array([center])
+    offsets = np.linspace(low, high, steps)
+    values = np.round(center * offsets if relative else center + offsets, 4)
+    return np.unique(np.append(values[~np.isclose(values, center)], center))
+
+
+def default_axes(equity, steps=11, discount_rate=0.10, discount_steps=9):
+    axes = {
+        column: axis(equity[column], *MULTIPLE_RANGE, steps, relative=True)
+        for column in ('pe_ratio', 'pb_ratio', 'ev_ebitda')
+    }
+    axes['eps_growth_5yr'] = axis(equity['eps_growth_5yr'], *GROWTH_RANGE, steps)
+    axes['discount_rate'] = axis(
+        discount_rate, DISCOUNT_RANGE[0] - discount_rate, DISCOUNT_RANGE[1] - discount_rate, discount_steps
+    )
+    return axes
+
+
+class ScenarioGrid:
+    def __init__(self, ticker, base, axes, verdict, confidence, fair_value, margin_of_safety):
+        self.ticker = ticker
+        self.base = base
+        self.axes = axes
+        self.shape = tuple(len(axes[name]) for name in AXES)
+        self.verdict_codes = verdict.reshape(self.shape)
+        self.confidence = confidence.reshape(self.shape)
+        # the multiples do not move the intrinsic values, so these only vary by growth and discount rate
+        self.fair_value = fair_value.reshape(self.shape)
+        self.margin_of_safety = margin_of_safety.reshape(self.shape)
+
+    @property
+    def size(self):
+        return int(np.prod(self.shape))
+
+    def position(self, name, value):
+        values = self.axes[name]
+        if value is None or not np.isfinite(value) or not np.isfinite(values).any():
+            value = self.base[name]
+        if not np.isfinite(value):
+            return 0
+        return int(np.nanargmin(np.abs(values - value)))
+
+    def index(self, **inputs):
+        unknown = set(inputs) - set(AXES)
+        if unknown:
+            raise ValueError(f"Unknown scenario input(s): {', '.join(sorted(unknown))}")
+        return tuple(self.position(name, inputs.get(name)) for name in AXES)
+
+    def lookup(self, **inputs):
+        index = self.index(**inputs)
+        return {
+            'inputs': {name: self.axes[name][i] for name, i in zip(AXES, index)},
+            'verdict': VERDICTS[self.verdict_codes[index]],
+            'confidence': int(self.confidence[index]),
+            'weighted_fair_value': self.fair_value[index],
+            'margin_of_safety': self.margin_of_safety[index]
+        }
+
+    def heatmap(self, x='pe_ratio', y='discount_rate', **inputs):
+        if x == y or x not in AXES or y not in AXES:
+            raise ValueError("Heatmap axes must be two different scenario inputs")
+        index = list(self.index(**inputs))
+        index[AXES.index(x)] = slice(None)
+        index[AXES.index(y)] = slice(None)
+        codes = self.verdict_codes[tuple(index)]
+        confidence = self.confidence[tuple(index)]
+        # rows follow y and columns follow x, the layout plotly heatmaps expect
+        if AXES.index(x) < AXES.index(y):
+            codes, confidence = codes.T, confidence.T
+        return {
+            'x': self.axes[x],
+            'y': self.axes[y],
+            'verdict': np.array(VERDICTS, dtype=object)[codes],
+            'confidence': confidence
+        }
+
+    def to_frame(self):
+        grid = np.meshgrid(*[self.axes[name] for name in AXES], indexing='ij')
+        frame = pd.DataFrame({name: values.ravel() for name, values in zip(AXES, grid)})
+        frame['verdict'] = np.array(VERDICTS, dtype=object)[self.verdict_codes.ravel()]
+        frame['confidence'] = self.confidence.ravel()
+        frame['weighted_fair_value'] = self.fair_value.ravel()
+        frame['margin_of_safety'] = self.margin_of_safety.ravel()
+        return frame
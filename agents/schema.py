@@ -0,0 +1,206 @@
+import argparse
+import weakref
+
+import numpy as np
+import pandas as pd
+
+# bump when the column types change, so binary caches written under the old layout are rebuilt
+SCHEMA_VERSION = 2
+
+# 'category': repeated or key strings, stored as integer codes
+# 'string':   free text kept as Python strings
+# 'number':   numeric as parsed (int64 or float64), for everything a verdict, peer set or feature is computed from
+# 'float32':  display-only figures that no agent computes with; seven significant digits are plenty
+#             (whole-number columns get the smallest integer type instead)
+SCHEMAS = {
+    'equities': {
+        'ticker': 'category',
+        'company': 'string',
+        'sector': 'category',
+        'price': 'number',
+        'market_cap_b': 'number',
+        'total_assets_b': 'number',
+        'total_liabilities_b': 'number',
+        'revenue_b': 'float32',
+        'net_income_b': 'number',
+        'fcf_b': 'number',
+        'ebitda_b': 'float32',
+        'shares_out_m': 'number',
+        'pe_ratio': 'number',
+        'pb_ratio': 'number',
+        'ps_ratio': 'number',
+        'ev_ebitda': 'number',
+        'dividend_yield': 'number',
+        'roe': 'number',
+        'revenue_growth_5yr': 'number',
+        'eps_growth_5yr': 'number',
+        'beta': 'number',
+        'debt_to_equity': 'number'
+    },
+    'bonds': {
+        'issuer': 'category',
+        'sector': 'category',
+        'yield_pct': 'number',
+        'maturity_years': 'number',
+        'rating': 'category',
+        'price': 'number',
+        'coupon_pct': 'number',
+        'total_debt_m': 'number',
+        'market_cap_m': 'number'
+    },
+    'derivatives': {
+        'underlying': 'category',
+        'type': 'category',
+        'strike': 'number',
+        'expiry_days': 'number',
+        'current_price': 'number',
+        'implied_vol': 'number',
+        'historical_vol': 'number',
+        'delta': 'float32',
+        'gamma': 'float32',
+        'vega': 'float32',
+        'underlying_price': 'number'
+    }
+}
+# columns that identify a row and may never be blank
+REQUIRED = {
+    'equities': ['ticker', 'sector'],
+    'bonds': ['issuer', 'sector'],
+    'derivatives': ['underlying', 'type', 'strike', 'expiry_days']
+}
+OPTION_TYPES = {'call', 'put'}
+
+
+def apply_schema(name, df, source=None):
+    source = source or name
+    schema = SCHEMAS[name]
+    missing = [column for column in schema if column not in df.columns]
+    if missing:
+        raise ValueError(f"{source}: missing column(s) {', '.join(missing)}")
+
+    out = {}
+    for column in df.columns:
+        values = df[column]
+        kind = schema.get(column)
+        if kind in ('number', 'float32'):
+            numeric = pd.to_numeric(values, errors='coerce')
+            bad = numeric.isna() & values.notna()
+            if bad.any():
+                raise ValueError(f"{source}: column '{column}' has non-numeric value {values[bad].iloc[0]!r} "
+                                 f"in row {_line(df.index, bad)}")
+            if kind == 'float32':
+                # whole-number columns shrink to the smallest integer type instead
+                integral = pd.api.types.is_integer_dtype(numeric)
+                numeric = pd.to_numeric(numeric, downcast='integer') if integral else numeric.astype(np.float32)
+            out[column] = numeric
+        elif kind == 'category':
+            out[column] = values.astype('category')
+        else:
+            out[column] = values
+
+    frame = pd.DataFrame(out, index=df.index)
+    for column in REQUIRED[name]:
+        blank = frame[column].isna()
+        if blank.any():
+            raise ValueError(f"{source}: column '{column}' is blank in row {_line(df.index, blank)}")
+    if name == 'derivatives':
+        unknown = set(frame['type'].cat.categories) - OPTION_TYPES
+        if unknown:
+            raise ValueError(f"{source}: unknown option type(s) {', '.join(sorted(map(str, unknown)))}")
+    return frame
+
+
+def _line(index, mask):
+    # file line of the first flagged row; chunked reads keep counting the index across chunks
+    return int(index[np.flatnonzero(mask.to_numpy())[0]]) + 2
+
+
+def widen(frame):
+    # float32 columns back to the float64 that the CSV text parses to, for rows that leave the process
+    columns = [column for column in frame.columns if frame[column].dtype == np.float32]
+    if not columns:
+        return frame
+    return frame.assign(**{column: frame[column].to_numpy().astype(str).astype(np.float64) for column in columns})
+
+
+_readers = {}
+
+
+def _reader(frame):
+    # plain arrays per column, built once per frame, so a row is read without going through iloc
+    entry = _readers.get(id(frame))
+    if entry is not None and entry[0]() is frame:
+        return entry[1]
+    columns = []
+    for column in frame.columns:
+        values = frame[column]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            categories = np.append(values.cat.categories.to_numpy(object), np.nan)
+            columns.append((column, 'category', values.cat.codes.to_numpy(), categories))
+        else:
+            kind = 'float32' if values.dtype == np.float32 else values.dtype.kind
+            columns.append((column, kind, values.to_numpy(), None))
+    key = id(frame)
+    _readers[key] = (weakref.ref(frame, lambda _: _readers.pop(key, None)), columns)
+    return columns
+
+
+def row_dict(frame, position):
+    # same values as frame.iloc[position].to_dict(), with float32 figures read back as their CSV decimals
+    row = {}
+    for column, kind, values, categories in _reader(frame):
+        value = values[position]
+        if kind == 'category':
+            row[column] = categories[value]
+        elif kind == 'float32':
+            row[column] = float(str(value))
+        elif kind == 'O':
+            row[column] = value
+        else:
+            row[column] = value.item()
+    return row
+
+
+def find_rows(values, key):
+    # compare integer codes instead of strings when the column is categorical
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        try:
+            code = values.cat.categories.get_loc(key)
+        except (KeyError, TypeError):
+            return np.empty(0, dtype=int)
+        return np.flatnonzero(values.cat.codes.to_numpy() == code)
+    return np.flatnonzero(values.to_numpy() == key)
+
+
+def _plain(frame):
+    # the frame pd.read_csv would have produced: object strings and 64-bit numbers
+    return frame.assign(**{
+        column: frame[column].astype(object) if isinstance(frame[column].dtype, pd.CategoricalDtype)
+        else frame[column].to_numpy().astype(np.float64)
+        for column in frame.columns
+        if isinstance(frame[column].dtype, pd.CategoricalDtype) or frame[column].dtype == np.float32
+    })
+
+
+def memory_report(frames):
+    rows = []
+    for name, frame in frames.items():
+        before = _plain(frame).memory_usage(deep=True).sum()
+        after = frame.memory_usage(deep=True).sum()
+        rows.append({
+            'dataset': name,
+            'rows': len(frame),
+            'plain_MB': before / 2 ** 20,
+            'schema_MB': after / 2 ** 20,
+            'saved_pct': 100 * (1 - after / before) if before else 0.0
+        })
+    return pd.DataFrame(rows)
+
+
+if __name__ == '__main__':
+    from .data_store import DATASETS, DataStore
+    parser = argparse.ArgumentParser(description="Validate the datasets and report the memory the schema saves.")
+    parser.add_argument('data_dir', nargs='?', default='data')
+    args = parser.parse_args()
+    store = DataStore(args.data_dir)
+    print(memory_report({name: store.frame(name) for name in DATASETS}).to_string(index=False, float_format='%.3f'))
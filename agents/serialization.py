@@ -0,0 +1,61 @@
+import json
+import math
+
+import numpy as np
+import pandas as pd
+
+from .contract_index import format_identifier
+from .results import AnalysisResult
+from .schema import widen
+
+
+def to_jsonable(value):
+    if isinstance(value, dict):
+        return {str(k): to_jsonable(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_jsonable(v) for v in value]
+    if isinstance(value, pd.DataFrame):
+        return [to_jsonable(row) for row in widen(value).to_dict('records')]
+    if isinstance(value, pd.Series):
+        return to_jsonable(value.to_dict())
+    if isinstance(value, np.ndarray):
+        return [to_jsonable(v) for v in value.tolist()]
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+
+def result_identifier(result):
+    if result['instrument_type'] == 'equity':
+        return result['equity']['ticker']
+    if result['instrument_type'] == 'bond':
+        return result['bond']['issuer']
+    derivative = result['derivative']
+    return format_identifier(derivative['underlying'], derivative['type'], derivative['strike'], derivative['expiry_days'])
+
+
+def to_record(result, include_peers=False):
+    # keys are read one by one so result records never build their peer frame unless asked to
+    record = {key: to_jsonable(result[key]) for key in result if key != 'peers'}
+    if 'peers' in result:
+        if isinstance(result, AnalysisResult):
+            record['peer_count'] = result.peer_count
+        else:
+            record['peer_count'] = len(result['peers'])
+        if include_peers:
+            record['peers'] = to_jsonable(result['peers'])
+    return record
+
+
+def to_json(result, include_peers=False):
+    return json.dumps(to_record(result, include_peers), separators=(',', ':')).encode()
+
+
+def to_msgpack(result, include_peers=False):
+    try:
+        import msgpack
+    except ImportError:
+        raise ImportError("msgpack output needs msgpack: pip install msgpack") from None
+    return msgpack.packb(to_record(result, include_peers), use_bin_type=True)
@@ -1,20 +1,88 @@
+import numpy as np
 import pandas as pd
 from statistics import median, stdev
 from typing import Dict, Tuple
-import json
+from .cache import memoize_result, shared_result_cache
+from .data_store import get_store
+from .hot_reload import DataLock, keyed_update, reads_data, writes_data
+from .instrumentation import NULL_TIMER, start_timer
+from .monte_carlo import PERCENTILES, simulate_fair_values
+from .nearest_peers import NearestPeerIndex, equity_features, neighbor_stats
+from .peer_index import SectorPeerIndex
+from .results import RESULTS_TAG, EquityResult
+from .schema import find_rows, row_dict
+from .scenarios import AXES, VERDICTS, ScenarioGrid, default_axes
+
+PEER_COLUMNS = [('pe', 'pe_ratio'), ('pb', 'pb_ratio'), ('ev_ebitda', 'ev_ebitda')]
 
 class Stonker:
-    def __init__(self):
-        self.equities_df = pd.read_csv('data/equities.csv')
-        with open('data/industry_benchmarks.json') as f:
-            self.benchmarks = json.load(f)
+    def __init__(self, store=None, result_cache=None, monte_carlo_paths=0, load_frame=True, peer_mode='sector', peer_k=10):
+        if peer_mode not in ('sector', 'knn'):
+            raise ValueError(f"Unknown peer mode '{peer_mode}', use 'sector' or 'knn'")
+        self.store = store or get_store()
+        self.data_lock = DataLock()
+        self.monte_carlo_paths = monte_carlo_paths
+        self.result_cache = shared_result_cache(self.store) if result_cache is None else result_cache
+        self.peer_mode = peer_mode
+        # k nearest equities by size, beta, growth and leverage, across sectors
+        self.knn_index = NearestPeerIndex(equity_features, 'ticker', k=peer_k) if peer_mode == 'knn' else None
+        self.peer_index = None
+        self._all_results = None
+        # the streaming screener only borrows the vectorized verdicts and never loads the frame
+        self._equities_df = None
+        if load_frame:
+            self.equities_df = self.store.frame('equities')
+        self.benchmarks = self.store.benchmarks
+    
+    @property
+    def equities_df(self):
+        return self._equities_df
+    
+    @equities_df.setter
+    @writes_data
+    def equities_df(self, df):
+        self._equities_df = df
+        self._all_results = None
+        if self.knn_index is not None:
+            self.knn_index.sync(df)
+        if self.peer_index is None:
+            self.peer_index = SectorPeerIndex(df)
+        else:
+            self.peer_index.sync(df)
+    
+    @writes_data
+    def refresh(self, df, diff=None, benchmarks=None):
+        previous_df, previous = self.equities_df, self._all_results
+        if benchmarks is not None:
+            self.benchmarks = benchmarks
+            diff = None
+        self.equities_df = df
+        # nearest peers can cross sectors, so any change recomputes the whole universe
+        if previous is not None and diff is not None and self.peer_mode == 'sector':
+            stale = df['sector'].isin(diff['groups']).to_numpy()
+            self._all_results = keyed_update(
+                previous, previous_df, df, ['ticker'], stale,
+                lambda rows: self._vector_analyze(df.iloc[rows])
+            )
     
+    def peer_positions(self, equity):
+        if self.peer_mode == 'knn':
+            return self.knn_index.peer_positions(equity['ticker'])
+        return self.peer_index.peer_positions(equity['sector'], equity['ticker'])
+    
+    def peer_stats(self, positions):
+        # median, stdev and peer count per multiple for the rows at these positions
+        df = self.equities_df
+        if self.peer_mode == 'knn':
+            neighbors = self.knn_index.neighbors(positions)
+            return {column: neighbor_stats(df[column].to_numpy(float), neighbors) for _, column in PEER_COLUMNS}
+        sectors = df['sector'].to_numpy(object)[positions]
+        tickers = df['ticker'].to_numpy(object)[positions]
+        return {column: self.peer_index.bulk_stats(sectors, tickers, column) for _, column in PEER_COLUMNS}
+    
+    @reads_data
     def get_peers(self, equity):
-        peers = self.equities_df[
-            (self.equities_df['sector'] == equity['sector']) &
-            (self.equities_df['ticker'] != equity['ticker'])
-        ]
-        return peers
+        return self.equities_df.iloc[self.peer_positions(equity)]
     
     def calculate_tobins_q(self, equity):
         market_cap = equity['market_cap_b'] * 1e9
@@ -150,6 +218,46 @@ class Stonker:
         
         return results
     
+    def indexed_peer_multiples(self, equity):
+        if self.peer_mode == 'knn':
+            return self.nearest_peer_multiples(equity)
+        if self.peer_index.peer_count(equity['sector'], equity['ticker']) < 2:
+            return {'error': 'Insufficient peers'}
+        
+        results = {}
+        for metric, column in PEER_COLUMNS:
+            stats = self.peer_index.stats(equity['sector'], equity['ticker'], column)
+            if stats is None:
+                continue
+            peer_median, peer_std = stats
+            results[metric] = {
+                'value': equity[column],
+                'peer_median': peer_median,
+                'z_score': (equity[column] - peer_median) / peer_std if peer_std > 0 else 0
+            }
+        
+        return results
+    
+    def nearest_peer_multiples(self, equity):
+        positions = find_rows(self.equities_df['ticker'], equity['ticker'])[:1]
+        stats = self.peer_stats(positions)
+        if len(positions) == 0 or stats['pe_ratio'][2][0] < 2:
+            return {'error': 'Insufficient peers'}
+        
+        results = {}
+        for metric, column in PEER_COLUMNS:
+            medians, stds, _ = stats[column]
+            if np.isnan(medians[0]):
+                continue
+            peer_median, peer_std = float(medians[0]), float(stds[0])
+            results[metric] = {
+                'value': equity[column],
+                'peer_median': peer_median,
+                'z_score': (equity[column] - peer_median) / peer_std if peer_std > 0 else 0
+            }
+        
+        return results
+    
     def generate_verdict(self, tobins_q, intrinsic, market_metrics, peer_multiples):
         overvalued_score = 0
         undervalued_score = 0
@@ -226,34 +334,344 @@ class Stonker:
         
         return verdict, confidence, reasoning
     
+    @reads_data
     def analyze(self, ticker):
-        equity_row = self.equities_df[self.equities_df['ticker'] == ticker]
-        if equity_row.empty:
+        timer = start_timer('Stonker')
+        result = memoize_result(self.result_cache, self.result_key(ticker), lambda: self._analyze(ticker, timer))
+        return timer.attach(result)
+    
+    def result_key(self, ticker):
+        # only frames that came from the store carry a version to key on
+        if self.equities_df is not self.store.frame('equities') or self.benchmarks is not self.store.benchmarks:
+            return None
+        return (f"Stonker|{ticker}|mc={self.monte_carlo_paths}|"
+                f"peers={self.peer_mode}{self.knn_index.k if self.knn_index else ''}|"
+                f"{self.store.version('equities')}|{self.store.version('benchmarks')}|{RESULTS_TAG}")
+    
+    def _analyze(self, ticker, timer=NULL_TIMER):
+        with timer.stage('row_lookup'):
+            matches = find_rows(self.equities_df['ticker'], ticker)
+            if len(matches) == 0:
+                raise ValueError(f"Ticker '{ticker}' not found")
+            
+            position = matches[0]
+            equity = row_dict(self.equities_df, position)
+            sector_benchmarks = self.benchmarks.get(equity['sector'], {})
+        
+        with timer.stage('intrinsic_values'):
+            tobins_q = self.calculate_tobins_q(equity)
+            intrinsic_values = self.calculate_intrinsic_values(equity)
+        with timer.stage('market_metrics'):
+            market_metrics = self.market_valuation_metrics(equity, sector_benchmarks)
+        with timer.stage('get_peers'):
+            peer_positions = self.peer_positions(equity)
+        with timer.stage('peer_multiples'):
+            peer_multiples = self.indexed_peer_multiples(equity)
+        
+        with timer.stage('verdict'):
+            verdict, confidence, reasoning = self.generate_verdict(
+                tobins_q, intrinsic_values, market_metrics, peer_multiples
+            )
+        
+        result = EquityResult(
+            self.equities_df, position, peer_positions,
+            agent='Stonker',
+            tobins_q=tobins_q,
+            intrinsic_values=intrinsic_values,
+            market_metrics=market_metrics,
+            peer_multiples=peer_multiples,
+            verdict=verdict,
+            confidence=confidence,
+            reasoning=reasoning
+        )
+        if self.monte_carlo_paths:
+            with timer.stage('monte_carlo'):
+                result['monte_carlo'] = self._monte_carlo_summary(
+                    simulate_fair_values(self.equities_df.iloc[[position]], paths=self.monte_carlo_paths).iloc[0]
+                )
+        return result
+    
+    @reads_data
+    def monte_carlo(self, ticker, paths=100_000, seed=0, percentiles=PERCENTILES, **assumptions):
+        matches = find_rows(self.equities_df['ticker'], ticker)
+        if len(matches) == 0:
+            raise ValueError(f"Ticker '{ticker}' not found")
+        row = simulate_fair_values(self.equities_df.iloc[matches[:1]], paths, seed, percentiles, **assumptions).iloc[0]
+        return self._monte_carlo_summary(row, percentiles)
+    
+    @reads_data
+    def monte_carlo_all(self, tickers=None, paths=100_000, seed=0, **assumptions):
+        rows = self.equities_df
+        if tickers is not None:
+            tickers = list(tickers)
+            rows = rows[rows['ticker'].isin(tickers)].drop_duplicates('ticker')
+            missing = [t for t in tickers if t not in set(rows['ticker'])]
+            if missing:
+                raise ValueError(f"Ticker(s) not found: {', '.join(map(str, missing))}")
+        return simulate_fair_values(rows, paths=paths, seed=seed, **assumptions)
+    
+    def _monte_carlo_summary(self, row, percentiles=PERCENTILES):
+        return {
+            'paths': int(row['paths']),
+            'valid_paths': int(row['valid_paths']),
+            'percentiles': {f"p{q:g}": row[f"fair_value_p{q:g}"] for q in percentiles},
+            'mean_fair_value': row['fair_value_mean'],
+            'prob_undervalued': row['prob_undervalued']
+        }
+    
+    @reads_data
+    def scenario_grid(self, ticker, **axes):
+        matches = find_rows(self.equities_df['ticker'], ticker)
+        if len(matches) == 0:
             raise ValueError(f"Ticker '{ticker}' not found")
+        equity_row = self.equities_df.iloc[matches[:1]]
+        base = {**row_dict(self.equities_df, matches[0]), 'discount_rate': 0.10}
+        
+        unknown = set(axes) - set(AXES)
+        if unknown:
+            raise ValueError(f"Unknown scenario input(s): {', '.join(sorted(unknown))}")
+        axes = {**default_axes(base), **{name: np.asarray(values, dtype=float) for name, values in axes.items()}}
+        
+        # every combination becomes one synthetic row, so the whole grid is one pass of the vector pipeline
+        grid = np.meshgrid(*[axes[name] for name in AXES], indexing='ij')
+        n = grid[0].size
+        rows = equity_row.iloc[np.zeros(n, dtype=int)].reset_index(drop=True)
+        for name, values in zip(AXES[:-1], grid[:-1]):
+            rows[name] = values.ravel()
+        discount_rate = grid[-1].ravel()
+        
+        # the peer set and its statistics exclude the ticker itself, so they hold across the grid
+        peer_stats = {
+            column: tuple(np.repeat(values, n) for values in stats)
+            for column, stats in self.peer_stats(matches[:1]).items()
+        }
         
-        equity = equity_row.iloc[0].to_dict()
-        sector_benchmarks = self.benchmarks.get(equity['sector'], {})
+        with np.errstate(divide='ignore', invalid='ignore'):
+            tobins_q, has_q = self._vector_tobins_q(rows)
+            intrinsic = self._vector_intrinsic_values(rows, discount_rate)
+            market = self._vector_market_metrics(rows)
+            peer = self._vector_peer_multiples(rows, peer_stats)
+        verdict = self._vector_verdict(has_q & (tobins_q != 0), tobins_q, intrinsic, market, peer)
+        
+        codes = pd.Categorical(verdict['verdict'], categories=VERDICTS).codes.astype(np.uint8)
+        return ScenarioGrid(
+            ticker, base, axes, codes, verdict['confidence'].astype(np.uint8),
+            intrinsic['weighted_fair_value'], intrinsic['margin_of_safety']
+        )
+
+    
+    @reads_data
+    def analyze_all(self):
+        if self._all_results is None:
+            self._all_results = self._vector_analyze(self.equities_df)
+        return self._all_results.copy()
+    
+    @reads_data
+    def analyze_many(self, tickers):
+        tickers = list(tickers)
+        rows = self.equities_df[self.equities_df['ticker'].isin(tickers)]
+        rows = rows.drop_duplicates('ticker')
+        missing = [t for t in tickers if t not in set(rows['ticker'])]
+        if missing:
+            raise ValueError(f"Ticker(s) not found: {', '.join(map(str, missing))}")
+        return self._vector_analyze(rows).set_index('ticker', drop=False).loc[tickers]
+    
+    def _vector_analyze(self, rows, peer_stats=None):
+        if peer_stats is None and self.peer_mode == 'knn':
+            peer_stats = self.peer_stats(self.equities_df.index.get_indexer(rows.index))
+        out = pd.DataFrame({'ticker': rows['ticker'].to_numpy(object), 'sector': rows['sector'].to_numpy(object)}, index=rows.index)
+        
+        with np.errstate(divide='ignore', invalid='ignore'):
+            tobins_q, has_q = self._vector_tobins_q(rows)
+            intrinsic = self._vector_intrinsic_values(rows)
+            market = self._vector_market_metrics(rows)
+            peer = self._vector_peer_multiples(rows, peer_stats)
+        
+        out['tobins_q'] = np.where(has_q, tobins_q, np.nan)
+        for key, values in intrinsic.items():
+            out[key] = values
+        for key, values in market.items():
+            out[key] = values
+        for key, values in peer.items():
+            out[key] = values
+        
+        verdict = self._vector_verdict(has_q & (tobins_q != 0), tobins_q, intrinsic, market, peer)
+        for key, values in verdict.items():
+            out[key] = values
+        return out
+    
+    def _vector_tobins_q(self, rows):
+        market_cap = rows['market_cap_b'].to_numpy(float) * 1e9
+        book_value = (rows['total_assets_b'].to_numpy(float) - rows['total_liabilities_b'].to_numpy(float)) * 1e9
+        has_q = ~(book_value <= 0)
+        return market_cap / book_value, has_q
+    
+    def _vector_intrinsic_values(self, rows, discount_rate=0.10):
+        price = rows['price'].to_numpy(float)
+        shares = rows['shares_out_m'].to_numpy(float) * 1_000_000
+        eps = rows['net_income_b'].to_numpy(float) * 1_000_000_000 / shares
+        book_value_per_share = (rows['total_assets_b'].to_numpy(float) - rows['total_liabilities_b'].to_numpy(float)) * 1_000_000_000 / shares
+        fcf_per_share = rows['fcf_b'].to_numpy(float) * 1_000_000_000 / shares
+        dividend_yield = rows['dividend_yield'].to_numpy(float)
+        
+        has_graham = (eps > 0) & (book_value_per_share > 0)
+        # Python's float ** 0.5 per ticker, as calculate_intrinsic_values takes it; np.sqrt can be a bit off from it
+        graham = np.full(len(price), np.nan)
+        graham[has_graham] = [value ** 0.5 for value in (22.5 * eps * book_value_per_share)[has_graham].tolist()]
+        
+        growth_rate = np.minimum(rows['eps_growth_5yr'].to_numpy(float) / 100, 0.25)
+        
+        has_dcf = (fcf_per_share > 0) & (growth_rate < discount_rate)
+        dcf = np.where(has_dcf, (fcf_per_share * (1 + growth_rate)) / (discount_rate - growth_rate), np.nan)
+        
+        dividend_per_share = price * dividend_yield / 100
+        div_growth = np.minimum(growth_rate, 0.06)
+        has_gordon = (dividend_yield > 0) & (div_growth < discount_rate)
+        gordon = np.where(has_gordon, (dividend_per_share * (1 + div_growth)) / (discount_rate - div_growth), np.nan)
+        
+        # mirror the truthiness checks and summation order of calculate_intrinsic_values
+        use_graham = has_graham & (graham != 0)
+        use_dcf = has_dcf & (dcf != 0)
+        use_gordon = has_gordon & (gordon != 0)
+        
+        total_weight = np.zeros(len(price))
+        total_weight = total_weight + np.where(use_graham, 0.3, 0.0)
+        total_weight = total_weight + np.where(use_dcf, 0.5, 0.0)
+        total_weight = total_weight + np.where(use_gordon, 0.2, 0.0)
+        
+        weighted_fair_value = np.zeros(len(price))
+        weighted_fair_value = weighted_fair_value + np.where(use_graham, graham * (0.3 / total_weight), 0.0)
+        weighted_fair_value = weighted_fair_value + np.where(use_dcf, dcf * (0.5 / total_weight), 0.0)
+        weighted_fair_value = weighted_fair_value + np.where(use_gordon, gordon * (0.2 / total_weight), 0.0)
+        
+        has_value = total_weight > 0
+        weighted_fair_value = np.where(has_value, weighted_fair_value, np.nan)
+        margin_of_safety = np.where(has_value, ((weighted_fair_value - price) / weighted_fair_value) * 100, np.nan)
         
-        tobins_q = self.calculate_tobins_q(equity)
-        intrinsic_values = self.calculate_intrinsic_values(equity)
-        market_metrics = self.market_valuation_metrics(equity, sector_benchmarks)
-        peers = self.get_peers(equity)
-        peer_multiples = self.analyze_peer_multiples(equity, peers)
+        return {
+            'graham_number': graham,
+            'dcf_value': dcf,
+            'gordon_value': gordon,
+            'weighted_fair_value': weighted_fair_value,
+            'margin_of_safety': margin_of_safety,
+            'current_price': price
+        }
+    
+    def _vector_market_metrics(self, rows):
+        pe = rows['pe_ratio'].to_numpy(float)
+        sector_cape = rows['sector'].map(
+            lambda sector: self.benchmarks.get(sector, {}).get('cape_ratio', 25)
+        ).to_numpy(float)
+        cape_signal = np.select([sector_cape > 25, sector_cape < 15], ['OVERVALUED', 'UNDERVALUED'], 'FAIR').astype(object)
+        
+        earnings_yield = np.where(pe > 0, 100 / pe, 0.0)
+        treasury_yield = 4.58
+        fed_spread = earnings_yield - treasury_yield
+        fed_signal = np.select([fed_spread > 2, fed_spread < -1], ['UNDERVALUED', 'OVERVALUED'], 'FAIR').astype(object)
         
-        verdict, confidence, reasoning = self.generate_verdict(
-            tobins_q, intrinsic_values, market_metrics, peer_multiples
-        )
+        inflation = 2.8
+        fair_pe_rule20 = 20 - inflation
+        rule20_deviation = ((pe - fair_pe_rule20) / fair_pe_rule20) * 100
+        rule20_signal = np.select([rule20_deviation > 20, rule20_deviation < -20], ['OVERVALUED', 'UNDERVALUED'], 'FAIR').astype(object)
+        
+        growth = rows['eps_growth_5yr'].to_numpy(float)
+        peg = np.where(growth > 0, pe / growth, np.nan)
+        has_peg = (growth > 0) & (peg != 0)
+        peg_signal = np.select([peg < 1, peg > 2], ['UNDERVALUED', 'OVERVALUED'], 'FAIR').astype(object)
+        peg_signal[~has_peg] = None
+        
+        return {
+            'cape_value': sector_cape,
+            'cape_signal': cape_signal,
+            'buffett_signal': np.full(len(pe), 'OVERVALUED', dtype=object),
+            'earnings_yield': earnings_yield,
+            'treasury_yield': np.full(len(pe), treasury_yield),
+            'fed_spread': fed_spread,
+            'fed_signal': fed_signal,
+            'rule20_fair_pe': np.full(len(pe), fair_pe_rule20),
+            'rule20_deviation_pct': rule20_deviation,
+            'rule20_signal': rule20_signal,
+            'peg': peg,
+            'peg_signal': peg_signal
+        }
+    
+    def _vector_peer_multiples(self, rows, peer_stats=None):
+        sectors = rows['sector'].to_numpy(object)
+        tickers = rows['ticker'].to_numpy(object)
+        
+        results = {}
+        for metric, column in PEER_COLUMNS:
+            values = rows[column].to_numpy(float)
+            if peer_stats is None:
+                medians, stds, peer_count = self.peer_index.bulk_stats(sectors, tickers, column)
+            else:
+                medians, stds, peer_count = peer_stats[column]
+            valid = (peer_count >= 2) & ~np.isnan(medians)
+            z_score = np.where(stds > 0, (values - medians) / stds, 0.0)
+            results[f'{metric}_value'] = np.where(valid, values, np.nan)
+            results[f'{metric}_peer_median'] = np.where(valid, medians, np.nan)
+            results[f'{metric}_z_score'] = np.where(valid, z_score, np.nan)
+            results[f'{metric}_valid'] = valid
+        
+        return results
+    
+    def _vector_verdict(self, has_q, tobins_q, intrinsic, market, peer):
+        n = len(tobins_q)
+        overvalued_score = np.zeros(n, dtype=int)
+        undervalued_score = np.zeros(n, dtype=int)
+        total_weight = np.zeros(n, dtype=int)
+        
+        overvalued_score += np.where(has_q & (tobins_q > 1.5), 15, 0)
+        undervalued_score += np.where(has_q & ~(tobins_q > 1.5) & (tobins_q < 0.8), 15, 0)
+        total_weight += np.where(has_q, 15, 0)
+        
+        mos = intrinsic['margin_of_safety']
+        has_mos = ~np.isnan(intrinsic['weighted_fair_value']) & (mos != 0)
+        undervalued_score += np.where(has_mos & (mos > 20), 30, 0)
+        overvalued_score += np.where(has_mos & ~(mos > 20) & (mos < -20), 30, 0)
+        middle = has_mos & ~(mos > 20) & ~(mos < -20)
+        undervalued_score += np.where(middle & (mos > 0), 15, 0)
+        overvalued_score += np.where(middle & ~(mos > 0), 15, 0)
+        total_weight += np.where(has_mos, 30, 0)
+        
+        for key in ['cape_signal', 'fed_signal', 'rule20_signal', 'peg_signal']:
+            signal = market[key]
+            overvalued_score += np.where(signal == 'OVERVALUED', 7, 0)
+            undervalued_score += np.where(signal == 'UNDERVALUED', 7, 0)
+            total_weight += 7
+        
+        for metric in ['pe', 'pb', 'ev_ebitda']:
+            valid = peer[f'{metric}_valid']
+            z = peer[f'{metric}_z_score']
+            overvalued_score += np.where(valid & (z > 1.5), 7, 0)
+            undervalued_score += np.where(valid & ~(z > 1.5) & (z < -1.5), 7, 0)
+            total_weight += np.where(valid, 7, 0)
+        
+        with np.errstate(divide='ignore', invalid='ignore'):
+            overvalued_pct = (overvalued_score / total_weight) * 100
+            undervalued_pct = (undervalued_score / total_weight) * 100
+        
+        is_over = overvalued_pct >= 60
+        is_under = ~is_over & (undervalued_pct >= 60)
+        verdict = np.select([is_over, is_under], ['OVERVALUED', 'UNDERVALUED'], 'FAIRLY_VALUED').astype(object)
+        confidence = np.full(n, 70)
+        confidence[is_over] = np.minimum(95, (overvalued_pct[is_over] + 15).astype(int))
+        confidence[is_under] = np.minimum(95, (undervalued_pct[is_under] + 15).astype(int))
+        
+        extreme = has_q & (tobins_q > 3)
+        verdict[extreme] = 'EXTREMELY_OVERVALUED'
+        confidence[extreme] = 95
+        
+        no_data = total_weight == 0
+        verdict[no_data] = 'INSUFFICIENT_DATA'
+        confidence[no_data] = 0
         
         return {
-            'agent': 'Stonker',
-            'instrument_type': 'equity',
-            'equity': equity,
-            'peers': peers,
-            'tobins_q': tobins_q,
-            'intrinsic_values': intrinsic_values,
-            'market_metrics': market_metrics,
-            'peer_multiples': peer_multiples,
+            'overvalued_score': overvalued_score,
+            'undervalued_score': undervalued_score,
+            'total_weight': total_weight,
             'verdict': verdict,
-            'confidence': confidence,
-            'reasoning': reasoning
+            'confidence': confidence
         }
+
+
@@ -0,0 +1,280 @@
+# Peak memory is bounded by one chunk of rows plus the largest peer group, not by the file: pass 1 spills a few
+# numbers per row to disk, the rows are ordered by group on disk one chunk at a time, and pass 2 loads a single
+# group's values to get exact medians and stdevs. A file that is one sector or one underlying is still held whole.
+import argparse
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from .bond007 import Bond007
+from .call_me_maybe import CallMeMaybe
+from .data_store import DATASETS, get_store
+from .peer_index import leave_out_stats, window_sweep
+from .pricing import price_chain
+from .schema import apply_schema
+from .stonker import Stonker
+from .vol_surface import ChainSurface
+from .yield_curve import TREASURY_SECTOR, TreasuryCurve, fallback_yield
+
+CHUNK_ROWS = 100_000
+EQUITY_PEER_COLUMNS = ('pe_ratio', 'pb_ratio', 'ev_ebitda')
+SWEEP_COLUMNS = ('peer_count', 'peer_median_yield', 'peer_std', 'deviation', 'z_score')
+SURFACE_COLUMNS = ('strike', 'expiry_days', 'implied_vol', 'underlying_price')
+
+
+def read_chunks(path, name, chunk_rows=CHUNK_ROWS):
+    # the index keeps counting across chunks, so it is the row position in the whole file
+    for chunk in pd.read_csv(path, chunksize=chunk_rows):
+        yield apply_schema(name, chunk, path)
+
+
+class _Spill:
+    # per-row columns appended to flat files and read back memory-mapped
+    def __init__(self, directory):
+        self.directory = directory
+        self._files = {}
+
+    def append(self, name, values, dtype):
+        if name not in self._files:
+            self._files[name] = open(os.path.join(self.directory, name), 'ab')
+        np.ascontiguousarray(values, dtype=dtype).tofile(self._files[name])
+
+    def load(self, name, dtype):
+        f = self._files.pop(name, None)
+        if f is not None:
+            f.close()
+        path = os.path.join(self.directory, name)
+        if f is None or os.path.getsize(path) == 0:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(path, dtype=dtype, mode='r')
+
+    def output(self, name, n, fill, dtype=float):
+        values = np.lib.format.open_memmap(os.path.join(self.directory, name + '.npy'), mode='w+', dtype=dtype, shape=(n,))
+        values[:] = fill
+        return values
+
+    def close(self):
+        for f in self._files.values():
+            f.close()
+        self._files = {}
+
+
+class _GroupCodes:
+    # group labels to dense integer codes that stay stable across chunks
+    def __init__(self):
+        self.labels = []
+        self._codes = {}
+
+    def encode(self, values):
+        categories = values.cat.categories.to_numpy(object)
+        lookup = np.array([self._codes.setdefault(label, len(self._codes)) for label in categories], dtype=np.int32)
+        self.labels = list(self._codes)
+        return lookup[values.cat.codes.to_numpy()]
+
+    def code(self, label):
+        return self._codes.get(label, -1)
+
+
+def _group_rows(spill, codes, n_groups, chunk_rows=CHUNK_ROWS):
+    # rows of each group in file order: a counting sort into a spilled index, a chunk of codes at a time
+    counts = np.zeros(n_groups, dtype=np.int64)
+    for start in range(0, len(codes), chunk_rows):
+        counts += np.bincount(codes[start:start + chunk_rows], minlength=n_groups)
+    bounds = np.concatenate([[0], np.cumsum(counts)])
+    order = spill.output('order', len(codes), 0, dtype=np.int64)
+    cursor = bounds[:-1].copy()
+    for start in range(0, len(codes), chunk_rows):
+        chunk = np.asarray(codes[start:start + chunk_rows])
+        rows = np.argsort(chunk, kind='stable')
+        chunk_counts = np.bincount(chunk, minlength=n_groups)
+        first = np.concatenate([[0], np.cumsum(chunk_counts)[:-1]])
+        group = chunk[rows]
+        order[cursor[group] + np.arange(len(chunk)) - first[group]] = start + rows
+        cursor += chunk_counts
+    for code in range(n_groups):
+        yield code, np.asarray(order[bounds[code]:bounds[code + 1]])
+
+
+def _key_hashes(values):
+    return pd.util.hash_array(values.to_numpy(object))
+
+
+class StreamingScreener:
+    def __init__(self, data_dir='data', chunk_rows=CHUNK_ROWS, spill_dir=None, maturity_window=2,
+                 use_solved_ytm=False, peer_basis='maturity', use_model_iv=False, risk_free_rate=0.0435,
+                 use_surface=False):
+        self.data_dir = data_dir
+        self.chunk_rows = chunk_rows
+        self.spill_dir = spill_dir
+        store = get_store(data_dir)
+        # agents without frames: only their vectorized verdicts and the benchmarks are used
+        self.stonker = Stonker(store=store, result_cache=False, load_frame=False)
+        self.bond007 = Bond007(maturity_window=maturity_window, store=store, result_cache=False, load_frame=False,
+                               use_solved_ytm=use_solved_ytm, peer_basis=peer_basis)
+        self.call_me_maybe = CallMeMaybe(use_model_iv=use_model_iv, risk_free_rate=risk_free_rate,
+                                         use_surface=use_surface, store=store, result_cache=False, load_frame=False)
+
+    def path(self, name):
+        return os.path.join(self.data_dir, DATASETS[name])
+
+    def chunks(self, name):
+        return read_chunks(self.path(name), name, self.chunk_rows)
+
+    def equities(self):
+        with tempfile.TemporaryDirectory(dir=self.spill_dir) as directory:
+            spill = _Spill(directory)
+            try:
+                groups = self._spill(spill, self.chunks('equities'), 'sector', 'ticker', EQUITY_PEER_COLUMNS)
+                stats = self._equity_peer_stats(spill, groups)
+                for chunk in self.chunks('equities'):
+                    rows = slice(chunk.index[0], chunk.index[-1] + 1)
+                    peer_stats = {
+                        column: (medians[rows], stds[rows], stats['peer_count'][rows])
+                        for column, (medians, stds) in stats['columns'].items()
+                    }
+                    yield self.stonker._vector_analyze(chunk, peer_stats)
+            finally:
+                spill.close()
+
+    def bonds(self):
+        with tempfile.TemporaryDirectory(dir=self.spill_dir) as directory:
+            spill = _Spill(directory)
+            try:
+                columns = dict.fromkeys(['maturity_years', 'yield_pct', self.bond007.peer_column])
+                groups = self._spill(spill, self.bond_chunks(), 'sector', 'issuer', columns)
+                sweep = self._bond_sweep(spill, groups)
+                for chunk in self.bond_chunks():
+                    rows = slice(chunk.index[0], chunk.index[-1] + 1)
+                    frame = pd.DataFrame({column: sweep[column][rows] for column in SWEEP_COLUMNS}, index=chunk.index)
+                    yield self.bond007._vector_verdicts(chunk, frame)
+            finally:
+                spill.close()
+
+    def derivatives(self):
+        with tempfile.TemporaryDirectory(dir=self.spill_dir) as directory:
+            spill = _Spill(directory)
+            try:
+                agent = self.call_me_maybe
+                surface = None
+                if agent.use_surface:
+                    # the first pass only feeds the surface, so without it the file is read once
+                    groups = self._spill(spill, self.chunks('derivatives'), 'underlying', None, SURFACE_COLUMNS)
+                    surface = self._surface(spill, groups)
+                for chunk in self.chunks('derivatives'):
+                    pricing = price_chain(chunk, rate=agent.risk_free_rate) if agent.use_model_iv else None
+                    yield agent._vector_analyze(chunk, surface, pricing)
+            finally:
+                spill.close()
+
+    def bond_chunks(self):
+        # with solved yields or duration peers, each chunk is priced on the way in
+        for chunk in self.chunks('bonds'):
+            yield self.bond007.working_frame(chunk)
+
+    def _spill(self, spill, chunks, group_column, key_column, value_columns):
+        # first pass: keep only what the peer aggregates need, a few numbers per row
+        groups = _GroupCodes()
+        for chunk in chunks:
+            spill.append('group', groups.encode(chunk[group_column]), np.int32)
+            if key_column is not None:
+                spill.append('key', _key_hashes(chunk[key_column]), np.uint64)
+            for column in value_columns:
+                spill.append(column, chunk[column].to_numpy(float), np.float64)
+        return groups
+
+    def _equity_peer_stats(self, spill, groups):
+        codes = spill.load('group', np.int32)
+        keys = spill.load('key', np.uint64)
+        values = {column: spill.load(column, np.float64) for column in EQUITY_PEER_COLUMNS}
+        n = len(codes)
+        peer_count = spill.output('peer_count', n, 0, dtype=np.int64)
+        columns = {column: (spill.output(column + '_median', n, np.nan), spill.output(column + '_std', n, np.nan))
+                   for column in EQUITY_PEER_COLUMNS}
+
+        for _, rows in _group_rows(spill, codes, len(groups.labels), self.chunk_rows):
+            _, key_rows, multiplicity = np.unique(keys[rows], return_inverse=True, return_counts=True)
+            multiplicity = multiplicity[key_rows]
+            peer_count[rows] = len(rows) - multiplicity
+            repeated = np.flatnonzero(multiplicity > 1)
+            for column in EQUITY_PEER_COLUMNS:
+                group_values = np.asarray(values[column][rows])
+                # a ticker leaves out its own value, or every value it has when it is listed twice
+                counts = (~np.isnan(group_values)).astype(int)
+                first = group_values.copy()
+                drops = {}
+                for key in np.unique(key_rows[repeated]):
+                    same = np.flatnonzero(key_rows == key)
+                    dropped = [value for value in group_values[same].tolist() if value == value]
+                    counts[same] = len(dropped)
+                    first[same] = dropped[0] if dropped else np.nan
+                    for q in same:
+                        drops[q] = dropped
+                medians, stds = leave_out_stats(group_values, first, counts, drops.get)
+                columns[column][0][rows] = medians
+                columns[column][1][rows] = stds
+        return {'peer_count': peer_count, 'columns': columns}
+
+    def _bond_sweep(self, spill, groups):
+        codes = spill.load('group', np.int32)
+        keys = spill.load('key', np.uint64)
+        maturities = spill.load('maturity_years', np.float64)
+        yields = spill.load('yield_pct', np.float64)
+        column = self.bond007.peer_column
+        positions = maturities if column == 'maturity_years' else spill.load(column, np.float64)
+        n = len(codes)
+        sweep = {column: spill.output(column, n, np.nan) for column in SWEEP_COLUMNS}
+
+        # without Government rows the curve falls back to the benchmark yield
+        self.bond007.treasury_curve = TreasuryCurve([], [], fallback_yield(self.bond007.benchmarks))
+        for code, rows in _group_rows(spill, codes, len(groups.labels), self.chunk_rows):
+            if code == groups.code(TREASURY_SECTOR):
+                # the Treasury curve comes from the same pass, Government rows in file order
+                self.bond007.treasury_curve = TreasuryCurve(
+                    maturities[rows], yields[rows], fallback_yield(self.bond007.benchmarks)
+                )
+            frame = window_sweep(keys[rows], positions[rows], yields[rows], self.bond007.maturity_window)
+            for name in SWEEP_COLUMNS:
+                sweep[name][rows[frame.index]] = frame[name].to_numpy(float)
+        return sweep
+
+    def _surface(self, spill, groups):
+        codes = spill.load('group', np.int32)
+        values = {column: spill.load(column, np.float64) for column in SURFACE_COLUMNS}
+        surface = ChainSurface()
+        for code, rows in _group_rows(spill, codes, len(groups.labels), self.chunk_rows):
+            chain = pd.DataFrame({column: values[column][rows] for column in SURFACE_COLUMNS})
+            surface.add_chain(groups.labels[code], chain)
+        return surface
+
+
+def write_csv(frames, path):
+    header = True
+    with open(path, 'w', newline='') as f:
+        for frame in frames:
+            frame.to_csv(f, header=header, index=False)
+            header = False
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Screen every instrument chunk by chunk, without loading whole files.")
+    parser.add_argument('data_dir', nargs='?', default='data')
+    parser.add_argument('-o', '--output-dir', default='.')
+    parser.add_argument('-a', '--assets', nargs='+', choices=['equities', 'bonds', 'derivatives'],
+                        default=['equities', 'bonds', 'derivatives'])
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS)
+    parser.add_argument('--spill-dir', help="where the first pass keeps its per-row aggregates (default: temp dir)")
+    parser.add_argument('--use-solved-ytm', action='store_true', help="bond verdicts from yields solved from price")
+    parser.add_argument('--peer-basis', choices=['maturity', 'duration'], default='maturity')
+    parser.add_argument('--use-model-iv', action='store_true')
+    parser.add_argument('--use-surface', action='store_true')
+    args = parser.parse_args()
+    screener = StreamingScreener(args.data_dir, args.chunk_rows, args.spill_dir,
+                                 use_solved_ytm=args.use_solved_ytm, peer_basis=args.peer_basis,
+                                 use_model_iv=args.use_model_iv, use_surface=args.use_surface)
+    os.makedirs(args.output_dir, exist_ok=True)
+    for name in args.assets:
+        path = os.path.join(args.output_dir, f"{name}_verdicts.csv")
+        write_csv(getattr(screener, name)(), path)
+        print(f"{name}: {path}")
@@ -0,0 +1,134 @@
+import numpy as np
+import pandas as pd
+
+from .peer_index import _GroupedIndex
+
+
+class VolSurface(_GroupedIndex):
+    def __init__(self, df, grid_size=41, rich_threshold=0.10):
+        self.grid_size = grid_size
+        self.rich_threshold = rich_threshold
+        super().__init__(df, 'underlying', 'type', ('strike', 'expiry_days', 'implied_vol', 'underlying_price'))
+
+    def _build_group(self, df, positions):
+        return _SurfaceFit(df, positions, self.grid_size)
+
+    def surface_vol(self, underlying, moneyness, expiry_days):
+        fit = self._groups.get(underlying)
+        if fit is None:
+            return np.full(np.shape(moneyness), np.nan)
+        return fit.interpolate(np.asarray(moneyness, float), np.asarray(expiry_days, float))
+
+    def compare(self, derivative):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            moneyness = np.log(np.divide(derivative['strike'], derivative['underlying_price']))
+        surface_iv = float(self.surface_vol(derivative['underlying'], moneyness, derivative['expiry_days']))
+        residual = derivative['implied_vol'] - surface_iv
+        relative = residual / surface_iv if surface_iv > 0 else np.nan
+        return {
+            'surface_iv': surface_iv,
+            'residual': residual,
+            'relative': relative,
+            'signal': self._signal(np.asarray([relative]))[0]
+        }
+
+    def signals(self, df):
+        surface_iv = np.full(len(df), np.nan)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            moneyness = np.log(df['strike'].to_numpy(float) / df['underlying_price'].to_numpy(float))
+        expiry_days = df['expiry_days'].to_numpy(float)
+        for underlying, rows in pd.Series(np.arange(len(df))).groupby(df['underlying'].to_numpy()).indices.items():
+            surface_iv[rows] = self.surface_vol(underlying, moneyness[rows], expiry_days[rows])
+
+        residual = df['implied_vol'].to_numpy(float) - surface_iv
+        with np.errstate(divide='ignore', invalid='ignore'):
+            relative = np.where(surface_iv > 0, residual / surface_iv, np.nan)
+        return pd.DataFrame({
+            'surface_iv': surface_iv,
+            'surface_residual': residual,
+            'surface_relative': relative,
+            'surface_signal': self._signal(relative)
+        }, index=df.index)
+
+    def _signal(self, relative):
+        return np.select(
+            [relative > self.rich_threshold, relative < -self.rich_threshold],
+            ['RICH', 'CHEAP'], 'IN_LINE'
+        ).astype(object)
+
+
+class ChainSurface(VolSurface):
+    # a surface assembled one underlying's chain at a time, for callers that never hold the whole frame
+    def __init__(self, grid_size=41, rich_threshold=0.10):
+        self.grid_size = grid_size
+        self.rich_threshold = rich_threshold
+        self._groups = {}
+
+    def add_chain(self, underlying, chain):
+        self._groups[underlying] = _SurfaceFit(chain, np.arange(len(chain)), self.grid_size)
+
+
+class _SurfaceFit:
+    def __init__(self, df, positions, grid_size):
+        strike = df['strike'].to_numpy(float)[positions]
+        spot = df['underlying_price'].to_numpy(float)[positions]
+        expiry = df['expiry_days'].to_numpy(float)[positions]
+        vol = df['implied_vol'].to_numpy(float)[positions]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            moneyness = np.log(strike / spot)
+        usable = np.isfinite(moneyness) & np.isfinite(vol) & (vol > 0) & np.isfinite(expiry) & (expiry > 0)
+        moneyness, expiry, vol = moneyness[usable], expiry[usable], vol[usable]
+
+        self.expiries = np.unique(expiry)
+        if len(self.expiries) == 0:
+            self.grid = np.empty((0, grid_size))
+            self.moneyness = np.zeros(grid_size)
+            return
+
+        low, high = moneyness.min(), moneyness.max()
+        if high - low < 1e-6:
+            low, high = low - 0.05, high + 0.05
+        self.moneyness = np.linspace(low, high, grid_size)
+
+        # one smile per expiry, evaluated on a shared log-moneyness grid as total variance;
+        # the polynomial keeps a residual degree of freedom so contracts can sit off the surface
+        self.grid = np.empty((len(self.expiries), grid_size))
+        for i, days in enumerate(self.expiries):
+            on_expiry = expiry == days
+            k, v = moneyness[on_expiry], vol[on_expiry]
+            degree = max(0, min(2, len(np.unique(k)) - 2))
+            coefficients = np.polyfit(k, v, degree) if degree else np.array([v.mean()])
+            smile = np.polyval(coefficients, np.clip(self.moneyness, k.min(), k.max()))
+            self.grid[i] = np.maximum(smile, 1e-4) ** 2 * days
+
+    def relocate(self, remap):
+        pass
+
+    def interpolate(self, moneyness, expiry_days):
+        moneyness, expiry_days = np.broadcast_arrays(moneyness, expiry_days)
+        if len(self.expiries) == 0:
+            return np.full(moneyness.shape, np.nan)
+        # a contract without a spot or an expiry has no place on the grid, it reads NaN instead of indexing
+        known = np.isfinite(moneyness) & np.isfinite(expiry_days)
+        moneyness = np.where(known, moneyness, self.moneyness[0])
+        expiry_days = np.where(known, expiry_days, self.expiries[0])
+
+        step = self.moneyness[1] - self.moneyness[0]
+        x = np.clip((moneyness - self.moneyness[0]) / step, 0, len(self.moneyness) - 1)
+        left = np.minimum(x.astype(int), len(self.moneyness) - 2)
+        weight = x - left
+
+        t = np.clip(expiry_days, self.expiries[0], self.expiries[-1])
+        upper = np.clip(np.searchsorted(self.expiries, t), 1, max(len(self.expiries) - 1, 1))
+        lower = upper - 1
+        if len(self.expiries) == 1:
+            lower = upper = np.zeros_like(upper)
+
+        def variance(row):
+            return self.grid[row, left] * (1 - weight) + self.grid[row, left + 1] * weight
+
+        span = self.expiries[upper] - self.expiries[lower]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            blend = np.where(span > 0, (t - self.expiries[lower]) / span, 0.0)
+            total_variance = variance(lower) * (1 - blend) + variance(upper) * blend
+            return np.where(known, np.sqrt(total_variance / t), np.nan)
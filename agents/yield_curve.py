@@ -0,0 +1,53 @@
+import numpy as np
+from scipy.interpolate import PchipInterpolator
+
+TREASURY_SECTOR = 'Government'
+FALLBACK_YIELD = 4.35
+
+
+def fallback_yield(benchmarks):
+    return benchmarks.get(TREASURY_SECTOR, {}).get('bond_yield_avg', FALLBACK_YIELD)
+
+
+class TreasuryCurve:
+    def __init__(self, maturities, yields, fallback=FALLBACK_YIELD):
+        maturities = np.asarray(maturities, float)
+        yields = np.asarray(yields, float)
+        usable = np.isfinite(maturities) & np.isfinite(yields)
+        # one point per tenor, averaging the quotes that share it
+        self.maturities, tenor = np.unique(maturities[usable], return_inverse=True)
+        self.yields = np.bincount(tenor, weights=yields[usable]) / np.bincount(tenor) if len(tenor) else np.empty(0)
+        self.fallback = fallback
+        # monotone cubic through three or more tenors, so the curve never overshoots the quotes
+        self._spline = PchipInterpolator(self.maturities, self.yields) if len(self.maturities) >= 3 else None
+
+    @classmethod
+    def from_bonds(cls, df, benchmarks=None):
+        government = (df['sector'] == TREASURY_SECTOR).to_numpy()
+        return cls(
+            df['maturity_years'].to_numpy(float)[government],
+            df['yield_pct'].to_numpy(float)[government],
+            fallback_yield(benchmarks or {})
+        )
+
+    def __len__(self):
+        return len(self.maturities)
+
+    def yields_at(self, maturities):
+        maturities = np.asarray(maturities, float)
+        if len(self.maturities) == 0:
+            return np.full(maturities.shape, self.fallback)
+        # flat beyond the shortest and longest tenor; bonds without a maturity keep the flat benchmark
+        clipped = np.clip(maturities, self.maturities[0], self.maturities[-1])
+        if self._spline is None:
+            curve = np.interp(clipped, self.maturities, self.yields)
+        else:
+            curve = self._spline(clipped)
+        return np.where(np.isfinite(maturities), curve, self.fallback)
+
+    def spreads(self, yields, maturities):
+        return np.asarray(yields, float) - self.yields_at(maturities)
+
+    def to_dict(self):
+        return {'maturities': self.maturities.tolist(), 'yields': self.yields.tolist(),
+                'fallback': self.fallback, 'method': 'pchip' if self._spline is not None else 'linear'}
@@ -1,7 +1,11 @@
 import streamlit as st
+import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
-from agents import Bond007, Stonker, CallMeMaybe, InsightGenerator
+from agents import Bond007, Stonker, CallMeMaybe, InsightGenerator, get_store
+from agents.hot_reload import HotReloader
+from agents.scenarios import AXES, AXIS_LABELS
+from agents.serialization import to_record
 
 st.set_page_config(
     page_title="Over or Under",
@@ -32,14 +36,30 @@ st.markdown("""
 
 @st.cache_resource
 def get_agents():
+    store = get_store()
     return {
-        'bond007': Bond007(),
-        'stonker': Stonker(),
-        'call_me_maybe': CallMeMaybe(),
-        'insight_gen': InsightGenerator()
+        'bond007': Bond007(store=store),
+        'stonker': Stonker(store=store),
+        'call_me_maybe': CallMeMaybe(store=store),
+        'insight_gen': InsightGenerator(store=store)
     }
 
+@st.cache_data(max_entries=32)
+def scenario_grid(ticker, equities_version, benchmarks_version):
+    return get_agents()['stonker'].scenario_grid(ticker)
+
+def get_scenario_grid(ticker):
+    store = get_store()
+    return scenario_grid(ticker, store.version('equities'), store.version('benchmarks'))
+
+@st.cache_resource
+def get_reloader():
+    return HotReloader(get_store(), get_agents())
+
 agents = get_agents()
+data_changes = get_reloader().check()
+if data_changes:
+    st.toast(f"🔄 Market data refreshed: {', '.join(data_changes)}")
 
 with st.sidebar:
     st.header("🔍 Select Asset")
@@ -63,9 +83,7 @@ with st.sidebar:
         options = agents['stonker'].equities_df['ticker'].tolist()
         agent_name = "Stonker 📈"
     else:
-        deriv_df = agents['call_me_maybe'].derivatives_df
-        options = [f"{row['underlying']}_{row['type']}_{int(row['strike'])}" 
-                  for _, row in deriv_df.iterrows()]
+        options = agents['call_me_maybe'].identifiers()
         agent_name = "CallMeMaybe 📞"
     
     selected = st.selectbox("Choose Instrument:", options)
@@ -83,6 +101,9 @@ with st.sidebar:
         </div>
         """, unsafe_allow_html=True)
 
+    cache_stats = agents['stonker'].result_cache.stats()
+    st.caption(f"⚡ Result cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses")
+
 if analyze_button:
     with st.spinner(f"{agent_name} is analyzing..."):
         try:
@@ -93,10 +114,6 @@ if analyze_button:
             else:
                 result = agents['call_me_maybe'].analyze(selected)
             
-            with st.spinner("🤖 Generating fun insights..."):
-                explanation = agents['insight_gen'].generate_explanation(result)
-                result['explanation'] = explanation
-            
             st.session_state.result = result
             st.success(f"✅ {agent_name} has spoken!")
             st.rerun()
@@ -124,14 +141,19 @@ if 'result' in st.session_state:
     
     st.markdown(f"### 💬 {r['agent']} says:")
     
-    explanation_text = r.get('explanation', 'Analysis complete.')
+    def render_explanation(slot, explanation_text):
+        if 'OVERVALUED' in r['verdict']:
+            slot.warning(f"😤 **{explanation_text}**")
+        elif 'UNDERVALUED' in r['verdict']:
+            slot.success(f"💎 **{explanation_text}**")
+        else:
+            slot.info(f"😊 **{explanation_text}**")
     
-    if 'OVERVALUED' in r['verdict']:
-        st.warning(f"😤 **{explanation_text}**")
-    elif 'UNDERVALUED' in r['verdict']:
-        st.success(f"💎 **{explanation_text}**")
+    explanation_slot = st.empty()
+    if 'explanation' in r:
+        render_explanation(explanation_slot, r['explanation'])
     else:
-        st.info(f"😊 **{explanation_text}**")
+        explanation_slot.info("🤖 Generating fun insights...")
     
     st.markdown("---")
     
@@ -225,11 +247,11 @@ if 'result' in st.session_state:
         
         st.markdown("### 📈 Peer Comparison")
         
-        if len(r['peers']) > 0:
+        # peer rows come out of the shared frame only here, when the chart needs them
+        peers_df = r['peers']
+        if len(peers_df) > 0:
             fig = go.Figure()
             
-            peers_df = r['peers']
-            
             fig.add_trace(go.Scatter(
                 x=peers_df['pe_ratio'],
                 y=peers_df['pb_ratio'],
@@ -275,29 +297,59 @@ if 'result' in st.session_state:
         st.markdown("---")
         st.subheader("🔮 What-If Scenarios")
         
+        grid = get_scenario_grid(r['equity']['ticker'])
+        
+        # sliders only pick grid points, so every move is a lookup rather than a re-analysis
+        current = grid.index()
+        scenario = {}
+        for col, name, position in zip(st.columns(len(AXES)), AXES, current):
+            values = grid.axes[name]
+            with col:
+                if not np.isfinite(values).all():
+                    st.caption(f"{AXIS_LABELS[name]}: N/A")
+                    continue
+                scenario[name] = st.select_slider(
+                    AXIS_LABELS[name],
+                    options=values.tolist(),
+                    value=values[position].item(),
+                    format_func=lambda v, name=name: f"{v:.0%}" if name == 'discount_rate' else f"{v:,.1f}",
+                    key=f"what_if_{grid.ticker}_{name}"
+                )
+        
+        outcome = grid.lookup(**scenario)
         col1, col2, col3 = st.columns(3)
-        
         with col1:
-            new_pe = st.slider("P/E Ratio", 5.0, 200.0, float(r['equity']['pe_ratio']), 1.0)
-        
+            st.metric("Scenario Verdict", outcome['verdict'].replace('_', ' '))
         with col2:
-            new_pb = st.slider("P/B Ratio", 0.5, 60.0, float(r['equity']['pb_ratio']), 0.5)
-        
+            st.metric("Confidence", f"{outcome['confidence']}%", delta=outcome['confidence'] - r['confidence'])
         with col3:
-            new_ev = st.slider("EV/EBITDA", 5.0, 100.0, float(r['equity']['ev_ebitda']), 1.0)
+            fair_value = outcome['weighted_fair_value']
+            st.metric("Fair Value", f"${fair_value:.2f}" if pd.notna(fair_value) else "N/A")
         
-        if st.button("🔄 Recalculate"):
-            delta_pe = new_pe - r['equity']['pe_ratio']
-            price_change = (delta_pe / r['equity']['pe_ratio']) * 100
-            
-            if abs(price_change) > 20:
-                st.balloons()
-                if price_change < 0:
-                    st.success(f"🎉 Stock is being GREEDY! Needs {abs(price_change):.1f}% price drop to be fair!")
-                else:
-                    st.success(f"💎 Hidden gem! Could be {price_change:.1f}% undervalued!")
-            else:
-                st.info("📊 Small change - verdict likely similar")
+        col1, col2 = st.columns(2)
+        with col1:
+            x_axis = st.selectbox("Heatmap X", AXES, index=0, format_func=AXIS_LABELS.get)
+        with col2:
+            y_axis = st.selectbox("Heatmap Y", [a for a in AXES if a != x_axis], index=3, format_func=AXIS_LABELS.get)
+        
+        heatmap = grid.heatmap(x_axis, y_axis, **scenario)
+        # signed confidence: red leans overvalued, green undervalued
+        sign = np.select([heatmap['verdict'] == 'UNDERVALUED', np.isin(heatmap['verdict'], ['OVERVALUED', 'EXTREMELY_OVERVALUED'])], [-1, 1], 0)
+        z = heatmap['confidence'] * sign
+        text = [[f"{v.replace('_', ' ')} ({c}%)" for v, c in zip(vs, cs)]
+                for vs, cs in zip(heatmap['verdict'], heatmap['confidence'])]
+        fig = go.Figure(go.Heatmap(
+            x=heatmap['x'], y=heatmap['y'], z=z, text=text,
+            hovertemplate="%{x}, %{y}<br>%{text}<extra></extra>",
+            colorscale=[[0, 'green'], [0.5, 'lightyellow'], [1, 'red']], zmin=-95, zmax=95, showscale=False
+        ))
+        fig.add_trace(go.Scatter(
+            x=[outcome['inputs'][x_axis]], y=[outcome['inputs'][y_axis]],
+            mode='markers', marker=dict(size=14, color='black', symbol='x'), name='Scenario'
+        ))
+        fig.update_layout(title=f"Verdict across {grid.size:,} scenarios", xaxis_title=AXIS_LABELS[x_axis],
+                          yaxis_title=AXIS_LABELS[y_axis], height=450)
+        st.plotly_chart(fig, use_container_width=True)
     
     elif r['instrument_type'] == 'bond':
         st.subheader("📊 Bond Metrics")
@@ -314,15 +366,14 @@ if 'result' in st.session_state:
         
         with col3:
             spread = r.get('credit_spread', 0)
-            st.metric("Credit Spread", f"{spread:.2f}%")
+            st.metric("Credit Spread", f"{spread:.2f}%", help="Over the Treasury curve yield at the bond's maturity")
         
-        if len(r['peers']) > 0:
+        peers_df = r['peers']
+        if len(peers_df) > 0:
             st.markdown("### 📈 Yield vs Peers")
             
             fig = go.Figure()
             
-            peers_df = r['peers']
-            
             fig.add_trace(go.Bar(
                 x=peers_df['issuer'],
                 y=peers_df['yield_pct'],
@@ -363,7 +414,25 @@ if 'result' in st.session_state:
         st.plotly_chart(fig, use_container_width=True)
     
     with st.expander("🔍 Technical Details"):
-        st.json(r)
+        if r.get('timings'):
+            st.markdown("**⏱️ Stage timings**")
+            timings = pd.DataFrame([
+                {'Stage': stage, 'Time (ms)': round(timing['ms'], 3), 'Calls': timing['calls']}
+                for stage, timing in r['timings'].items()
+            ])
+            st.dataframe(timings, hide_index=True, use_container_width=True)
+        st.json({key: value for key, value in to_record(r).items() if key != 'timings'})
+    
+    # the panels above are already on screen, the explanation streams into its slot last
+    if 'explanation' not in r:
+        explanation_text = 'Analysis complete.'
+        try:
+            for explanation_text in agents['insight_gen'].stream_explanation(r):
+                render_explanation(explanation_slot, explanation_text)
+        except Exception as e:
+            explanation_text = agents['insight_gen'].fallback(r)
+            render_explanation(explanation_slot, explanation_text)
+        r['explanation'] = explanation_text
 
 else:
     st.info("👈 Select an instrument to analyze")
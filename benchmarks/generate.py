@@ -0,0 +1,167 @@
+import argparse
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from agents.data_store import BENCHMARKS, DATASETS
+from agents.pricing import black_scholes_greeks, black_scholes_price
+
+EQUITY_SECTORS = ['Tech', 'Auto', 'Energy', 'Finance', 'Telecom', 'Materials']
+EQUITY_WEIGHTS = [0.30, 0.08, 0.14, 0.24, 0.10, 0.14]
+BOND_SECTORS = ['Government', 'Municipal', 'Tech', 'Finance', 'Energy', 'Auto', 'Telecom', 'Materials']
+BOND_WEIGHTS = [0.08, 0.10, 0.18, 0.24, 0.12, 0.08, 0.10, 0.10]
+RATINGS = ['AAA', 'AA+', 'AA', 'AA-', 'A+', 'A', 'A-', 'BBB+', 'BBB', 'BBB-', 'BB+', 'BB', 'B', 'B-']
+# spread over Treasuries in percentage points, by rating notch
+RATING_SPREADS = np.array([0.0, 0.3, 0.4, 0.5, 0.7, 0.8, 1.0, 1.3, 1.5, 1.8, 2.6, 3.2, 4.8, 5.8])
+EXPIRIES = [7, 14, 30, 60, 90, 180, 365]
+STRIKE_STEPS = np.linspace(0.8, 1.2, 10)
+CHAIN_SIZE = 2 * len(EXPIRIES) * len(STRIKE_STEPS)
+# a whole number of option chains, so no chain is split across two random streams
+CHUNK_ROWS = 1_000_000 // CHAIN_SIZE * CHAIN_SIZE
+
+
+def codes(start, n, width=4):
+    # distinct upper-case symbols for a contiguous block of row numbers
+    numbers = np.arange(start, start + n)
+    letters = np.empty((n, width), dtype='<U1')
+    for i in range(width - 1, -1, -1):
+        letters[:, i] = np.array(list('ABCDEFGHIJKLMNOPQRSTUVWXYZ'))[numbers % 26]
+        numbers = numbers // 26
+    symbols = np.char.add(np.char.add(np.char.add(letters[:, 0], letters[:, 1]), letters[:, 2]), letters[:, 3])
+    overflow = numbers > 0
+    if overflow.any():
+        symbols = np.where(overflow, np.char.add(symbols, numbers.astype(str)), symbols)
+    return symbols
+
+
+def equities(rng, start, n):
+    ticker = codes(start, n)
+    price = np.exp(rng.normal(np.log(60), 0.9, n)).round(2)
+    shares_out_m = np.exp(rng.normal(np.log(500), 1.2, n)).round(0) + 1
+    market_cap_b = price * shares_out_m / 1000
+    revenue_b = market_cap_b / np.exp(rng.normal(np.log(3), 0.7, n))
+    net_income_b = revenue_b * rng.normal(0.10, 0.12, n)
+    total_assets_b = revenue_b * rng.uniform(0.6, 2.5, n)
+    total_liabilities_b = total_assets_b * rng.uniform(0.2, 1.05, n)
+    book_b = total_assets_b - total_liabilities_b
+    ebitda_b = revenue_b * rng.uniform(0.05, 0.4, n)
+    eps = net_income_b * 1000 / shares_out_m
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        df = pd.DataFrame({
+            'ticker': ticker,
+            'company': np.char.add(ticker, ' Holdings'),
+            'sector': rng.choice(EQUITY_SECTORS, n, p=EQUITY_WEIGHTS),
+            'price': price,
+            'market_cap_b': market_cap_b.round(1),
+            'total_assets_b': total_assets_b.round(1),
+            'total_liabilities_b': total_liabilities_b.round(1),
+            'revenue_b': revenue_b.round(1),
+            'net_income_b': net_income_b.round(1),
+            'fcf_b': (net_income_b * rng.uniform(0.6, 1.3, n) + rng.normal(0, 0.05, n) * revenue_b).round(1),
+            'ebitda_b': ebitda_b.round(1),
+            'shares_out_m': shares_out_m,
+            'pe_ratio': np.where(eps > 0, price / eps, np.nan).round(1),
+            'pb_ratio': np.where(book_b > 0, market_cap_b / book_b, np.nan).round(1),
+            'ps_ratio': (market_cap_b / revenue_b).round(1),
+            'ev_ebitda': ((market_cap_b + 0.5 * total_liabilities_b) / ebitda_b).round(1),
+            'dividend_yield': np.where(rng.random(n) < 0.4, 0.0, rng.uniform(0.3, 5.0, n)).round(2),
+            'roe': np.where(book_b > 0, 100 * net_income_b / book_b, np.nan).round(1),
+            'revenue_growth_5yr': rng.normal(8, 8, n).round(1),
+            'eps_growth_5yr': rng.normal(10, 12, n).round(1),
+            'beta': rng.uniform(0.4, 2.2, n).round(2),
+            'debt_to_equity': np.where(book_b > 0, total_liabilities_b / book_b, 9.99).clip(0, 9.99).round(2)
+        })
+    return df
+
+
+def bonds(rng, start, n):
+    sector = rng.choice(BOND_SECTORS, n, p=BOND_WEIGHTS)
+    government = sector == 'Government'
+    maturity_years = np.where(rng.random(n) < 0.7, rng.integers(1, 31, n), rng.uniform(0.5, 30, n).round(1))
+    notch = np.clip(rng.normal(6, 3, n).round().astype(int), 0, len(RATINGS) - 1)
+    notch = np.where(government, 0, np.where(sector == 'Municipal', np.minimum(notch, 5), notch))
+
+    treasury = 3.9 + 0.35 * np.log1p(maturity_years)
+    yield_pct = (treasury + RATING_SPREADS[notch] + rng.normal(0, 0.25, n) * (~government)).round(2)
+    coupon_pct = np.clip(yield_pct + rng.normal(0, 0.6, n), 0, None).round(2)
+    price = (100 + (coupon_pct - yield_pct) * np.minimum(maturity_years, 10) * 0.8).round(2)
+    corporate = ~government & (sector != 'Municipal')
+    total_debt_m = np.where(corporate, np.exp(rng.normal(np.log(20000), 1.3, n)), 0).round(0)
+
+    year = (2026 + np.ceil(maturity_years)).astype(int).astype(str)
+    name = np.where(government, 'US Treasury ', np.where(sector == 'Municipal', 'Muni ', ''))
+    issuer = np.char.add(np.char.add(np.char.add(name, codes(start, n)), ' '), year)
+    return pd.DataFrame({
+        'issuer': issuer,
+        'sector': sector,
+        'yield_pct': yield_pct,
+        'maturity_years': maturity_years,
+        'rating': np.array(RATINGS)[notch],
+        'price': price,
+        'coupon_pct': coupon_pct,
+        'total_debt_m': total_debt_m,
+        'market_cap_m': np.where(corporate, total_debt_m * rng.uniform(0.3, 8, n), 0).round(0)
+    })
+
+
+def derivatives(rng, start, n):
+    # whole option chains per underlying: both types, every expiry, ten strikes around spot
+    row = np.arange(start, start + n)
+    chain, slot = row // CHAIN_SIZE, row % CHAIN_SIZE
+    first, count = chain[0], chain[-1] - chain[0] + 1
+    spot = np.exp(rng.normal(np.log(120), 0.9, count)).clip(2).round(2)[chain - first]
+    base_vol = rng.uniform(0.15, 0.8, count)[chain - first]
+    skew = rng.uniform(0.2, 1.5, count)[chain - first]
+
+    is_call = slot < CHAIN_SIZE // 2
+    expiry_days = np.array(EXPIRIES)[(slot % (CHAIN_SIZE // 2)) // len(STRIKE_STEPS)]
+    strike = (spot * STRIKE_STEPS[slot % len(STRIKE_STEPS)]).round(2)
+    moneyness = np.log(strike / spot)
+    t = expiry_days / 365
+    implied_vol = np.clip(base_vol + skew * moneyness ** 2 - 0.1 * moneyness + rng.normal(0, 0.02, n), 0.05, 3)
+    greeks = black_scholes_greeks(spot, strike, t, implied_vol, is_call, rate=0.0435)
+
+    return pd.DataFrame({
+        'underlying': codes(chain[0], count)[chain - first],
+        'type': np.where(is_call, 'call', 'put'),
+        'strike': strike,
+        'expiry_days': expiry_days,
+        'current_price': np.maximum(black_scholes_price(spot, strike, t, implied_vol, is_call, rate=0.0435), 0.01).round(2),
+        'implied_vol': implied_vol.round(3),
+        'historical_vol': (base_vol * rng.uniform(0.6, 1.4, n)).round(3),
+        'delta': greeks['delta'].round(2),
+        'gamma': greeks['gamma'].round(3),
+        'vega': greeks['vega'].round(2),
+        'underlying_price': spot
+    })
+
+
+GENERATORS = {'equities': equities, 'bonds': bonds, 'derivatives': derivatives}
+
+
+def generate(out_dir, rows, seed=0, datasets=None):
+    os.makedirs(out_dir, exist_ok=True)
+    for name in datasets or DATASETS:
+        index = list(DATASETS).index(name)
+        path = os.path.join(out_dir, DATASETS[name])
+        with open(path, 'w', newline='') as f:
+            for chunk, start in enumerate(range(0, rows, CHUNK_ROWS)):
+                # one stream per dataset and chunk, so a subset regenerates the same rows
+                rng = np.random.default_rng([seed, index, chunk])
+                df = GENERATORS[name](rng, start, min(CHUNK_ROWS, rows - start))
+                df.to_csv(f, index=False, header=chunk == 0)
+    shutil.copy(os.path.join(os.path.dirname(__file__), '..', 'data', BENCHMARKS), os.path.join(out_dir, BENCHMARKS))
+    return out_dir
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Write a seeded synthetic equities/bonds/derivatives universe.")
+    parser.add_argument('rows', type=int, help="rows per dataset, e.g. 1000 up to 10000000")
+    parser.add_argument('-o', '--out', default='benchmarks/universe')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--datasets', nargs='+', choices=list(DATASETS))
+    args = parser.parse_args()
+    generate(os.path.join(args.out, str(args.rows)), args.rows, args.seed, args.datasets)
@@ -0,0 +1,110 @@
+import argparse
+import math
+import sys
+
+import numpy as np
+
+from agents import Stonker
+from agents.data_store import DataStore
+from agents.peer_index import _SortedValues
+from benchmarks.run import universe
+
+INTRINSIC = ['graham_number', 'dcf_value', 'gordon_value', 'weighted_fair_value', 'margin_of_safety']
+# leave-one-out cases where a running-sum stdev loses the answer to cancellation
+STATS_CASES = [
+    [10, 12, 14, 11, 3e9],
+    [1e-300, 2e-300, 1e300, 3.0],
+    [1.0, 2.0],
+    [5.0, math.nan, 7.0, 9.0],
+    [1.0, math.inf, 3.0, 4.0]
+]
+
+
+def _same(expected, actual):
+    if expected is None:
+        return actual is None or (isinstance(actual, float) and math.isnan(actual))
+    if isinstance(expected, str) or isinstance(actual, str):
+        return expected == actual
+    return expected == actual or (math.isnan(expected) and math.isnan(actual))
+
+
+def check_sorted_values(cases, seed=0):
+    rng = np.random.default_rng(seed)
+    cases = [np.array(case, dtype=float) for case in cases] + [np.round(rng.lognormal(2, 1, 500), 1)]
+    failures = []
+    for values in cases:
+        keys = np.array([f"k{i}" for i in range(len(values))], dtype=object)
+        if len(values) > 2:
+            # one key listed twice leaves out both of its values
+            keys[-1] = keys[0]
+        column = _SortedValues(values, keys)
+        queries = list(dict.fromkeys(keys.tolist())) + ['missing']
+        medians, stds = column.bulk_stats(np.array(queries, dtype=object))
+        for key, bulk_median, bulk_std in zip(queries, medians.tolist(), stds.tolist()):
+            expected = column.stats(key)
+            expected_median, expected_std = expected if expected is not None else (None, None)
+            if not (_same(expected_median, bulk_median) and _same(expected_std, bulk_std)):
+                failures.append(f"{values.tolist()[:6]} without {key}: stats {expected} bulk {(bulk_median, bulk_std)}")
+    return failures
+
+
+def check_stonker(agent):
+    # every number analyze_all reports has to be what analyze gives for the same ticker, to the bit
+    frame = agent.analyze_all().drop_duplicates('ticker').set_index('ticker', drop=False)
+    failures = []
+    for ticker, row in frame.iterrows():
+        result = agent.analyze(ticker)
+        checks = [('verdict', result['verdict'], row['verdict']),
+                  ('confidence', result['confidence'], row['confidence']),
+                  ('tobins_q', result['tobins_q'], row['tobins_q'])]
+        checks += [(name, result['intrinsic_values'][name], row[name]) for name in INTRINSIC]
+        for metric in ('pe', 'pb', 'ev_ebitda'):
+            peers = result['peer_multiples'].get(metric)
+            checks.append((metric + '_valid', peers is not None, bool(row[metric + '_valid'])))
+            if peers is not None:
+                checks.append((metric + '_peer_median', peers['peer_median'], row[metric + '_peer_median']))
+                checks.append((metric + '_z_score', peers['z_score'], row[metric + '_z_score']))
+        failures += [f"{ticker} {name}: analyze {expected!r} analyze_all {actual!r}"
+                     for name, expected, actual in checks if not _same(expected, actual)]
+    return failures
+
+
+def with_outliers(agent, count=3, value=3e9, seed=0):
+    # a few tickers with absurd multiples, so their sectors' leave-one-out stats drop an outlier
+    df = agent.equities_df.copy()
+    rows = np.random.default_rng(seed).choice(len(df), size=min(count, len(df)), replace=False)
+    for column in ('pe_ratio', 'pb_ratio', 'ev_ebitda'):
+        df.iloc[rows, df.columns.get_loc(column)] = value
+    agent.equities_df = df
+    return agent
+
+
+def run(args):
+    failures = check_sorted_values(STATS_CASES, args.seed)
+    data_dirs = [args.data_dir] + [universe(rows, args.seed, args.universe_dir) for rows in args.sizes]
+    for data_dir in data_dirs:
+        for outliers in (False, True):
+            agent = Stonker(store=DataStore(data_dir), result_cache=False)
+            if outliers:
+                with_outliers(agent, seed=args.seed)
+            found = check_stonker(agent)
+            print(f"[parity] stonker {data_dir}{' with outliers' if outliers else ''}: "
+                  f"{len(agent.equities_df):,} tickers, {len(found)} mismatches", file=sys.stderr)
+            failures += found
+
+    for failure in failures[:50]:
+        print(f"MISMATCH {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Check that the bulk paths reproduce the per-instrument ones exactly.")
+    parser.add_argument('--data-dir', default='data')
+    parser.add_argument('--sizes', nargs='*', type=int, default=[1000], help="synthetic universes to check as well")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--universe-dir', help="where generated universes are kept, default benchmarks/universe")
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    sys.exit(run(parse_args()))
@@ -0,0 +1,266 @@
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from agents import Bond007, Stonker, CallMeMaybe
+from agents.contract_index import format_identifier
+from agents.data_store import DataStore
+from benchmarks.generate import generate
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(HERE, 'baseline.json')
+AGENTS = ['stonker', 'bond007', 'call_me_maybe']
+# differences below these are timer noise, whatever the relative change;
+# rates are derived from the timings and are not compared on their own
+NOISE_FLOOR = {'ms': 0.05, 's': 0.01, 'MB': 5.0}
+# timings are only compared against a baseline recorded on the same kind of box and stack
+MACHINE_KEYS = ('machine', 'cpu', 'cpus', 'python', 'numpy', 'pandas')
+
+
+def universe(rows, seed, root=None):
+    directory = os.path.join(root or os.path.join(HERE, 'universe'), str(rows))
+    marker = os.path.join(directory, 'universe.json')
+    try:
+        with open(marker) as f:
+            if json.load(f) == {'rows': rows, 'seed': seed}:
+                return directory
+    except (OSError, ValueError):
+        pass
+    generate(directory, rows, seed)
+    with open(marker, 'w') as f:
+        json.dump({'rows': rows, 'seed': seed}, f)
+    return directory
+
+
+def _latency(call, arguments, rounds=3):
+    arguments = list(arguments)
+    for argument in arguments[:10]:
+        call(argument)
+    # best of a few rounds per argument, so a scheduler hiccup does not read as a regression
+    samples = np.full(len(arguments), np.inf)
+    for _ in range(rounds):
+        for i, argument in enumerate(arguments):
+            start = time.perf_counter()
+            call(argument)
+            samples[i] = min(samples[i], time.perf_counter() - start)
+    samples *= 1000
+    return {
+        'p50_ms': float(np.percentile(samples, 50)),
+        'p95_ms': float(np.percentile(samples, 95)),
+        'mean_ms': float(samples.mean())
+    }
+
+
+def _build(name, store):
+    if name == 'stonker':
+        return Stonker(store=store, result_cache=False)
+    if name == 'bond007':
+        return Bond007(store=store, result_cache=False)
+    return CallMeMaybe(store=store, result_cache=False)
+
+
+def measure(name, data_dir, samples, seed):
+    metrics = {}
+    cache_dir = tempfile.mkdtemp(prefix='bench-cache-')
+    try:
+        # cold: CSV parse, binary cache write and index build; warm: memory-mapped reopen
+        start = time.perf_counter()
+        _build(name, DataStore(data_dir, cache_dir))
+        metrics['startup_cold_s'] = time.perf_counter() - start
+        start = time.perf_counter()
+        agent = _build(name, DataStore(data_dir, cache_dir))
+        metrics['startup_warm_s'] = time.perf_counter() - start
+
+        rng = np.random.default_rng(seed)
+        if name == 'stonker':
+            df = agent.equities_df
+            rows = [df.iloc[i].to_dict() for i in rng.choice(len(df), min(samples, len(df)), replace=False)]
+            peers = [agent.get_peers(row) for row in rows]
+            timings = {
+                'get_peers': _latency(agent.get_peers, rows),
+                'analyze_peer_multiples': _latency(lambda i: agent.analyze_peer_multiples(rows[i], peers[i]), range(len(rows))),
+                'indexed_peer_multiples': _latency(agent.indexed_peer_multiples, rows),
+                'calculate_intrinsic_values': _latency(agent.calculate_intrinsic_values, rows),
+                'analyze': _latency(agent.analyze, [row['ticker'] for row in rows])
+            }
+            bulk, bulk_rows = agent.analyze_all, len(df)
+        elif name == 'bond007':
+            df = agent.bonds_df
+            rows = [df.iloc[i].to_dict() for i in rng.choice(len(df), min(samples, len(df)), replace=False)]
+            peers = [agent.get_peers(row) for row in rows]
+            timings = {
+                'get_peers': _latency(agent.get_peers, rows),
+                'analyze_yield_spread': _latency(lambda i: agent.analyze_yield_spread(rows[i], peers[i]), range(len(rows))),
+                'analyze': _latency(agent.analyze, [row['issuer'] for row in rows])
+            }
+            bulk, bulk_rows = agent.analyze_all, len(df)
+        else:
+            df = agent.derivatives_df
+            rows = [df.iloc[i].to_dict() for i in rng.choice(len(df), min(samples, len(df)), replace=False)]
+            identifiers = [format_identifier(row['underlying'], row['type'], row['strike'], row['expiry_days']) for row in rows]
+            timings = {
+                'get_peers': _latency(agent.get_peers, rows),
+                'analyze': _latency(agent.analyze, identifiers)
+            }
+            bulk, bulk_rows = agent.price_all, len(df)
+
+        for stage, stats in timings.items():
+            for stat, value in stats.items():
+                metrics[f"{stage}_{stat}"] = value
+        metrics['analyze_calls_per_s'] = 1000 / timings['analyze']['mean_ms']
+
+        start = time.perf_counter()
+        bulk()
+        elapsed = time.perf_counter() - start
+        metrics['full_universe_s'] = elapsed
+        metrics['full_universe_rows_per_s'] = bulk_rows / elapsed
+        if name == 'bond007':
+            start = time.perf_counter()
+            agent.analytics()
+            metrics['bond_analytics_s'] = time.perf_counter() - start
+        # ru_maxrss is in KiB on Linux and bytes on macOS
+        scale = 1 if sys.platform == 'darwin' else 1024
+        metrics['peak_rss_MB'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 2 ** 20
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+    return metrics
+
+
+def _child(name, data_dir, samples, seed, queue):
+    try:
+        queue.put(('ok', measure(name, data_dir, samples, seed)))
+    except BaseException as e:
+        queue.put(('error', f"{type(e).__name__}: {e}"))
+
+
+def measure_isolated(name, data_dir, samples, seed):
+    # a fresh interpreter per case keeps startup and peak memory independent of earlier cases
+    context = multiprocessing.get_context('spawn')
+    queue = context.Queue()
+    process = context.Process(target=_child, args=(name, data_dir, samples, seed, queue))
+    process.start()
+    status, payload = queue.get()
+    process.join()
+    if status != 'ok':
+        raise RuntimeError(f"{name}: {payload}")
+    return payload
+
+
+def unit(metric):
+    if metric.endswith('_per_s'):
+        return 'rows/s' if metric.endswith('rows_per_s') else 'calls/s'
+    if metric.endswith('_ms'):
+        return 'ms'
+    if metric.endswith('_s'):
+        return 's'
+    if metric.endswith('_MB'):
+        return 'MB'
+
+
+def cpu_model():
+    # platform.processor() is empty on most Linux boxes, /proc/cpuinfo names the part
+    try:
+        with open('/proc/cpuinfo') as f:
+            for line in f:
+                if line.startswith('model name'):
+                    return line.split(':', 1)[1].strip()
+    except OSError:
+        pass
+    return platform.processor()
+
+
+def machine_differences(meta, baseline_meta):
+    return [f"{key} {baseline_meta.get(key)!r} -> {meta[key]!r}"
+            for key in MACHINE_KEYS if baseline_meta.get(key) != meta[key]]
+
+
+def compare(results, baseline, tolerance):
+    previous = {(r['agent'], r['rows'], r['metric']): r['value'] for r in baseline['results']}
+    regressions = []
+    for result in results:
+        before = previous.get((result['agent'], result['rows'], result['metric']))
+        if before is None or before <= 0 or result['unit'] not in NOISE_FLOOR:
+            continue
+        after = result['value']
+        worse = after - before
+        if worse > tolerance * before and worse > NOISE_FLOOR[result['unit']]:
+            regressions.append({**result, 'baseline': before, 'change': (after - before) / before})
+    return regressions
+
+
+def run(args):
+    results = []
+    for rows in args.sizes:
+        data_dir = universe(rows, args.seed, args.universe_dir)
+        for name in args.agents:
+            print(f"[bench] {name} @ {rows:,} rows", file=sys.stderr)
+            metrics = measure_isolated(name, data_dir, args.samples, args.seed)
+            results.extend(
+                {'agent': name, 'rows': rows, 'metric': metric, 'value': value, 'unit': unit(metric)}
+                for metric, value in metrics.items()
+            )
+
+    report = {
+        'meta': {
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'machine': platform.machine(),
+            'cpu': cpu_model(),
+            'cpus': os.cpu_count(),
+            'seed': args.seed,
+            'samples': args.samples
+        },
+        'results': results
+    }
+
+    if args.baseline and os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        differences = machine_differences(report['meta'], baseline['meta'])
+        if differences:
+            report['baseline_skipped'] = differences
+            print(f"[bench] not compared, {args.baseline} was recorded elsewhere ({'; '.join(differences)}); "
+                  f"record one here with --save-baseline", file=sys.stderr)
+        else:
+            report['regressions'] = compare(results, baseline, args.tolerance)
+
+    with open(args.baseline if args.save_baseline else args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    for result in results:
+        print(f"{result['agent']:>14} {result['rows']:>10,} {result['metric']:<40} {result['value']:>14.4f} {result['unit']}")
+    for regression in report.get('regressions', []):
+        print(f"REGRESSION {regression['agent']} @ {regression['rows']:,} {regression['metric']}: "
+              f"{regression['baseline']:.4f} -> {regression['value']:.4f} {regression['unit']} "
+              f"({regression['change']:+.0%})", file=sys.stderr)
+    return 1 if report.get('regressions') else 0
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark every agent on seeded synthetic universes.")
+    parser.add_argument('--sizes', nargs='+', type=int, default=[1000, 10000], help="rows per dataset, 1000 up to 10000000")
+    parser.add_argument('--agents', nargs='+', choices=AGENTS, default=AGENTS)
+    parser.add_argument('--samples', type=int, default=200, help="identifiers timed per hot path")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--universe-dir', help="where generated universes are kept, default benchmarks/universe")
+    parser.add_argument('-o', '--output', default=os.path.join(HERE, 'results.json'))
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true', help="write the results as the new baseline")
+    parser.add_argument('--tolerance', type=float, default=0.5, help="relative slowdown that counts as a regression")
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    sys.exit(run(parse_args()))
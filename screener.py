@@ -0,0 +1,222 @@
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from agents import Bond007, Stonker, CallMeMaybe, get_store
+from agents.serialization import to_record
+
+ASSETS = ['equity', 'bond', 'derivative']
+CORE_COLUMNS = ['instrument_type', 'agent', 'identifier', 'name', 'sector', 'verdict', 'confidence', 'error', 'details']
+
+_agents = None
+
+
+def build_agents(data_dir, use_model_iv=False, use_surface=False):
+    store = get_store(data_dir)
+    # a screen touches every instrument once, the shared result cache would only add copies
+    return {
+        'equity': Stonker(store=store, result_cache=False),
+        'bond': Bond007(store=store, result_cache=False),
+        'derivative': CallMeMaybe(use_model_iv=use_model_iv, use_surface=use_surface, store=store, result_cache=False)
+    }
+
+
+def _init_worker(data_dir, use_model_iv, use_surface):
+    global _agents
+    _agents = build_agents(data_dir, use_model_iv, use_surface)
+
+
+def list_identifiers(agents, assets, ids=None, sectors=None):
+    wanted = set(ids) if ids else None
+    selected = []
+    for asset in assets:
+        agent = agents[asset]
+        if asset == 'equity':
+            df = agent.equities_df
+            names = df['ticker'].tolist()
+        elif asset == 'bond':
+            df = agent.bonds_df
+            names = df['issuer'].tolist()
+        else:
+            df = agent.derivatives_df
+            names = agent.identifiers()
+
+        for i, name in enumerate(names):
+            if sectors and asset != 'derivative' and df['sector'].iat[i] not in sectors:
+                continue
+            # an underlying symbol selects its whole option chain
+            if wanted is not None and name not in wanted and not (asset == 'derivative' and df['underlying'].iat[i] in wanted):
+                continue
+            selected.append((asset, name))
+    return selected
+
+
+def screen(asset, identifier, agents=None):
+    agents = agents or _agents
+    try:
+        result = agents[asset].analyze(identifier)
+    except Exception as e:
+        return {'instrument_type': asset, 'identifier': identifier, 'verdict': 'ERROR', 'confidence': 0, 'error': str(e)}
+    record = to_record(result)
+    record['identifier'] = identifier
+    return record
+
+
+def _screen_chunk(chunk):
+    return [screen(asset, identifier) for asset, identifier in chunk]
+
+
+def flat_row(record):
+    instrument = record.get(record['instrument_type']) or {}
+    details = {key: value for key, value in record.items() if key not in CORE_COLUMNS}
+    return {
+        'instrument_type': record['instrument_type'],
+        'agent': record.get('agent'),
+        'identifier': record['identifier'],
+        'name': instrument.get('company') or instrument.get('issuer') or instrument.get('underlying'),
+        'sector': instrument.get('sector'),
+        'verdict': record['verdict'],
+        'confidence': record['confidence'],
+        'error': record.get('error'),
+        'details': json.dumps(details) if details else None
+    }
+
+
+class JsonLinesWriter:
+    def __init__(self, path):
+        self.file = open(path, 'w') if path != '-' else sys.stdout
+
+    def write(self, records):
+        for record in records:
+            self.file.write(json.dumps(record) + '\n')
+        self.file.flush()
+
+    def close(self):
+        if self.file is not sys.stdout:
+            self.file.close()
+
+
+class CsvWriter:
+    def __init__(self, path):
+        self.file = open(path, 'w', newline='') if path != '-' else sys.stdout
+        self.writer = csv.DictWriter(self.file, fieldnames=CORE_COLUMNS)
+        self.writer.writeheader()
+
+    def write(self, records):
+        self.writer.writerows(flat_row(record) for record in records)
+        self.file.flush()
+
+    def close(self):
+        if self.file is not sys.stdout:
+            self.file.close()
+
+
+class ParquetWriter:
+    def __init__(self, path):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise SystemExit("Parquet output needs pyarrow: pip install pyarrow")
+        self.pa = pa
+        self.schema = pa.schema([
+            (column, pa.int64() if column == 'confidence' else pa.string()) for column in CORE_COLUMNS
+        ])
+        self.writer = pq.ParquetWriter(path, self.schema)
+
+    def write(self, records):
+        if records:
+            rows = [flat_row(record) for record in records]
+            self.writer.write_table(self.pa.Table.from_pylist(rows, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+
+WRITERS = {'jsonl': JsonLinesWriter, 'csv': CsvWriter, 'parquet': ParquetWriter}
+
+
+def output_format(path, fmt=None):
+    if fmt:
+        return fmt
+    extension = os.path.splitext(path)[1].lstrip('.').lower()
+    return {'json': 'jsonl', 'ndjson': 'jsonl'}.get(extension, extension if extension in WRITERS else 'jsonl')
+
+
+class Progress:
+    def __init__(self, total, stream=sys.stderr, interval=0.5):
+        self.total = total
+        self.stream = stream
+        self.interval = interval
+        self.done = 0
+        self.errors = 0
+        self.started = time.monotonic()
+        self._shown = 0.0
+
+    def update(self, records):
+        self.done += len(records)
+        self.errors += sum(record['verdict'] == 'ERROR' for record in records)
+        now = time.monotonic()
+        if now - self._shown >= self.interval or self.done == self.total:
+            self._shown = now
+            elapsed = max(now - self.started, 1e-9)
+            percent = 100 * self.done / self.total if self.total else 100.0
+            self.stream.write(f"\r[screener] {self.done}/{self.total} ({percent:.1f}%) "
+                              f"{self.done / elapsed:.0f}/s, {self.errors} errors")
+            self.stream.flush()
+
+    def finish(self):
+        self.stream.write(f"\n[screener] done in {time.monotonic() - self.started:.1f}s\n")
+
+
+def run(args):
+    agents = build_agents(args.data_dir, args.use_model_iv, args.use_surface)
+    selected = list_identifiers(agents, args.assets, args.ids, args.sectors)
+    chunks = [selected[i:i + args.chunk_size] for i in range(0, len(selected), args.chunk_size)]
+
+    writer = WRITERS[output_format(args.output, args.format)](args.output)
+    progress = Progress(len(selected))
+    try:
+        if args.workers <= 1:
+            for chunk in chunks:
+                records = [screen(asset, identifier, agents) for asset, identifier in chunk]
+                writer.write(records)
+                progress.update(records)
+        else:
+            with ProcessPoolExecutor(
+                max_workers=args.workers,
+                initializer=_init_worker,
+                initargs=(args.data_dir, args.use_model_iv, args.use_surface)
+            ) as pool:
+                futures = [pool.submit(_screen_chunk, chunk) for chunk in chunks]
+                for future in as_completed(futures):
+                    records = future.result()
+                    writer.write(records)
+                    progress.update(records)
+    finally:
+        writer.close()
+    progress.finish()
+    return progress.errors
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Value every instrument with Stonker, Bond007 and CallMeMaybe.")
+    parser.add_argument('-o', '--output', default='-', help="output file, '-' for stdout (default)")
+    parser.add_argument('-f', '--format', choices=sorted(WRITERS), help="defaults to the output file extension, else jsonl")
+    parser.add_argument('-a', '--assets', nargs='+', choices=ASSETS, default=ASSETS)
+    parser.add_argument('--ids', nargs='+', help="tickers, issuers, option identifiers or underlyings to screen")
+    parser.add_argument('--sectors', nargs='+', help="only equities and bonds in these sectors")
+    parser.add_argument('-w', '--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--chunk-size', type=int, default=64)
+    parser.add_argument('--data-dir', default='data')
+    parser.add_argument('--use-model-iv', action='store_true')
+    parser.add_argument('--use-surface', action='store_true')
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    sys.exit(1 if run(parse_args()) else 0)
@@ -0,0 +1,256 @@
+import argparse
+import asyncio
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from agents import Bond007, Stonker, CallMeMaybe, get_store
+from agents.cache import TieredCache
+from agents.cross_asset import CrossAssetAnalyzer
+from agents.hot_reload import HotReloader
+from agents.instrumentation import histograms, start_timer
+from agents.serialization import to_jsonable, to_record
+
+AGENT_KEYS = {
+    'equity': 'stonker',
+    'bond': 'bond007',
+    'derivative': 'call_me_maybe'
+}
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+           413: 'Payload Too Large', 500: 'Internal Server Error'}
+MAX_BODY = 1 << 20
+JSON = 'application/json'
+PROMETHEUS = 'text/plain; version=0.0.4'
+BATCH_CHUNK = 64
+
+
+def get_agents(data_dir='data'):
+    store = get_store(data_dir)
+    return {
+        'bond007': Bond007(store=store),
+        'stonker': Stonker(store=store),
+        'call_me_maybe': CallMeMaybe(store=store)
+    }
+
+
+def _dumps(payload):
+    return json.dumps(payload, separators=(',', ':')).encode()
+
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class ValuationService:
+    def __init__(self, agents, reloader=None, workers=None, response_cache_size=4096, reload_interval=5.0):
+        self.agents = agents
+        self.reloader = reloader
+        self.reload_interval = reload_interval
+        self.executor = ThreadPoolExecutor(max_workers=workers or min(32, (os.cpu_count() or 1) + 4))
+        # serialized responses keyed like the analyze() cache, so a data reload misses them too
+        self.responses = TieredCache(None, max_items=response_cache_size, ttl=None)
+        self.cross_asset = CrossAssetAnalyzer(agents)
+
+    def analyze_json(self, asset, identifier, include_peers=False):
+        agent = self.agents[AGENT_KEYS[asset]]
+        key = agent.result_key(identifier)
+        timer = start_timer('ValuationService')
+        fresh = {}
+        with timer.stage('response'):
+            if key is None:
+                body = self._render(agent, asset, identifier, include_peers, fresh)
+            else:
+                body = self.responses.get_or_compute(
+                    (key, include_peers), lambda: self._render(agent, asset, identifier, include_peers, fresh)
+                )
+        # cached bodies leave timings out, every response carries those of its own request
+        timer.attach(fresh, prefix='service_')
+        if not fresh.get('timings'):
+            return body
+        return body[:-1] + b',"timings":' + _dumps(fresh['timings']) + b'}'
+
+    def _render(self, agent, asset, identifier, include_peers, fresh):
+        try:
+            result = agent.analyze(identifier)
+        except ValueError as e:
+            raise HttpError(404, str(e))
+        fresh['timings'] = result.pop('timings', {})
+        record = to_record(result, include_peers=include_peers)
+        record['identifier'] = identifier
+        return _dumps(record)
+
+    def issuer_json(self, query, include_peers=False):
+        # the three agents run side by side; their own result caches still apply
+        try:
+            combined = self.cross_asset.analyze(query, explain=False)
+        except ValueError as e:
+            raise HttpError(404, str(e))
+        record = {key: to_jsonable(value) for key, value in combined.items() if key not in AGENT_KEYS}
+        for asset in AGENT_KEYS:
+            record[asset] = [to_record(result, include_peers=include_peers) for result in combined[asset]]
+        return _dumps(record)
+
+    def batch_json(self, items, include_peers=False):
+        parts = []
+        for item in items:
+            try:
+                asset, identifier = item['type'], str(item['id'])
+                if asset not in AGENT_KEYS:
+                    raise HttpError(400, f"Unknown instrument type '{asset}'")
+                parts.append(self.analyze_json(asset, identifier, bool(item.get('peers', include_peers))))
+            except HttpError as e:
+                parts.append(_dumps({'request': item, 'error': str(e), 'status': e.status}))
+            except (KeyError, TypeError, AttributeError):
+                parts.append(_dumps({'request': item, 'error': "Each item needs 'type' and 'id'", 'status': 400}))
+        return parts
+
+    async def dispatch(self, method, target, body):
+        url = urlsplit(target)
+        query = parse_qs(url.query)
+        include_peers = query.get('peers', ['0'])[-1].lower() in ('1', 'true', 'yes')
+        parts = [unquote(part) for part in url.path.strip('/').split('/')]
+        loop = asyncio.get_running_loop()
+
+        if parts == ['health']:
+            return _dumps({'status': 'ok'}), JSON
+        if parts == ['stats']:
+            return _dumps({
+                'results': self.agents['stonker'].result_cache.stats(),
+                'responses': self.responses.stats(),
+                'timings': histograms.to_json()
+            }), JSON
+        if parts == ['metrics']:
+            return histograms.to_prometheus().encode(), PROMETHEUS
+
+        if parts == ['analyze', 'batch']:
+            if method != 'POST':
+                raise HttpError(405, "Use POST for batches")
+            try:
+                request = json.loads(body or b'{}')
+                items = request['requests']
+                include_peers = bool(request.get('include_peers', include_peers))
+            except (ValueError, KeyError, TypeError, AttributeError):
+                raise HttpError(400, "Body must be {\"requests\": [{\"type\": ..., \"id\": ...}, ...]}")
+            if not isinstance(items, list):
+                raise HttpError(400, "'requests' must be a list")
+            # a few large chunks keep executor overhead down while still using several threads
+            chunks = await asyncio.gather(*[
+                loop.run_in_executor(self.executor, self.batch_json, items[i:i + BATCH_CHUNK], include_peers)
+                for i in range(0, len(items), BATCH_CHUNK)
+            ])
+            return b'{"results":[' + b','.join(part for chunk in chunks for part in chunk) + b']}', JSON
+
+        if len(parts) == 3 and parts[:2] == ['analyze', 'issuer']:
+            if method != 'GET':
+                raise HttpError(405, "Use GET for an issuer")
+            return await loop.run_in_executor(self.executor, self.issuer_json, parts[2], include_peers), JSON
+
+        if len(parts) == 3 and parts[0] == 'analyze' and parts[1] in AGENT_KEYS:
+            if method != 'GET':
+                raise HttpError(405, "Use GET for a single instrument")
+            return await loop.run_in_executor(self.executor, self.analyze_json, parts[1], parts[2], include_peers), JSON
+
+        raise HttpError(404, f"No route for {url.path}")
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b'\r\n\r\n')
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    break
+
+                lines = head.decode('latin-1').split('\r\n')
+                try:
+                    method, target, version = lines[0].split(' ')
+                except ValueError:
+                    await self._respond(writer, 400, _dumps({'error': 'Malformed request line'}), False)
+                    break
+                headers = {}
+                for line in lines[1:]:
+                    name, _, value = line.partition(':')
+                    if name:
+                        headers[name.strip().lower()] = value.strip()
+                connection = headers.get('connection', '').lower()
+                keep_alive = connection != 'close' if version == 'HTTP/1.1' else connection == 'keep-alive'
+
+                try:
+                    length = int(headers.get('content-length') or 0)
+                except ValueError:
+                    await self._respond(writer, 400, _dumps({'error': 'Bad Content-Length'}), False)
+                    break
+                if length > MAX_BODY:
+                    await self._respond(writer, 413, _dumps({'error': 'Request body too large'}), False)
+                    break
+                try:
+                    body = await reader.readexactly(length) if length else b''
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+
+                content_type = JSON
+                try:
+                    status, (payload, content_type) = 200, await self.dispatch(method, target, body)
+                except HttpError as e:
+                    status, payload = e.status, _dumps({'error': str(e)})
+                except Exception as e:
+                    status, payload = 500, _dumps({'error': f"{type(e).__name__}: {e}"})
+                await self._respond(writer, status, payload, keep_alive, content_type)
+                if not keep_alive:
+                    break
+        finally:
+            writer.close()
+
+    async def _respond(self, writer, status, payload, keep_alive, content_type=JSON):
+        writer.write(
+            f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(payload)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + payload
+        )
+        await writer.drain()
+
+    async def watch_data(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.reload_interval)
+            await loop.run_in_executor(self.executor, self.reloader.check)
+
+    async def serve(self, host='127.0.0.1', port=8000):
+        server = await asyncio.start_server(self.handle, host, port)
+        watcher = asyncio.create_task(self.watch_data()) if self.reloader is not None else None
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            if watcher is not None:
+                watcher.cancel()
+            self.executor.shutdown(wait=False)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Serve Stonker, Bond007 and CallMeMaybe over HTTP.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('-w', '--workers', type=int, help="executor threads for agent work")
+    parser.add_argument('--data-dir', default='data')
+    parser.add_argument('--reload-interval', type=float, default=5.0, help="seconds between data file checks")
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    agents = get_agents(args.data_dir)
+    service = ValuationService(
+        agents,
+        reloader=HotReloader(get_store(args.data_dir), agents),
+        workers=args.workers,
+        reload_interval=args.reload_interval
+    )
+    print(f"Serving on http://{args.host}:{args.port}")
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,60 @@
+import os
+import shutil
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+import pandas as pd
+import pytest
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    # a private copy of data/, so a test can edit the files and keeps its caches to itself
+    target = tmp_path / 'data'
+    shutil.copytree(DATA_DIR, target, ignore=shutil.ignore_patterns('.cache'))
+    return str(target)
+
+
+@pytest.fixture(scope='session')
+def universe_dir(tmp_path_factory):
+    # a seeded 1,000-row synthetic universe with the same schemas as data/
+    from benchmarks.run import universe
+    return universe(1000, 0, str(tmp_path_factory.mktemp('universe')))
+
+
+def edit_csv(data_dir, name, cells):
+    # {(row, column): text}; the file is read as text, so untouched cells are written back as they were
+    path = os.path.join(data_dir, name)
+    df = pd.read_csv(path, dtype=str, keep_default_na=False)
+    for (row, column), text in cells.items():
+        df.loc[row, column] = text
+    df.to_csv(path, index=False)
+
+
+class FakeClient:
+    # stands in for anthropic.Anthropic offline: replies are texts or exceptions, used in order
+    # (the last one repeats), and every prompt sent is recorded
+    def __init__(self, *replies):
+        self.messages = self
+        self.replies = list(replies) or ['A fine explanation.']
+        self.prompts = []
+
+    def _reply(self, messages):
+        self.prompts.append(messages[0]['content'])
+        reply = self.replies.pop(0) if len(self.replies) > 1 else self.replies[0]
+        if isinstance(reply, BaseException):
+            raise reply
+        return reply
+
+    def create(self, model, max_tokens, messages):
+        return SimpleNamespace(content=[SimpleNamespace(text=self._reply(messages))])
+
+    @contextmanager
+    def stream(self, model, max_tokens, messages):
+        text = self._reply(messages)
+        chunks = [word + ' ' for word in text.split(' ')]
+        chunks[-1] = chunks[-1][:-1]
+        snapshot = SimpleNamespace(stop_reason='end_turn')
+        yield SimpleNamespace(text_stream=iter(chunks), current_message_snapshot=snapshot)
@@ -0,0 +1,70 @@
+import json
+
+import anthropic
+import httpx
+import pytest
+
+from agents import InsightGenerator, Stonker
+from agents.batch_explainer import BatchExplainer
+from agents.cache import TieredCache
+from agents.data_store import DataStore
+
+from conftest import FakeClient
+
+REQUEST = httpx.Request('POST', 'https://api.anthropic.com/v1/messages')
+
+
+def _status_error(cls, status):
+    return cls('upstream said no', response=httpx.Response(status, headers={'retry-after': '0'}, request=REQUEST),
+               body=None)
+
+
+@pytest.fixture
+def results(data_dir):
+    agent = Stonker(store=DataStore(data_dir), result_cache=False)
+    return [agent.analyze(ticker) for ticker in ('AAPL', 'MSFT', 'GOOGL')]
+
+
+def _explainer(client, **options):
+    # a memory-only cache per explainer, so every test starts with nothing explained
+    generator = InsightGenerator(client=client, cache=TieredCache(None))
+    return generator, BatchExplainer(generator, tokens_per_minute=10**9, backoff=0, **options)
+
+
+@pytest.mark.parametrize('error', [
+    _status_error(anthropic.RateLimitError, 429),
+    _status_error(anthropic.InternalServerError, 529),
+    anthropic.APIConnectionError(request=REQUEST)
+])
+def test_transient_errors_are_retried(results, error):
+    client = FakeClient(error, error, 'Worth a look.')
+    _, explainer = _explainer(client, pack_size=1)
+    assert explainer.explain(results[:1]) == ['Worth a look.']
+    assert len(client.prompts) == 3
+
+
+def test_other_errors_are_not_retried(results):
+    client = FakeClient(_status_error(anthropic.BadRequestError, 400), 'never sent')
+    generator, explainer = _explainer(client, pack_size=1)
+    assert explainer.explain(results[:1]) == [generator.fallback(results[0])]
+    assert len(client.prompts) == 1
+
+
+def test_retries_stop_after_max_retries(results):
+    client = FakeClient(_status_error(anthropic.RateLimitError, 429))
+    generator, explainer = _explainer(client, pack_size=1, max_retries=2)
+    assert explainer.explain(results[:1]) == [generator.fallback(results[0])]
+    assert len(client.prompts) == 3
+
+
+def test_a_pack_is_one_request_and_falls_back_to_single_ones(results):
+    client = FakeClient(json.dumps(['one', 'two', 'three']))
+    _, explainer = _explainer(client)
+    assert explainer.explain(results + results[:1]) == ['one', 'two', 'three', 'one']
+    assert len(client.prompts) == 1
+
+    # a reply that is not the JSON array asks for each item on its own
+    client = FakeClient('not json', 'solo')
+    _, explainer = _explainer(client)
+    assert explainer.explain(results) == ['solo', 'solo', 'solo']
+    assert len(client.prompts) == 4
@@ -0,0 +1,28 @@
+import math
+
+import pytest
+
+from agents import Bond007
+from agents.data_store import DataStore
+
+
+def _same(expected, actual):
+    return expected == actual or (math.isnan(expected) and math.isnan(actual))
+
+
+@pytest.mark.parametrize('options', [
+    {},
+    {'use_solved_ytm': True, 'peer_basis': 'duration'},
+    {'peer_mode': 'knn'}
+])
+def test_analyze_all_matches_analyze_for_every_issuer(universe_dir, options):
+    agent = Bond007(store=DataStore(universe_dir), result_cache=False, **options)
+    frame = agent.analyze_all().drop_duplicates('issuer')
+    for _, row in frame.iterrows():
+        result = agent.analyze(row['issuer'])
+        assert (result['verdict'], result['confidence']) == (row['verdict'], row['confidence']), row['issuer']
+        assert _same(result['credit_spread'], row['credit_spread']), row['issuer']
+        assert result['bond']['yield_pct'] == row['bond_yield'], row['issuer']
+        if 'error' not in result['stats']:
+            for name in ('peer_median_yield', 'deviation', 'z_score', 'peer_count'):
+                assert _same(result['stats'][name], row[name]), (row['issuer'], name)
@@ -0,0 +1,21 @@
+import os
+
+import agents.stonker
+from agents import Stonker
+from agents.cache import TieredCache
+from agents.data_store import DataStore
+from agents.results import RESULTS_TAG
+
+
+def test_stored_results_are_keyed_on_the_code_that_computed_them(data_dir, monkeypatch):
+    store = DataStore(data_dir)
+    path = os.path.join(store.cache_dir, 'results.sqlite')
+    agent = Stonker(store=store, result_cache=TieredCache(path, ttl=None))
+    key = agent.result_key('AAPL')
+    assert key.endswith(RESULTS_TAG)
+    agent.analyze('AAPL')
+
+    # a later process finds the result on disk, until a new results version changes the key
+    assert TieredCache(path, ttl=None).get(key) is not None
+    monkeypatch.setattr(agents.stonker, 'RESULTS_TAG', 'results=v0/schema=v0')
+    assert TieredCache(path, ttl=None).get(agent.result_key('AAPL')) is None
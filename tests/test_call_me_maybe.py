@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+
+from agents import CallMeMaybe
+from agents.data_store import DataStore
+
+from conftest import edit_csv
+
+
+@pytest.mark.parametrize('use_surface', [False, True])
+def test_blank_underlying_price_keeps_the_baseline_verdict(data_dir, use_surface):
+    edit_csv(data_dir, 'derivatives.csv', {(0, 'underlying_price'): ''})
+    agent = CallMeMaybe(store=DataStore(data_dir), result_cache=False, use_surface=use_surface, use_model_iv=True)
+
+    result = agent.analyze('AAPL_call_240_30')
+    assert result['verdict'] == 'FAIRLY_VALUED'
+    if use_surface:
+        assert np.isnan(result['surface']['surface_iv'])
+        assert result['surface']['signal'] == 'IN_LINE'
+    else:
+        assert result['surface'] is None
+
+    verdicts = agent.analyze_all()
+    assert len(verdicts) == len(agent.derivatives_df)
+    assert verdicts['verdict'].iloc[0] == 'FAIRLY_VALUED'
+
+
+@pytest.mark.parametrize('use_surface', [False, True])
+def test_analyze_all_matches_analyze_for_every_contract(universe_dir, use_surface):
+    agent = CallMeMaybe(store=DataStore(universe_dir), result_cache=False, use_surface=use_surface, use_model_iv=True)
+    frame = agent.analyze_all().drop_duplicates('identifier')
+    for _, row in frame.iterrows():
+        result = agent.analyze(row['identifier'])
+        assert (result['verdict'], result['confidence']) == (row['verdict'], row['confidence']), row['identifier']
+        if use_surface:
+            np.testing.assert_equal(result['surface']['surface_iv'], row['surface_iv'])
+            assert result['surface']['signal'] == row['surface_signal']
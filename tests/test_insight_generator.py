@@ -0,0 +1,62 @@
+import os
+
+from agents import InsightGenerator, Stonker
+from agents.data_store import DataStore
+
+from conftest import FakeClient
+
+
+def _result(store, ticker='AAPL'):
+    return Stonker(store=store, result_cache=False).analyze(ticker)
+
+
+def test_generators_on_one_store_share_their_explanations(data_dir):
+    store = DataStore(data_dir)
+    first, second = FakeClient('Cheap at twice the price.'), FakeClient('never asked')
+    for client in (first, second):
+        text = InsightGenerator(client=client, store=store).generate_explanation(_result(store))
+        assert text == 'Cheap at twice the price.'
+    assert len(first.prompts) == 1 and second.prompts == []
+    assert os.path.exists(os.path.join(store.cache_dir, 'explanations.sqlite'))
+
+
+def test_an_unwritable_cache_dir_keeps_explanations_in_memory(data_dir, tmp_path):
+    blocked = tmp_path / 'not-a-directory'
+    blocked.write_text('')
+    store = DataStore(data_dir, cache_dir=str(blocked / 'cache'))
+    client = FakeClient('Still explained.')
+    generator = InsightGenerator(client=client, store=store)
+    assert generator.generate_explanation(_result(store)) == 'Still explained.'
+    assert generator.generate_explanation(_result(store)) == 'Still explained.'
+    assert len(client.prompts) == 1
+
+
+def test_a_failed_call_gets_the_canned_fallback(data_dir):
+    store = DataStore(data_dir)
+    result = _result(store)
+    generator = InsightGenerator(client=FakeClient(RuntimeError('offline')), store=store)
+    assert generator.generate_explanation(result) == generator.fallback(result)
+    assert list(generator.stream_explanation(result))[-1] == generator.fallback(result)
+
+
+def test_a_result_without_a_prompt_gets_the_fallback_on_every_path(data_dir):
+    store = DataStore(data_dir)
+    result = _result(store)
+    result['tobins_q'] = None
+    client = FakeClient()
+    generator = InsightGenerator(client=client, store=store)
+    fallback = generator.fallback(result)
+    assert generator.generate_explanation(result) == fallback
+    assert list(generator.stream_explanation(result)) == [fallback]
+    assert generator.generate_explanations([result, _result(store, 'MSFT')])[0] == fallback
+    assert len(client.prompts) == 1
+
+
+def test_streamed_text_grows_and_is_cached_once_complete(data_dir):
+    store = DataStore(data_dir)
+    client = FakeClient('Up and to the right.')
+    generator = InsightGenerator(client=client, store=store)
+    streamed = list(generator.stream_explanation(_result(store)))
+    assert streamed == ['Up ', 'Up and ', 'Up and to ', 'Up and to the ', 'Up and to the right.']
+    assert list(generator.stream_explanation(_result(store))) == ['Up and to the right.']
+    assert len(client.prompts) == 1
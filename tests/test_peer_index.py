@@ -0,0 +1,27 @@
+from statistics import median, stdev
+
+import numpy as np
+import pytest
+
+from agents.peer_index import _SortedValues
+from benchmarks.parity import STATS_CASES, check_sorted_values
+
+
+def test_bulk_stats_match_the_per_key_stats():
+    assert check_sorted_values(STATS_CASES) == []
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_leave_one_out_matches_statistics_on_the_rest(seed):
+    rng = np.random.default_rng(seed)
+    values = np.concatenate([rng.lognormal(2, 1, 40), rng.choice([3e9, 1e-300, -7.5e12, 0.0], 4)])
+    keys = np.array([f"k{i}" for i in range(len(values))], dtype=object)
+    column = _SortedValues(values, keys)
+    medians, stds = column.bulk_stats(keys)
+    for i in range(len(values)):
+        rest = np.delete(values, i).tolist()
+        assert medians[i] == median(rest)
+        assert stds[i] == stdev(rest)
+    # a key with no values in the group leaves nothing out
+    medians, stds = column.bulk_stats(np.array(['missing'], dtype=object))
+    assert (medians[0], stds[0]) == (median(values.tolist()), stdev(values.tolist()))
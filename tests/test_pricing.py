@@ -0,0 +1,37 @@
+import numpy as np
+import pandas as pd
+
+from agents.pricing import black_scholes_greeks, black_scholes_price, implied_vol, price_chain
+
+
+def test_converged_vols_are_accurate_far_from_the_money():
+    rng = np.random.default_rng(0)
+    n = 20_000
+    spot = np.full(n, 100.0)
+    strike = 100 * np.exp(rng.uniform(-1.5, 1.5, n))
+    t = rng.uniform(5, 720, n) / 365
+    vol = rng.uniform(0.05, 1.5, n)
+    is_call = rng.random(n) < 0.5
+    price = black_scholes_price(spot, strike, t, vol, is_call, 0.04)
+
+    solved, converged = implied_vol(price, spot, strike, t, is_call, 0.04)
+    assert converged.mean() > 0.9
+    assert np.abs(solved[converged] - vol[converged]).max() < 1e-5
+    assert np.isnan(solved[~converged]).all()
+
+
+def test_greek_errors_are_model_minus_stored():
+    chain = pd.DataFrame({'underlying': 'X', 'type': ['call', 'put'], 'strike': [95.0, 110.0],
+                          'expiry_days': [30, 90], 'underlying_price': 100.0, 'implied_vol': [0.25, 0.4]})
+    t = chain['expiry_days'].to_numpy(float) / 365
+    is_call = (chain['type'] == 'call').to_numpy()
+    args = (chain['underlying_price'], chain['strike'], t, chain['implied_vol'], is_call, 0.03)
+    chain['current_price'] = black_scholes_price(*args)
+    greeks = black_scholes_greeks(*args)
+    chain['delta'], chain['gamma'], chain['vega'] = greeks['delta'] + 0.1, greeks['gamma'], greeks['vega'] - 0.02
+
+    priced = price_chain(chain, rate=0.03)
+    assert priced['iv_converged'].all()
+    np.testing.assert_allclose(priced['delta_error'], -0.1, atol=1e-6)
+    np.testing.assert_allclose(priced['gamma_error'], 0.0, atol=1e-6)
+    np.testing.assert_allclose(priced['vega_error'], 0.02, atol=1e-6)
@@ -0,0 +1,23 @@
+import json
+
+from agents import Bond007, CallMeMaybe, Stonker
+from agents.data_store import DataStore
+from agents import instrumentation
+from service import ValuationService
+
+
+def test_cached_responses_carry_the_timings_of_their_own_request(data_dir, monkeypatch):
+    monkeypatch.setattr(instrumentation, '_enabled', True)
+    store = DataStore(data_dir)
+    service = ValuationService({
+        'stonker': Stonker(store=store, result_cache=False),
+        'bond007': Bond007(store=store, result_cache=False),
+        'call_me_maybe': CallMeMaybe(store=store, result_cache=False)
+    })
+    first = json.loads(service.analyze_json('equity', 'AAPL'))
+    second = json.loads(service.analyze_json('equity', 'AAPL'))
+
+    assert 'row_lookup' in first['timings']
+    # the hit never ran the agent, so none of its stages are reported again
+    assert set(second['timings']) == {'service_response', 'service_total'}
+    assert {k: v for k, v in first.items() if k != 'timings'} == {k: v for k, v in second.items() if k != 'timings'}
@@ -0,0 +1,14 @@
+import pytest
+
+from agents import Stonker
+from agents.data_store import DataStore
+from benchmarks.parity import check_stonker, with_outliers
+
+
+@pytest.mark.parametrize('outliers', [False, True])
+@pytest.mark.parametrize('source', ['data', 'universe'])
+def test_analyze_all_matches_analyze_for_every_ticker(source, outliers, data_dir, universe_dir):
+    agent = Stonker(store=DataStore(data_dir if source == 'data' else universe_dir), result_cache=False)
+    if outliers:
+        with_outliers(agent)
+    assert check_stonker(agent) == []
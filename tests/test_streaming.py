@@ -0,0 +1,34 @@
+import pandas as pd
+import pytest
+
+from agents import Bond007, CallMeMaybe, Stonker
+from agents.data_store import DataStore
+from agents.streaming import StreamingScreener
+
+from conftest import edit_csv
+
+
+def _assert_streams_as(screener, name, agent):
+    streamed = pd.concat(list(getattr(screener, name)()))
+    pd.testing.assert_frame_equal(streamed, agent.analyze_all(), check_exact=True)
+
+
+@pytest.mark.parametrize('chunk_rows', [7, 333])
+def test_streamed_verdicts_equal_the_in_memory_ones(universe_dir, chunk_rows):
+    store = DataStore(universe_dir)
+    screener = StreamingScreener(universe_dir, chunk_rows=chunk_rows)
+    _assert_streams_as(screener, 'equities', Stonker(store=store, result_cache=False))
+    _assert_streams_as(screener, 'bonds', Bond007(store=store, result_cache=False))
+    _assert_streams_as(screener, 'derivatives', CallMeMaybe(store=store, result_cache=False))
+
+
+def test_streamed_verdicts_equal_the_in_memory_ones_with_every_option(data_dir):
+    # a blank spot as well, which the surface reads as NaN
+    edit_csv(data_dir, 'derivatives.csv', {(0, 'underlying_price'): ''})
+    store = DataStore(data_dir)
+    screener = StreamingScreener(data_dir, chunk_rows=4, use_solved_ytm=True, peer_basis='duration',
+                                 use_model_iv=True, use_surface=True)
+    _assert_streams_as(screener, 'bonds', Bond007(store=store, result_cache=False, use_solved_ytm=True,
+                                                  peer_basis='duration'))
+    _assert_streams_as(screener, 'derivatives', CallMeMaybe(store=store, result_cache=False, use_model_iv=True,
+                                                            use_surface=True))